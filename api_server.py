@@ -0,0 +1,209 @@
+import argparse
+import hmac
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bulk_import import (
+    DEFAULT_CONCURRENCY, RESULT_INVALID, RESULT_SUCCEEDED, import_rows, notion_saver, prepare_rows, split_row
+)
+from metrics import CONTENT_TYPE, REGISTRY
+from notion_api import DEFAULT_RATE, NotionClient, RateLimiter
+from omnisorter_core import apply_calculated_values, render_texts, validate_form_data
+
+# 待ち受けアドレス
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+
+# リクエストボディの上限（バイト）と1回のバッチの上限件数
+MAX_BODY_SIZE = 5 * 1024 * 1024
+MAX_BATCH_SIZE = 500
+
+
+class APIError(Exception):
+    """HTTPエラーレスポンスとして返すエラー"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def preview(raw):
+    """1件分の仕様から自動計算値と依頼文を生成（保存はしない）"""
+    _, form_data = split_row(raw)
+    errors = validate_form_data(form_data)
+    form_data = apply_calculated_values(form_data)
+    quotation_text, drawing_text, spec_text = render_texts(form_data)
+    return {
+        "errors": errors,
+        "間口数": form_data.get("間口数", 0),
+        "面数": form_data.get("面数", 0),
+        "見積依頼文": quotation_text,
+        "図面依頼文": drawing_text,
+        "仕様詳細": spec_text
+    }
+
+
+def parse_batch(body):
+    """JSONボディを (行のリスト, バッチかどうか) にする
+
+    1件ならオブジェクト、複数なら配列か {"requests": [...]} で受け付ける。
+    各行の形式は一括取込のJSONLと同じ（仕様の項目キーと顧客名・案件名・依頼種別・備考）。
+    """
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError as e:
+        raise APIError(400, f"JSONとして読み込めません: {str(e)}")
+
+    if isinstance(payload, dict) and isinstance(payload.get("requests"), list):
+        payload = payload["requests"]
+    if isinstance(payload, dict):
+        return [payload], False
+    if not isinstance(payload, list) or not payload:
+        raise APIError(400, "オブジェクトまたは空でない配列を送信してください")
+    if len(payload) > MAX_BATCH_SIZE:
+        raise APIError(413, f"1回に送信できるのは{MAX_BATCH_SIZE}件までです")
+    if not all(isinstance(row, dict) for row in payload):
+        raise APIError(400, "配列の要素はオブジェクトにしてください")
+    return payload, True
+
+
+class APIServer(ThreadingHTTPServer):
+    """Notionクライアント（レート制限・接続プール）を全リクエストで共有するHTTPサーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, address, save=None, concurrency=DEFAULT_CONCURRENCY, token=None):
+        super().__init__(address, APIRequestHandler)
+        self.save = save
+        self.concurrency = concurrency
+        self.token = token
+
+
+class APIRequestHandler(BaseHTTPRequestHandler):
+    """JSON API
+
+    GET  /health    稼働確認
+    GET  /metrics   Prometheusテキスト形式のメトリクス
+    POST /preview   自動計算値・依頼文のプレビュー（1件またはバッチ）
+    POST /requests  検証してNotionに保存（1件またはバッチ）
+    """
+
+    server_version = "OmniSorterAPI/1.0"
+
+    def do_GET(self):
+        self._dispatch({"/health": self._health, "/metrics": self._metrics})
+
+    def do_POST(self):
+        self._dispatch({"/preview": self._preview, "/requests": self._save})
+
+    def _dispatch(self, routes):
+        try:
+            route = routes.get(self.path.split("?", 1)[0].rstrip("/") or "/")
+            if route is None:
+                raise APIError(404, "見つかりません")
+            # 稼働確認・メトリクスは認証なしで応答する（監視から取得するため）
+            if route not in (self._health, self._metrics):
+                self._authorize()
+            status, payload = route()
+        except APIError as e:
+            status, payload = e.status, {"error": e.message}
+        except Exception as e:
+            status, payload = 500, {"error": f"サーバーエラー: {str(e)}"}
+        if isinstance(payload, str):
+            self._send_text(status, payload)
+        else:
+            self._send_json(status, payload)
+
+    def _authorize(self):
+        token = self.server.token
+        if not token:
+            return
+        supplied = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+            raise APIError(401, "認証に失敗しました")
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise APIError(400, "Content-Lengthが不正です")
+        if length > MAX_BODY_SIZE:
+            raise APIError(413, f"リクエストが大きすぎます（上限 {MAX_BODY_SIZE}バイト）")
+        return self.rfile.read(length)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _health(self):
+        return 200, {"status": "ok", "save": self.server.save is not None}
+
+    def _metrics(self):
+        return 200, REGISTRY.render()
+
+    def _preview(self):
+        rows, batch = parse_batch(self._read_body())
+        results = [preview(row) for row in rows]
+        return 200, {"results": results} if batch else results[0]
+
+    def _save(self):
+        rows, batch = parse_batch(self._read_body())
+        if self.server.save is None:
+            raise APIError(503, "保存先が設定されていません（NOTION_API_KEY と NOTION_DATABASE_ID）")
+
+        prepared_rows = prepare_rows(list(enumerate(rows, start=1)))
+        results, summary = import_rows(prepared_rows, self.server.save, self.server.concurrency)
+        if batch:
+            return 200, {"results": results, "summary": summary}
+
+        # 保存失敗・本文追記失敗（ページIDは結果に含まれる）はどちらも502
+        result = results[0]
+        status = {RESULT_SUCCEEDED: 201, RESULT_INVALID: 422}.get(result["結果"], 502)
+        return status, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OmniSorter依頼のプレビュー・保存を行うJSON API")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="待ち受けアドレス")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="待ち受けポート")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="1バッチあたりの同時書き込み数")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Notionへの最大リクエスト数/秒（全リクエスト合計）")
+    args = parser.parse_args(argv)
+
+    save = None
+    api_key = os.environ.get("NOTION_API_KEY")
+    database_id = os.environ.get("NOTION_DATABASE_ID")
+    if api_key and database_id:
+        client = NotionClient(api_key, limiter=RateLimiter(args.rate))
+        save = notion_saver(client, database_id)
+    else:
+        print("NOTION_API_KEY / NOTION_DATABASE_ID が未設定のため、保存は無効です（プレビューのみ）", file=sys.stderr)
+
+    server = APIServer((args.host, args.port), save, args.concurrency, os.environ.get("OMNISORTER_API_TOKEN"))
+    print(f"http://{args.host}:{args.port} で待ち受けています", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,37 @@
+import time
+
+# スクリプト開始時刻（モジュール読み込み・初回表示の時間計測用）
+SCRIPT_STARTED_AT = time.perf_counter()
+
 import streamlit as st
-import requests
 import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
+from bulk_import import format_summary, import_rows, notion_saver, prepare_rows, read_rows, report_csv
+from customer_search import SearchIndex
+from master_store import DEFAULT_MIRROR_PATH, BackgroundSync, EntityResolver, MasterMirror, index_projects
+from metrics import (
+    CACHE_LOOKUPS, CACHE_MISSES, FIRST_RENDER_DURATION, NOTION_ERRORS, NOTION_LATENCY, REGISTRY,
+    RERUN_DURATION, STARTUP, Timer, record_cache_lookup, record_cache_miss, record_startup,
+    start_metrics_server
+)
+from notion_api import NotionAPIError, NotionClient
+from omnisorter_core import (
+    CUSTOMER_RELATION_PROPERTY, FIELDS_BY_CATEGORY, REQUEST_TYPES, calculate_grid_count, calculate_surface_count,
+    RENDER_CACHE, get_cart_options, get_tote_options, render_texts, save_master_request,
+    save_request, should_show_field
+)
+from outbox import (
+    DEFAULT_OUTBOX_PATH, STATUS_FAILED, STATUS_PARTIAL, STATUS_QUEUED, STATUS_RETRY,
+    STATUS_SENDING, STATUS_SENT, Outbox, OutboxWorker
+)
+from shared_cache import SharedCache, open_cache
+
+record_startup("import", time.perf_counter() - SCRIPT_STARTED_AT)
+
 # Streamlit設定
 st.set_page_config(
     page_title="OmniSorter 見積・図面依頼システム",
@@ -50,57 +79,42 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# フォーム項目データ
-FORM_ITEMS = [
-    {"大項目": "OS機種", "小項目": "-", "必要種別": "見積,図面", "取り得る値": "S,M,L,mini", "備考": ""},
-    {"大項目": "本体構成", "小項目": "段", "必要種別": "見積,図面", "取り得る値": "2,3,4,5", "備考": ""},
-    {"大項目": "本体構成", "小項目": "列", "必要種別": "見積,図面", "取り得る値": "3,4,5", "備考": ""},
-    {"大項目": "本体構成", "小項目": "ブロック", "必要種別": "見積,図面", "取り得る値": "(任意)", "備考": "最大10"},
-    {"大項目": "本体構成", "小項目": "間口タイプ", "必要種別": "見積,図面", "取り得る値": "カート式,固定（棚）式,スロープ式", "備考": ""},
-    {"大項目": "本体構成", "小項目": "短スロープ長さ", "必要種別": "見積,図面", "取り得る値": "", "備考": "mm単位"},
-    {"大項目": "本体構成", "小項目": "スロープ長さ", "必要種別": "見積,図面", "取り得る値": "", "備考": "mm単位　※スロープタイプの場合のみ"},
-    {"大項目": "本体構成", "小項目": "引き出し有無", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": "※スロープタイプの場合のみ"},
-    {"大項目": "設置容器", "小項目": "標準/個別", "必要種別": "見積,図面", "取り得る値": "標準トート,個別容器,無し", "備考": ""},
-    {"大項目": "設置容器", "小項目": "奥行", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
-    {"大項目": "設置容器", "小項目": "幅", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
-    {"大項目": "設置容器", "小項目": "高さ", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
-    {"大項目": "仕分け商品", "小項目": "最大奥行", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
-    {"大項目": "仕分け商品", "小項目": "最大幅", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
-    {"大項目": "仕分け商品", "小項目": "最大高さ", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
-    {"大項目": "オプション", "小項目": "DAS", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": ""},
-    {"大項目": "オプション", "小項目": "満杯センサー", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": ""},
-    {"大項目": "オプション", "小項目": "追加カート", "必要種別": "見積", "取り得る値": "(選択)", "備考": "※カート式の場合のみ"},
-    {"大項目": "オプション", "小項目": "追加トート", "必要種別": "見積", "取り得る値": "(選択)", "備考": "※標準トートの場合のみ"},
-    {"大項目": "オプション", "小項目": "滑り止めベルト", "必要種別": "見積", "取り得る値": "有,無", "備考": ""},
-    {"大項目": "オプション", "小項目": "薄物対応", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": ""}
-]
-
-# 翻訳辞書
-TRANSLATE_CATEGORY = {
-    'OS機種': 'Model',
-    '本体構成': 'Main Configuration',
-    '設置容器': 'Container',
-    '仕分け商品': 'Sorting Product',
-    'オプション': 'Options'
-}
+# マスタの差分同期間隔（秒）
+MASTER_SYNC_INTERVAL = 60
+
+# 初回表示（スクリプト開始から main() 完了まで）の目標時間（秒）
+FIRST_RENDER_TARGET = 1.0
 
-TRANSLATE_ITEM = {
-    '段': 'Rows', '列': 'Columns', 'ブロック': 'Cells', '間口タイプ': 'Grid Type',
-    '短スロープ長さ': 'Short Slope Length', 'スロープ長さ': 'Slope Length',
-    '引き出し有無': 'Drawer Availability', '標準/個別': 'Container Type',
-    '奥行': 'Depth', '幅': 'Width', '高さ': 'Height',
-    '最大奥行': 'Max Depth', '最大幅': 'Max Width', '最大高さ': 'Max Height',
-    'DAS': 'DAS', '満杯センサー': 'Full Sensor',
-    '追加カート': 'Additional Cart', '追加トート': 'Additional Tote',
-    '滑り止めベルト': 'Anti-slip Belt', '薄物対応': 'Thin Item Support',
-    '間口数': 'Grid Count', '面数': 'Surface Count'
+# 接続テストのデータベースごとの期限（秒）と結果の共有期間（秒）
+CONNECTION_TEST_TIMEOUT = 10
+CONNECTION_TEST_TTL = 30
+
+# 共有キャッシュに保存するマスタ一覧の種類と、DB IDの設定キー
+MASTER_CACHE_KINDS = {"customers": "CUSTOMER_DB_ID", "projects": "PROJECT_DB_ID"}
+
+# 顧客選択に表示する検索結果の最大件数
+CUSTOMER_SEARCH_LIMIT = 50
+
+# 仕様入力セクション見出しのアイコン
+CATEGORY_ICONS = {
+    "OS機種": "🤖",
+    "本体構成": "🏗️",
+    "設置容器": "📦",
+    "仕分け商品": "📋",
+    "オプション": "⚙️"
 }
 
-TRANSLATE_VALUE = {
-    'S': 'S', 'M': 'M', 'L': 'L', 'mini': 'mini',
-    'カート式': 'Cart Type', '固定（棚）式': 'Fixed (Shelf) Type', 'スロープ式': 'Slope Type',
-    '標準トート': 'Standard Tote', '個別容器': 'Individual Container', '無し': 'None',
-    '有': 'Yes', '無': 'No'
+# 送信状況に表示する件数
+OUTBOX_DISPLAY_LIMIT = 10
+
+# 送信状況の表示
+OUTBOX_STATUS_LABELS = {
+    STATUS_QUEUED: "⏳ 送信待ち",
+    STATUS_SENDING: "📤 送信中",
+    STATUS_RETRY: "🔁 再試行待ち",
+    STATUS_PARTIAL: "🧩 ページ作成済み・本文の追記待ち",
+    STATUS_SENT: "✅ 保存済み",
+    STATUS_FAILED: "❌ 失敗"
 }
 
 # セッション状態の初期化
@@ -112,760 +126,627 @@ def init_session_state():
         st.session_state.operation_in_progress = False
     if 'last_operation' not in st.session_state:
         st.session_state.last_operation = None
-    if 'customers_cache_version' not in st.session_state:
-        st.session_state.customers_cache_version = 0
-    if 'projects_cache_version' not in st.session_state:
-        st.session_state.projects_cache_version = 0
+    if 'outbox_session_id' not in st.session_state:
+        st.session_state.outbox_session_id = uuid.uuid4().hex
+    if 'bulk_import_result' not in st.session_state:
+        st.session_state.bulk_import_result = None
+    if 'profile_session' not in st.session_state:
+        st.session_state.profile_session = None
+    if 'connection_tested' not in st.session_state:
+        st.session_state.connection_tested = False
 
 # API関数群
-def test_database_connection(db_name, db_id, api_key):
-    """個別データベース接続テスト"""
-    url = f"https://api.notion.com/v1/databases/{db_id}"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Notion-Version": "2022-06-28"
-    }
-    
+@st.cache_resource
+def get_notion_client():
+    """プロセス共通のNotionクライアントを取得（接続プールを全セッションで共有）"""
+    return NotionClient(
+        st.secrets["NOTION_API_KEY"],
+        database_ids={
+            "NOTION_DATABASE_ID": st.secrets.get("NOTION_DATABASE_ID"),
+            "CUSTOMER_DB_ID": st.secrets.get("CUSTOMER_DB_ID"),
+            "PROJECT_DB_ID": st.secrets.get("PROJECT_DB_ID"),
+            "OMNISORTER_REQUEST_DB_ID": st.secrets.get("OMNISORTER_REQUEST_DB_ID")
+        },
+        base_url=st.secrets.get("NOTION_API_BASE")
+    )
+
+def test_database_connection(db_name, db_id, client=None):
+    """個別データベース接続テスト（結果はスキーマレジストリにも反映）
+
+    {"message", "latency", "property_count"} を返す（失敗時の latency・property_count はNone）。
+    """
+    started_at = time.perf_counter()
     try:
-        response = requests.get(url, headers=headers)
+        schema = (client or get_notion_client()).schemas.get(db_id, refresh=True, timeout=CONNECTION_TEST_TIMEOUT)
         
-        if response.status_code == 200:
-            data = response.json()
-            properties = data.get("properties", {})
-            
-            # プロパティの詳細情報を取得
-            prop_details = []
-            for prop_name, prop_data in properties.items():
-                prop_type = prop_data.get("type", "unknown")
-                prop_details.append(f"{prop_name} ({prop_type})")
-            
-            return f"✅ {db_name}: 接続成功\nプロパティ: {', '.join(prop_details)}"
-        elif response.status_code == 401:
-            return f"❌ {db_name}: APIキーが無効"
-        elif response.status_code == 404:
-            return f"❌ {db_name}: データベースが見つかりません"
+        # プロパティの詳細情報を取得
+        prop_details = schema.describe()
+        
+        return {
+            "message": f"✅ {db_name}: 接続成功\nプロパティ: {', '.join(prop_details)}",
+            "latency": time.perf_counter() - started_at,
+            "property_count": len(prop_details)
+        }
+    except NotionAPIError as e:
+        if e.status_code == 401:
+            message = f"❌ {db_name}: APIキーが無効"
+        elif e.status_code == 404:
+            message = f"❌ {db_name}: データベースが見つかりません"
         else:
-            return f"❌ {db_name}: エラー {response.status_code}"
+            message = f"❌ {db_name}: エラー {e.status_code}"
     except Exception as e:
-        return f"❌ {db_name}: 接続エラー - {str(e)}"
+        message = f"❌ {db_name}: 接続エラー - {str(e)}"
+    return {"message": message, "latency": None, "property_count": None}
+
+class ProbeFailed(Exception):
+    """接続できなかったデータベースがある（結果をキャッシュしないために送出する）"""
 
-def test_notion_connection():
-    """Notion API接続テスト"""
+    def __init__(self, results):
+        super().__init__("接続できなかったデータベースがあります")
+        self.results = results
+
+def probe_databases(targets, client=None):
+    """データベースを並行して接続テスト（期限内に応答しないものはタイムアウト扱い）"""
+    client = client or get_notion_client()
+    executor = ThreadPoolExecutor(max_workers=len(targets))
+    futures = [executor.submit(test_database_connection, db_name, db_id, client) for db_name, db_id in targets]
+    wait(futures, timeout=CONNECTION_TEST_TIMEOUT)
+    # 応答しないリクエストの終了は待たない（HTTPタイムアウトでいずれ終わる）
+    executor.shutdown(wait=False)
+    
+    results = []
+    for (db_name, _), future in zip(targets, futures):
+        if future.done():
+            results.append(future.result())
+        else:
+            results.append({
+                "message": f"❌ {db_name}: タイムアウト（{CONNECTION_TEST_TIMEOUT}秒）",
+                "latency": None, "property_count": None
+            })
+    return results
+
+@st.cache_data(ttl=CONNECTION_TEST_TTL, show_spinner=False)
+def shared_probe_databases(targets):
+    """全データベースに接続できた結果だけを CONNECTION_TEST_TTL 秒間全セッションで共有する
+
+    続けて押された接続テストでNotionへのリクエストが重ならないようにする。
+    失敗・タイムアウトを含む結果は ProbeFailed で返し、キャッシュしない。
+    """
+    results = probe_databases(targets)
+    if any(probe["latency"] is None for probe in results):
+        raise ProbeFailed(results)
+    return results, time.time()
+
+def test_notion_connection(refresh=False):
+    """Notion API接続テスト（設定済みのデータベースを並行してテスト）
+
+    refresh=True（再テスト）の場合は共有中の結果を捨てて取り直す。
+    """
     try:
         notion_api_key = st.secrets.get("NOTION_API_KEY")
         
         if not notion_api_key:
             return False, "NOTION_API_KEYが設定されていません"
         
-        results = []
-        
-        # 簡易版DB
-        simple_db_id = st.secrets.get("NOTION_DATABASE_ID")
-        if simple_db_id:
-            results.append(test_database_connection("OmniSorter依頼DB", simple_db_id, notion_api_key))
-        else:
-            results.append("❌ OmniSorter依頼DB: 未設定")
-        
-        # マスタ連携用DB
-        customer_db_id = st.secrets.get("CUSTOMER_DB_ID")
-        if customer_db_id:
-            results.append(test_database_connection("顧客企業マスタ", customer_db_id, notion_api_key))
-        else:
-            results.append("⚠️ 顧客企業マスタ: 未設定")
+        # (表示名, 設定キー, 未設定時の表示)
+        databases = [
+            ("OmniSorter依頼DB", "NOTION_DATABASE_ID", "❌"),
+            ("顧客企業マスタ", "CUSTOMER_DB_ID", "⚠️"),
+            ("案件管理データベース", "PROJECT_DB_ID", "⚠️")
+        ]
+        targets = tuple((db_name, st.secrets.get(key)) for db_name, key, _ in databases if st.secrets.get(key))
+        if refresh:
+            shared_probe_databases.clear()
+        try:
+            probes, checked_at = shared_probe_databases(targets) if targets else ([], time.time())
+        except ProbeFailed as e:
+            probes, checked_at = e.results, time.time()
+        probe_by_name = {db_name: probe for (db_name, _), probe in zip(targets, probes)}
         
-        project_db_id = st.secrets.get("PROJECT_DB_ID")
-        if project_db_id:
-            results.append(test_database_connection("案件管理データベース", project_db_id, notion_api_key))
-        else:
-            results.append("⚠️ 案件管理データベース: 未設定")
+        results = []
+        for db_name, _, missing_mark in databases:
+            probe = probe_by_name.get(db_name)
+            if probe is None:
+                results.append(f"{missing_mark} {db_name}: 未設定")
+                continue
+            result = probe["message"]
+            if probe["latency"] is not None:
+                result += f"\n応答時間: {probe['latency'] * 1000:.0f}ms / プロパティ数: {probe['property_count']}"
+            results.append(result)
         
         has_success = any("✅" in result for result in results)
-        return has_success, "\n\n".join(results)
+        message = "\n\n".join(results)
+        age = time.time() - checked_at
+        if age >= 1:
+            message += f"\n\n（{age:.0f}秒前の結果）"
+        return has_success, message
             
     except Exception as e:
         return False, f"全体エラー: {str(e)}"
 
-@st.cache_data(ttl=300)
-def fetch_customers():
-    """顧客企業マスタから顧客一覧を取得"""
-    customer_db_id = st.secrets.get("CUSTOMER_DB_ID")
-    if not customer_db_id:
-        return []
+def customer_from_page(page):
+    """顧客ページを {id, name} に変換"""
+    company_name = ""
+    if page["properties"].get("会社名", {}).get("title"):
+        company_name = page["properties"]["会社名"]["title"][0]["text"]["content"]
     
-    url = f"https://api.notion.com/v1/databases/{customer_db_id}/query"
-    headers = {
-        "Authorization": f"Bearer {st.secrets['NOTION_API_KEY']}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
+    return {
+        "id": page["id"],
+        "name": company_name
     }
+
+def project_from_page(page):
+    """案件ページを {id, name, customer_ids} に変換（案件名が空ならNone）"""
+    project_name = ""
     
-    try:
-        response = requests.post(url, headers=headers, json={})
-        if response.status_code == 200:
-            data = response.json()
-            customers = []
-            for page in data.get("results", []):
-                company_name = ""
-                if page["properties"].get("会社名", {}).get("title"):
-                    company_name = page["properties"]["会社名"]["title"][0]["text"]["content"]
-                
-                customers.append({
-                    "id": page["id"],
-                    "name": company_name
-                })
-            return customers
+    # タイトルプロパティを自動検出
+    for prop_name, prop_data in page["properties"].items():
+        if prop_data.get("type") == "title":
+            if prop_data.get("title") and len(prop_data["title"]) > 0:
+                project_name = prop_data["title"][0]["text"]["content"]
+                break
+    
+    if not project_name:
+        return None
+    
+    # 顧客企業リレーション
+    relation = page["properties"].get(CUSTOMER_RELATION_PROPERTY, {}).get("relation", [])
+    return {
+        "id": page["id"],
+        "name": project_name,
+        "customer_ids": [related["id"] for related in relation]
+    }
+
+@st.cache_resource
+def get_master_mirror():
+    """顧客・案件マスタのローカルミラーを取得"""
+    return MasterMirror(st.secrets.get("MASTER_CACHE_PATH", DEFAULT_MIRROR_PATH))
+
+@st.cache_resource
+def get_entity_resolver():
+    """顧客・案件のID→名前解決キャッシュを取得（プロセスで共有）"""
+    return EntityResolver()
+
+@st.cache_resource
+def get_shared_cache():
+    """マスタ一覧の共有キャッシュ（MASTER_CACHE_URL でレプリカ間・プロセス間で共有）"""
+    return SharedCache(open_cache(st.secrets.get("MASTER_CACHE_URL")))
+
+def master_cache_name(kind):
+    """共有キャッシュのキー名（DBごとに分ける）"""
+    return f"{kind}:{st.secrets.get(MASTER_CACHE_KINDS[kind])}"
+
+def publish_master(kind, generation=None):
+    """ミラーの一覧を共有キャッシュに保存するジョブ関数を返す（バックグラウンドスレッドから呼べる）"""
+    cache = get_shared_cache()
+    mirror = get_master_mirror()
+    name = master_cache_name(kind)
+    return lambda: cache.set(name, mirror.snapshot(kind), MASTER_SYNC_INTERVAL, generation)
+
+@st.cache_resource(ttl=MASTER_SYNC_INTERVAL, show_spinner=False)
+def customer_sync():
+    """顧客企業マスタの差分同期ジョブ（バックグラウンドで開始して待たずに返す）
+
+    同期が終わったらミラーの一覧を共有キャッシュに保存する。
+    """
+    customer_db = get_notion_client().database("CUSTOMER_DB_ID")
+    if not customer_db:
+        return None
+    mirror = get_master_mirror()
+    # 同期中に他のプロセスが無効化した場合、古い一覧で新しい世代を上書きしないよう世代を先に読む
+    publish = publish_master("customers", get_shared_cache().generation(master_cache_name("customers")))
+    
+    def sync(on_batch):
+        mirror.sync_customers(customer_db, customer_from_page, on_batch)
+        publish()
+    
+    return BackgroundSync(sync).start(wait_first=False)
+
+@st.cache_resource(ttl=MASTER_SYNC_INTERVAL, show_spinner=False)
+def project_sync():
+    """案件管理データベースの差分同期ジョブ（バックグラウンドで開始して待たずに返す）
+
+    同期が終わったらミラーの一覧を共有キャッシュに保存する。
+    """
+    project_db = get_notion_client().database("PROJECT_DB_ID")
+    if not project_db:
+        return None
+    mirror = get_master_mirror()
+    publish = publish_master("projects", get_shared_cache().generation(master_cache_name("projects")))
+    
+    def sync(on_batch):
+        mirror.sync_projects(project_db, project_from_page, on_batch)
+        publish()
+    
+    return BackgroundSync(sync).start(wait_first=False)
+
+MASTER_SYNCS = {"customers": customer_sync, "projects": project_sync}
+
+def master_snapshot(kind, record=True):
+    """マスタ一覧を {version, items} で取得し、(スナップショット, 同期ジョブ) を返す
+
+    共有キャッシュにあればそれを使い、同期ジョブは動かさない（ジョブはNone）。
+    なければローカルミラーから読み（空なら最初のページまで待つ）、
+    同期ジョブの完了時に共有キャッシュへ保存される。
+    キャッシュの参照・ミスは一覧を表示する fetch_customers / fetch_projects
+    （1回の再実行で1回）だけが記録し、同じ再実行での読み直しは record=False にする。
+    """
+    if record:
+        record_cache_lookup(kind)
+    snapshot = get_shared_cache().get(master_cache_name(kind))
+    if snapshot is not None:
+        return snapshot, None
+    
+    if record:
+        record_cache_miss(kind)
+    job = MASTER_SYNCS[kind]()
+    if job is None:
+        return {"version": None, "items": []}, None
+    mirror = get_master_mirror()
+    job.start(wait_first=mirror.count(kind) == 0)
+    return mirror.snapshot(kind), job
+
+def master_sync_job(kind):
+    """共有キャッシュになくミラーから読んでいるときの同期ジョブ（進捗表示用）"""
+    if get_shared_cache().exists(master_cache_name(kind)):
+        return None
+    return MASTER_SYNCS[kind]()
+
+def fetch_customers():
+    """顧客企業マスタから顧客一覧を取得（共有キャッシュまたはローカルミラーから読み込み）"""
+    snapshot, job = master_snapshot("customers")
+    
+    if job and job.error:
+        if isinstance(job.error, NotionAPIError):
+            st.error(f"顧客情報の取得に失敗: {job.error.status_code}")
         else:
-            st.error(f"顧客情報の取得に失敗: {response.status_code}")
-            return []
-    except Exception as e:
-        st.error(f"顧客情報取得エラー: {str(e)}")
-        return []
+            st.error(f"顧客情報取得エラー: {str(job.error)}")
+        # 次回の再実行で同期し直す
+        customer_sync.clear()
+    return snapshot["items"]
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def customer_search_index(version, _customers):
+    """顧客名の検索インデックス（一覧の内容が変わったときだけ再構築）"""
+    record_cache_miss("customer_search_index")
+    return SearchIndex(_customers)
+
+def search_customers(query, limit=CUSTOMER_SEARCH_LIMIT):
+    """顧客名で検索して上位limit件を返す"""
+    # 同じ再実行の fetch_customers で記録済み
+    snapshot, _ = master_snapshot("customers", record=False)
+    index = customer_search_index(snapshot["version"], snapshot["items"])
+    record_cache_lookup("customer_search_index")
+    customers = index.search(query, limit)
+    # 選択肢に出した顧客は保存時の名前解決に使う
+    get_entity_resolver().put_many(customers)
+    return customers
+
+def prefetch_projects():
+    """顧客を選ぶ前に案件一覧の同期をバックグラウンドで始めておく（待たずに返す）
+
+    顧客の選択時には同期が進んでいるので、案件の選択肢を出すときに
+    最初のページの到着を待たずに済む。同期のリクエストは画面操作からの
+    リクエストに譲るので、保存などを遅らせない。
+    """
+    job = master_sync_job("projects")
+    if job:
+        job.start(wait_first=False)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def project_index(version, _projects):
+    """顧客ID→案件一覧の対応表（一覧の内容が変わったときだけ作り直す）"""
+    record_cache_miss("project_index")
+    return index_projects(_projects)
 
-@st.cache_data(ttl=300)
 def fetch_projects(customer_id=None):
-    """案件管理データベースから案件一覧を取得"""
-    project_db_id = st.secrets.get("PROJECT_DB_ID")
-    if not project_db_id:
-        return []
+    """案件管理データベースから案件一覧を取得（共有キャッシュまたはローカルミラーから読み込み）"""
+    snapshot, job = master_snapshot("projects")
     
-    url = f"https://api.notion.com/v1/databases/{project_db_id}/query"
-    headers = {
-        "Authorization": f"Bearer {st.secrets['NOTION_API_KEY']}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
+    if job and job.error:
+        if isinstance(job.error, NotionAPIError):
+            st.error(f"案件情報の取得に失敗: {job.error.status_code}")
+            st.error(f"レスポンス: {job.error.message}")
+        else:
+            st.error(f"案件情報取得エラー: {str(job.error)}")
+        project_sync.clear()
+    if not customer_id:
+        return [{"id": project["id"], "name": project["name"]} for project in snapshot["items"]]
     
-    # 顧客でフィルター（正しいプロパティ名「顧客企業」を使用）
-    payload = {}
-    if customer_id:
-        payload = {
-            "filter": {
-                "property": "会社名_拠点名",
-                "relation": {
-                    "contains": customer_id
-                }
-            }
-        }
+    record_cache_lookup("project_index")
+    projects = project_index(snapshot["version"], snapshot["items"]).get(customer_id, [])
+    get_entity_resolver().put_many(projects, customer_id)
+    return projects
+
+def show_loading_progress(job, label):
+    """バックグラウンド同期中なら件数と反映ボタンを表示"""
+    if job is None or job.done:
+        return
     
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            projects = []
-            for page in data.get("results", []):
-                project_name = ""
-                
-                # タイトルプロパティを自動検出
-                for prop_name, prop_data in page["properties"].items():
-                    if prop_data.get("type") == "title":
-                        if prop_data.get("title") and len(prop_data["title"]) > 0:
-                            project_name = prop_data["title"][0]["text"]["content"]
-                            break
-                
-                if project_name:
-                    projects.append({
-                        "id": page["id"],
-                        "name": project_name
-                    })
-            
-            return projects
-        else:
-            st.error(f"案件情報の取得に失敗: {response.status_code}")
-            st.error(f"レスポンス: {response.text}")
-            return []
-    except Exception as e:
-        st.error(f"案件情報取得エラー: {str(e)}")
-        return []
+    info_col, button_col = st.columns([3, 1])
+    with info_col:
+        st.caption(f"⏳ {label}を同期中です（{job.count}件取得済み）")
+    with button_col:
+        if st.button("🔄 最新を反映", key=f"refresh_{label}"):
+            st.rerun()
 
 def create_new_customer(company_name):
     """新規顧客を顧客企業マスタに作成"""
-    customer_db_id = st.secrets.get("CUSTOMER_DB_ID")
-    if not customer_db_id:
+    customer_db = get_notion_client().database("CUSTOMER_DB_ID")
+    if not customer_db:
         return None, "顧客企業マスタDBが設定されていません"
     
-    # まずデータベースの構造を取得して、存在するプロパティを確認
-    db_url = f"https://api.notion.com/v1/databases/{customer_db_id}"
-    headers = {
-        "Authorization": f"Bearer {st.secrets['NOTION_API_KEY']}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
-    
-    try:
-        # データベース構造を取得
-        db_response = requests.get(db_url, headers=headers)
-        if db_response.status_code != 200:
-            return None, f"データベース情報の取得に失敗: {db_response.status_code}"
-        
-        db_data = db_response.json()
-        available_properties = db_data.get("properties", {})
-        
-        # タイトルプロパティを自動検出
-        title_property = None
-        for prop_name, prop_data in available_properties.items():
-            if prop_data.get("type") == "title":
-                title_property = prop_name
-                break
-        
-        properties = {}
-        
-        if title_property:
-            properties[title_property] = {
+    def build_properties(schema):
+        # タイトルプロパティ（スキーマから自動検出、なければ "企業" を試す）
+        return {
+            schema.title_property or "企業": {
                 "title": [{"text": {"content": company_name}}]
             }
-        else:
-            # デフォルトで "企業" を試す
-            properties["企業"] = {
-                "title": [{"text": {"content": company_name}}]
-            }
-        
-        # 顧客作成
-        url = "https://api.notion.com/v1/pages"
-        payload = {
-            "parent": {"database_id": customer_db_id},
-            "properties": properties
         }
-        
-        response = requests.post(url, headers=headers, json=payload)
+    
+    try:
+        # 顧客作成（スキーマはレジストリのキャッシュを使用）
+        response, schema, properties = customer_db.create_page_from_schema(build_properties)
         if response.status_code == 200:
             data = response.json()
+            get_entity_resolver().put(data["id"], company_name)
+            add_master_entity("customers", data, {"id": data["id"], "name": company_name})
             return data["id"], None
         else:
             # デバッグ情報を含むエラーメッセージ
             error_details = {
                 "status": response.status_code,
                 "response": response.text,
-                "available_properties": list(available_properties.keys()),
+                "available_properties": list(schema.properties.keys()),
                 "used_properties": list(properties.keys())
             }
             return None, f"顧客作成に失敗: {json.dumps(error_details, ensure_ascii=False, indent=2)}"
             
+    except NotionAPIError as e:
+        return None, f"データベース情報の取得に失敗: {e.status_code}"
     except Exception as e:
         return None, f"顧客作成エラー: {str(e)}"
 
+# 案件作成時に設定するオプショナルプロパティの候補（存在する最初の1つだけ設定）
+PROJECT_OPTIONAL_PROPERTIES = ["開始日", "ステータス", "状態", "Status"]
+
 def create_new_project(project_name, customer_id):
     """新規案件を案件管理データベースに作成"""
-    project_db_id = st.secrets.get("PROJECT_DB_ID")
-    if not project_db_id:
+    project_db = get_notion_client().database("PROJECT_DB_ID")
+    if not project_db:
         return None, "案件管理DBが設定されていません"
     
-    # まずデータベースの構造を取得して、存在するプロパティを確認
-    db_url = f"https://api.notion.com/v1/databases/{project_db_id}"
-    headers = {
-        "Authorization": f"Bearer {st.secrets['NOTION_API_KEY']}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
-    
-    try:
-        # データベース構造を取得
-        db_response = requests.get(db_url, headers=headers)
-        if db_response.status_code != 200:
-            return None, f"データベース情報の取得に失敗: {db_response.status_code}"
-        
-        db_data = db_response.json()
-        available_properties = db_data.get("properties", {})
-        
-        # 基本プロパティ（必須）
-        properties = {}
-        
-        # タイトルプロパティを自動検出
-        title_property = None
-        for prop_name, prop_data in available_properties.items():
-            if prop_data.get("type") == "title":
-                title_property = prop_name
-                break
-        
-        if title_property:
-            properties[title_property] = {
-                "title": [{"text": {"content": project_name}}]
-            }
-        else:
-            # デフォルトで "案件名" を試す
-            properties["案件名"] = {
+    def build_properties(schema):
+        # タイトルプロパティ（スキーマから自動検出、なければ "案件名" を試す）
+        properties = {
+            schema.title_property or "案件名": {
                 "title": [{"text": {"content": project_name}}]
             }
+        }
         
         # 顧客企業リレーション（存在する場合のみ）
-        if "企業" in available_properties:
-            properties["企業"] = {
+        if schema.has(CUSTOMER_RELATION_PROPERTY):
+            properties[CUSTOMER_RELATION_PROPERTY] = {
                 "relation": [{"id": customer_id}]
             }
         
-        # オプショナルプロパティ（存在する場合のみ追加）
-        optional_properties = {
-            "開始日": {
+        # オプショナルプロパティ（存在する場合のみ追加、ステータス系は1つだけ設定）
+        optional_property = schema.first_available(PROJECT_OPTIONAL_PROPERTIES)
+        if optional_property == "開始日":
+            properties["開始日"] = {
                 "date": {"start": datetime.now().strftime("%Y-%m-%d")}
-            },
-            "ステータス": {
-                "select": {"name": "進行中"}
-            },
-            "状態": {  # 別の可能性
-                "select": {"name": "進行中"}
-            },
-            "Status": {  # 英語の可能性
+            }
+        elif optional_property:
+            properties[optional_property] = {
                 "select": {"name": "進行中"}
             }
-        }
-        
-        # 存在するプロパティのみを追加
-        for prop_name, prop_value in optional_properties.items():
-            if prop_name in available_properties:
-                properties[prop_name] = prop_value
-                break  # ステータス系は1つだけ設定
-        
-        # 案件作成
-        url = "https://api.notion.com/v1/pages"
-        payload = {
-            "parent": {"database_id": project_db_id},
-            "properties": properties
-        }
-        
-        response = requests.post(url, headers=headers, json=payload)
+        return properties
+    
+    try:
+        # 案件作成（スキーマはレジストリのキャッシュを使用）
+        response, schema, properties = project_db.create_page_from_schema(build_properties)
         if response.status_code == 200:
             data = response.json()
+            get_entity_resolver().put(data["id"], project_name, [customer_id])
+            add_master_entity("projects", data, {"id": data["id"], "name": project_name, "customer_ids": [customer_id]})
             return data["id"], None
         else:
             # デバッグ情報を含むエラーメッセージ
             error_details = {
                 "status": response.status_code,
                 "response": response.text,
-                "available_properties": list(available_properties.keys()),
+                "available_properties": list(schema.properties.keys()),
                 "used_properties": list(properties.keys())
             }
             return None, f"案件作成に失敗: {json.dumps(error_details, ensure_ascii=False, indent=2)}"
             
+    except NotionAPIError as e:
+        return None, f"データベース情報の取得に失敗: {e.status_code}"
     except Exception as e:
         return None, f"案件作成エラー: {str(e)}"
 
-def save_omnisorter_request(project_id, data):
-    """OmniSorter依頼をデータベースに保存"""
-    # まずマスタ連携用のDBを試す
-    request_db_id = st.secrets.get("OMNISORTER_REQUEST_DB_ID")
-    
-    # マスタ連携用が未設定の場合は簡易版DBを使用（メッセージ非表示）
-    if not request_db_id:
-        request_db_id = st.secrets.get("NOTION_DATABASE_ID")
-    
-    if not request_db_id:
-        st.error("保存先データベースIDが設定されていません。")
-        return False
-    
-    url = "https://api.notion.com/v1/pages"
-    headers = {
-        "Authorization": f"Bearer {st.secrets['NOTION_API_KEY']}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
-    
-    # 簡易版DBの場合は案件名も保存
-    properties = {}
-    
-    # 案件プロパティ（リレーション対応DBの場合）
-    if st.secrets.get("OMNISORTER_REQUEST_DB_ID"):
-        properties["案件"] = {
-            "relation": [{"id": project_id}]
-        }
-    else:
-        # 簡易版DBの場合は案件名を直接保存
-        # プロジェクトIDから案件名を取得
-        try:
-            project_info = get_project_info(project_id)
-            if project_info:
-                properties["案件名"] = {
-                    "rich_text": [{"text": {"content": project_info["name"]}}]
-                }
-                properties["顧客名"] = {
-                    "title": [{"text": {"content": project_info["customer_name"]}}]
-                }
-        except:
-            properties["案件名"] = {
-                "rich_text": [{"text": {"content": "マスタ連携案件"}}]
-            }
-            properties["顧客名"] = {
-                "title": [{"text": {"content": "マスタ連携顧客"}}]
-            }
-    
-    # 仕様詳細を見やすい形式で整形
-    spec_text = format_specifications_for_notion(data["仕様詳細"])
-    
-    # 共通プロパティ
-    properties.update({
-        "依頼日": {
-            "date": {"start": datetime.now().strftime("%Y-%m-%d")}
-        },
-        "依頼種別": {
-            "select": {"name": data["依頼種別"]}
-        },
-        "依頼機種": {
-            "select": {"name": data.get("OS機種", "未選択")}
-        },
-        "ステータス": {
-            "select": {"name": "依頼中"}
-        },
-        "見積依頼文": {
-            "rich_text": [{"text": {"content": data["見積依頼文"][:2000]}}]
-        },
-        "図面依頼文": {
-            "rich_text": [{"text": {"content": data["図面依頼文"][:2000]}}]
-        },
-        "仕様詳細": {
-            "rich_text": [{"text": {"content": spec_text[:2000]}}]
-        },
-        "備考": {
-            "rich_text": [{"text": {"content": data.get("備考", "")[:2000]}}]
-        }
-    })
-    
-    payload = {
-        "parent": {"database_id": request_db_id},
-        "properties": properties
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code == 200:
-            return True
-        else:
-            st.error(f"OmniSorter依頼保存に失敗: {response.status_code}")
-            st.error(f"レスポンス: {response.text}")
-            return False
-    except Exception as e:
-        st.error(f"OmniSorter依頼保存エラー: {str(e)}")
-        return False
+# 送信キュー（保存はキューに登録して即座に戻り、バックグラウンドでNotionに送信）
+@st.cache_resource
+def get_outbox():
+    """プロセス共通の送信キューを取得"""
+    return Outbox(st.secrets.get("OUTBOX_PATH", DEFAULT_OUTBOX_PATH))
 
-def format_specifications_for_notion(specs_dict):
-    """仕様詳細をNotion用に見やすく整形"""
-    if not specs_dict:
-        return "仕様情報なし"
-    
-    formatted_text = "【仕様詳細】\n\n"
-    
-    # カテゴリごとに整理
-    categories = {
-        "OS機種": [],
-        "本体構成": [],
-        "設置容器": [],
-        "仕分け商品": [],
-        "オプション": [],
-        "自動計算値": []
+@st.cache_resource
+def get_outbox_worker():
+    """送信キューを処理するワーカーを開始（プロセスで1つ）"""
+    client = get_notion_client()
+    resolver = get_entity_resolver()
+    senders = {
+        "simple": lambda payload, delivery: save_request(
+            client, client.database_ids.get("NOTION_DATABASE_ID"), payload["data"], delivery
+        ),
+        "master": lambda payload, delivery: save_master_request(
+            client, payload["project_id"], payload["data"], resolver, delivery
+        )
     }
-    
-    for key, value in specs_dict.items():
-        if "-" in key:
-            category, item = key.split("-", 1)
-            if category in categories:
-                categories[category].append(f"  • {item}: {value}")
-        elif key in ["間口数", "面数"]:
-            categories["自動計算値"].append(f"  • {key}: {value}")
-    
-    # カテゴリごとに出力
-    for category, items in categories.items():
-        if items:
-            formatted_text += f"{category}:\n"
-            formatted_text += "\n".join(items)
-            formatted_text += "\n\n"
-    
-    return formatted_text
+    return OutboxWorker(get_outbox(), senders).start()
 
-def get_project_info(project_id):
-    """プロジェクトIDから案件情報を取得"""
-    try:
-        url = f"https://api.notion.com/v1/pages/{project_id}"
-        headers = {
-            "Authorization": f"Bearer {st.secrets['NOTION_API_KEY']}",
-            "Notion-Version": "2022-06-28"
-        }
-        
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            
-            # 案件名を取得
-            project_name = ""
-            for prop_name, prop_data in data["properties"].items():
-                if prop_data.get("type") == "title":
-                    if prop_data.get("title") and len(prop_data["title"]) > 0:
-                        project_name = prop_data["title"][0]["text"]["content"]
-                        break
-            
-            # 顧客名を取得（リレーションから）
-            customer_name = ""
-            customer_relation = data["properties"].get("顧客企業", {}).get("relation", [])
-            if customer_relation:
-                customer_id = customer_relation[0]["id"]
-                customer_info = get_customer_info(customer_id)
-                if customer_info:
-                    customer_name = customer_info["name"]
-            
-            return {
-                "name": project_name,
-                "customer_name": customer_name
-            }
-    except Exception as e:
-        st.error(f"案件情報取得エラー: {str(e)}")
-    
-    return None
+# 同じ内容の依頼がすでに送信キューにあったときの案内（既存エントリの状態 → 文言）
+OUTBOX_DUPLICATE_NOTICES = {
+    STATUS_SENT: "同じ内容の依頼は保存済みです（新しいページは作成しません）。",
+    STATUS_FAILED: "同じ内容の依頼の送信が失敗していたため、再送します。"
+}
 
-def get_customer_info(customer_id):
-    """顧客IDから顧客情報を取得"""
+def enqueue_save(kind, payload, label):
+    """保存内容を送信キューに登録し、(送信されるか, 案内) を返す
+
+    同じ内容の依頼がすでにあれば新しく登録せず、失敗していたものは再送する。
+    送信待ち・保存済みの重複は送信しない（案内で知らせる）。
+    """
     try:
-        url = f"https://api.notion.com/v1/pages/{customer_id}"
-        headers = {
-            "Authorization": f"Bearer {st.secrets['NOTION_API_KEY']}",
-            "Notion-Version": "2022-06-28"
-        }
-        
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            data = response.json()
-            
-            company_name = ""
-            if data["properties"].get("会社名", {}).get("title"):
-                company_name = data["properties"]["会社名"]["title"][0]["text"]["content"]
-            
-            return {"name": company_name}
+        _, existing_status = get_outbox().enqueue(
+            kind, payload, session_id=st.session_state.outbox_session_id, label=label
+        )
     except Exception as e:
-        st.error(f"顧客情報取得エラー: {str(e)}")
-    
-    return None
+        st.error(f"送信キューへの登録エラー: {str(e)}")
+        return False, None
+    if existing_status is None:
+        get_outbox_worker().notify()
+        return True, None
+    notice = OUTBOX_DUPLICATE_NOTICES.get(existing_status, "同じ内容の依頼を送信中です。送信状況で結果を確認できます。")
+    if existing_status == STATUS_FAILED:
+        get_outbox_worker().notify()
+        return True, notice
+    return False, notice
+
+def save_omnisorter_request(project_id, data, label=None):
+    """OmniSorter依頼を送信キューに登録（マスタ連携版）"""
+    if not st.secrets.get("OMNISORTER_REQUEST_DB_ID") and not st.secrets.get("NOTION_DATABASE_ID"):
+        st.error("保存先データベースIDが設定されていません。")
+        return False, None
+    return enqueue_save("master", {"project_id": project_id, "data": data}, label)
 
 def save_to_notion(data):
-    """Notionデータベースに保存（簡易版）"""
+    """Notionデータベースへの保存を送信キューに登録（簡易版）"""
     notion_api_key = st.secrets.get("NOTION_API_KEY")
     database_id = st.secrets.get("NOTION_DATABASE_ID")
     
     if not notion_api_key or not database_id:
         st.error("Notion設定が不完全です。NOTION_API_KEYとNOTION_DATABASE_IDを設定してください。")
-        return False
-    
-    url = "https://api.notion.com/v1/pages"
-    headers = {
-        "Authorization": f"Bearer {notion_api_key}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28"
-    }
-    
-    properties = {}
+        return False, None
     
-    # 必須フィールド - 顧客名をタイトルに設定
-    if data.get("顧客名"):
-        properties["顧客名"] = {
-            "title": [{"text": {"content": str(data["顧客名"])[:100]}}]
-        }
-    
-    # その他のフィールド
-    if data.get("案件名"):
-        properties["案件名"] = {
-            "rich_text": [{"text": {"content": str(data["案件名"])[:2000]}}]
-        }
-    
-    if data.get("依頼日"):
-        properties["依頼日"] = {
-            "date": {"start": str(data["依頼日"])}
-        }
-    
-    if data.get("依頼種別"):
-        properties["依頼種別"] = {
-            "select": {"name": str(data["依頼種別"])}
-        }
-    
-    if data.get("OS機種"):
-        properties["依頼機種"] = {
-            "select": {"name": str(data["OS機種"])}
-        }
-    
-    properties["ステータス"] = {
-        "select": {"name": "依頼中"}
-    }
-    
-    # 長いテキストフィールドは分割して保存
-    if data.get("見積依頼文"):
-        text = str(data["見積依頼文"])[:2000]
-        properties["見積依頼文"] = {
-            "rich_text": [{"text": {"content": text}}]
-        }
-    
-    if data.get("図面依頼文"):
-        text = str(data["図面依頼文"])[:2000]
-        properties["図面依頼文"] = {
-            "rich_text": [{"text": {"content": text}}]
-        }
-    
-    if data.get("仕様詳細"):
-        spec_text = format_specifications_for_notion(data["仕様詳細"])
-        properties["仕様詳細"] = {
-            "rich_text": [{"text": {"content": spec_text[:2000]}}]
-        }
+    return enqueue_save("simple", {"data": data}, f"{data['顧客名']} / {data['案件名']}")
+
+def show_outbox_status():
+    """このセッションで登録した保存の送信状況を表示"""
+    outbox = get_outbox()
+    entries = outbox.entries(st.session_state.outbox_session_id, OUTBOX_DISPLAY_LIMIT)
+    if not entries:
+        return
     
-    if data.get("備考"):
-        properties["備考"] = {
-            "rich_text": [{"text": {"content": str(data["備考"])[:2000]}}]
+    st.markdown('<div class="section-header"><h3>📮 送信状況</h3></div>', unsafe_allow_html=True)
+    for entry in entries:
+        created_at = datetime.fromtimestamp(entry["created_at"]).strftime("%H:%M:%S")
+        status_label = OUTBOX_STATUS_LABELS.get(entry["status"], entry["status"])
+        status_col, retry_col = st.columns([5, 1])
+        with status_col:
+            st.text(f"{created_at} {entry['label'] or '依頼'}: {status_label}")
+            if entry["status"] in (STATUS_RETRY, STATUS_PARTIAL, STATUS_FAILED) and entry["detail"]:
+                st.caption(entry["detail"])
+            if entry["status"] in (STATUS_PARTIAL, STATUS_FAILED) and entry["page_id"]:
+                # 再送しても作成はやり直さず、このページへの本文の追記だけを行う
+                st.caption(f"作成済みのページ: {entry['page_id']}")
+        with retry_col:
+            if entry["status"] == STATUS_FAILED:
+                if st.button("再送", key=f"outbox_retry_{entry['id']}"):
+                    outbox.requeue(entry["id"])
+                    get_outbox_worker().notify()
+                    st.rerun()
+    if st.button("🔄 送信状況を更新", key="outbox_refresh"):
+        st.rerun()
+
+# メトリクス（Notion API呼び出し・再実行時間・キャッシュ）
+@st.cache_resource
+def start_metrics_exporter():
+    """依頼文・名前解決キャッシュをメトリクスに登録し、METRICS_PORT があれば /metrics を公開"""
+    def internal_cache_lookups():
+        resolver = get_entity_resolver()
+        render_stats = RENDER_CACHE.stats()
+        return {
+            ("render", "hit"): render_stats["hits"], ("render", "miss"): render_stats["misses"],
+            ("entity_resolver", "hit"): resolver.hits, ("entity_resolver", "miss"): resolver.misses
         }
-    
-    payload = {
-        "parent": {"database_id": database_id},
-        "properties": properties
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        
-        if response.status_code == 200:
-            return True
-        else:
-            st.error(f"Notion API エラー: {response.status_code}")
-            st.error(f"レスポンス: {response.text}")
-            return False
-            
-    except requests.exceptions.Timeout:
-        st.error("リクエストがタイムアウトしました")
-        return False
-    except Exception as e:
-        st.error(f"保存エラー: {str(e)}")
-        return False
 
-# 計算関数
-def calculate_grid_count(rows, cols, blocks):
-    """間口数を計算（段×列×2×ブロック数）"""
-    if rows and cols and blocks:
-        try:
-            return int(rows) * int(cols) * 2 * int(blocks)
-        except (ValueError, TypeError):
-            return 0
-    return 0
-
-def calculate_surface_count(blocks):
-    """面数を計算（ブロック数×2）"""
-    if blocks:
-        try:
-            return int(blocks) * 2
-        except (ValueError, TypeError):
-            return 0
-    return 0
-
-def get_cart_options(surface_count):
-    """追加カート選択肢を生成"""
-    if surface_count <= 0:
-        return [""]
-    
-    options = [""]
-    for multiplier in [0.5, 1, 1.5, 2]:
-        value = int(surface_count * multiplier)
-        options.append(f"{value}台 ({multiplier}倍)")
-    options.append("自由入力")
-    return options
-
-def get_tote_options(grid_count):
-    """追加トート選択肢を生成"""
-    if grid_count <= 0:
-        return [""]
-    
-    options = [""]
-    for multiplier in [0.5, 1, 1.5, 2]:
-        value = int(grid_count * multiplier)
-        options.append(f"{value}個 ({multiplier}倍)")
-    options.append("自由入力")
-    return options
-
-def generate_quotation_text(form_data):
-    """見積依頼文生成"""
-    quotation_items = [item for item in FORM_ITEMS if "見積" in item["必要種別"]]
-    
-    content = "OmniSorter見積依頼\n\n【基本仕様】\n"
-    
-    # 自動計算値を追加
-    grid_count = form_data.get("間口数")
-    
-    # カテゴリごとにグループ化
-    groups = {}
-    for item in quotation_items:
-        key = f"{item['大項目']}-{item['小項目']}"
-        if key in form_data and form_data[key]:
-            category = item["大項目"]
-            if category not in groups:
-                groups[category] = []
-            
-            label = "" if item["小項目"] == "-" else item["小項目"]
-            value = form_data[key]
-            if "mm単位" in item["備考"]:
-                value = f"{value}[mm]"
-            
-            groups[category].append({"label": label, "value": value})
-    
-    # 自動計算値を本体構成に追加
-    if grid_count:
-        if "本体構成" not in groups:
-            groups["本体構成"] = []
-        groups["本体構成"].append({"label": "間口数", "value": f"{grid_count}口"})
+    REGISTRY.callback("app_internal_cache_lookups_total", "依頼文・名前解決キャッシュの参照数",
+                      ("cache", "result"), internal_cache_lookups, kind="counter")
+    port = st.secrets.get("METRICS_PORT")
+    if not port:
+        return None
+    return start_metrics_server(int(port), st.secrets.get("METRICS_HOST", "0.0.0.0"))
+
+# 起動直後の準備（プロセスで1回だけ、最初の再実行の main() より前に開始）
+@st.cache_resource
+def warm_up():
+    """送信ワーカーを開始し、マスタの同期とNotionへの接続をバックグラウンドで済ませておく
+
+    次に開いたセッションやマスタ連携の初回表示で、Notionの応答を待たずに済むようにする。
+    ここではジョブとスレッドを開始するだけで待たない（同期のリクエストは画面操作からの
+    リクエストに譲るので、最初の画面表示を遅らせない）。
+    """
+    if not st.secrets.get("NOTION_API_KEY"):
+        return None
+    started_at = time.perf_counter()
+    client = get_notion_client()
+    # 前回のプロセスで未送信のエントリも送信する
+    get_outbox_worker()
+    # 共有キャッシュに一覧がある（他のプロセスが同期済み）マスタは同期しない
+    jobs = [job for job in map(master_sync_job, MASTER_CACHE_KINDS) if job]
     
-    for category, items in groups.items():
-        content += f"{category}:\n"
-        for item in items:
-            if item["label"]:
-                content += f"  {item['label']}: {item['value']}\n"
-            else:
-                content += f"  {item['value']}\n"
-        content += "\n"
+    def run():
+        # スキーマ取得で接続プールのコネクションを張っておく
+        for database_id in set(client.database_ids.values()):
+            try:
+                client.schemas.get(database_id)
+            except Exception:
+                pass
+        for job in jobs:
+            job.wait()
+        record_startup("warmup", time.perf_counter() - started_at)
     
-    content += "上記仕様にて見積をお願いいたします。\nよろしくお願いいたします。"
-    return content
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
 
-def generate_drawing_text(form_data):
-    """図面依頼文生成（英語）"""
-    drawing_items = [item for item in FORM_ITEMS if "図面" in item["必要種別"]]
+def show_metrics():
+    """再実行時間・Notion API呼び出し・キャッシュヒット率を表示（プロセス内の全セッション合計）"""
+    st.subheader("📈 メトリクス")
+    startup = dict(STARTUP)
+    if startup:
+        phases = [("import", "読み込み"), ("first_render", "初回表示"), ("warmup", "事前準備")]
+        st.text("起動: " + " / ".join(f"{label} {startup[phase] * 1000:.0f}ms" for phase, label in phases if phase in startup))
+    first_renders = FIRST_RENDER_DURATION.series().get(())
+    if first_renders:
+        p95 = FIRST_RENDER_DURATION.quantile(0.95)
+        mark = "✅" if p95 <= FIRST_RENDER_TARGET else "⚠️"
+        st.text(f"初回表示: {first_renders['count']}セッション / p95 {p95 * 1000:.0f}ms"
+                f"（目標 {FIRST_RENDER_TARGET * 1000:.0f}ms {mark}）")
+    reruns = RERUN_DURATION.series().get(())
+    if reruns:
+        st.text(f"再実行: {reruns['count']}回 / 平均 {reruns['sum'] / reruns['count'] * 1000:.0f}ms / "
+                f"p95 {RERUN_DURATION.quantile(0.95) * 1000:.0f}ms")
     
-    content = "OmniSorter Drawing Request\n\n【Specifications】\n"
+    errors = NOTION_ERRORS.values()
+    for labels, series in sorted(NOTION_LATENCY.series().items()):
+        method, endpoint, database = labels
+        st.text(f"{method} {endpoint} {database}: {series['count']}回（エラー {errors.get(labels, 0)}）"
+                f" 平均 {series['sum'] / series['count'] * 1000:.0f}ms / p95 {NOTION_LATENCY.quantile(0.95, *labels) * 1000:.0f}ms")
     
-    # 自動計算値を追加
-    grid_count = form_data.get("間口数")
+    misses = CACHE_MISSES.values()
+    for (cache,), lookups in sorted(CACHE_LOOKUPS.values().items()):
+        hits = max(0, lookups - misses.get((cache,), 0))
+        st.text(f"{cache}: ヒット率 {hits / lookups:.0%}（{hits} / {lookups}）")
     
-    # カテゴリごとにグループ化（英語）
-    groups = {}
-    for item in drawing_items:
-        key = f"{item['大項目']}-{item['小項目']}"
-        if key in form_data and form_data[key]:
-            category = TRANSLATE_CATEGORY.get(item["大項目"], item["大項目"])
-            if category not in groups:
-                groups[category] = []
-            
-            label = "" if item["小項目"] == "-" else TRANSLATE_ITEM.get(item["小項目"], item["小項目"])
-            value = TRANSLATE_VALUE.get(form_data[key], form_data[key])
-            if "mm単位" in item["備考"]:
-                value = f"{value}[mm]"
-            
-            groups[category].append({"label": label, "value": value})
+    shared_cache = get_shared_cache()
+    backend = st.secrets.get("MASTER_CACHE_URL", "memory://").split(":", 1)[0]
+    st.text(f"共有キャッシュ: {backend}（エラー {shared_cache.errors}回）")
     
-    # 自動計算値を追加
-    if grid_count:
-        if "Main Configuration" not in groups:
-            groups["Main Configuration"] = []
-        groups["Main Configuration"].append({"label": "Grid Count", "value": f"{grid_count} grids"})
-    
-    for category, items in groups.items():
-        content += f"{category}:\n"
-        for item in items:
-            if item["label"]:
-                content += f"  {item['label']}: {item['value']}\n"
-            else:
-                content += f"  {item['value']}\n"
-        content += "\n"
-    
-    content += "Please provide technical drawings based on the above specifications.\n"
-    content += "Thank you for your cooperation.\n\nBest regards,"
-    return content
-
-def should_show_field(item, form_data):
-    """条件付きフィールドの表示判定"""
-    if "スロープタイプの場合のみ" in item["備考"]:
-        return form_data.get("本体構成-間口タイプ") == "スロープ式"
-    elif "カート式の場合のみ" in item["備考"]:
-        return form_data.get("本体構成-間口タイプ") == "カート式"
-    elif "標準トートの場合のみ" in item["備考"]:
-        return form_data.get("設置容器-標準/個別") == "標準トート"
-    return True
+    if st.secrets.get("METRICS_PORT"):
+        st.caption(f"監視用: http://<ホスト>:{st.secrets.get('METRICS_PORT')}/metrics")
 
 def reset_form():
     """フォームをリセット"""
@@ -873,25 +754,32 @@ def reset_form():
     st.session_state.operation_in_progress = False
     st.session_state.last_operation = None
 
-def clear_cache():
-    """キャッシュをクリア"""
-    fetch_customers.clear()
-    fetch_projects.clear()
-    st.session_state.customers_cache_version += 1
-    st.session_state.projects_cache_version += 1
+def add_master_entity(kind, page, row):
+    """作成したページをミラーと共有キャッシュの一覧に直接追加（再同期しない）
+
+    対象の一覧（顧客または案件）の世代だけを上げてから保存し直すので、
+    古い一覧を読んでいた他のプロセスの同期結果で上書きされない。
+    """
+    get_master_mirror().put(kind, page, row)
+    get_shared_cache().invalidate(master_cache_name(kind))
+    publish_master(kind)()
 
 def main():
     # セッション状態を初期化
     init_session_state()
+    start_metrics_exporter()
     
     st.markdown('<h1 class="main-header">📦 OmniSorter 見積・図面依頼システム</h1>', unsafe_allow_html=True)
     
     # Notion接続テスト（サイドバーを初期状態で閉じる）
     with st.sidebar.expander("🔧 システム診断", expanded=False):
         st.header("🔧 システム状態")
+        # 同じセッションで2回目以降に押された場合は再テスト（共有中の結果を使わずに取り直す）
+        tested = st.session_state.connection_tested
         if st.button("接続テスト"):
+            st.session_state.connection_tested = True
             try:
-                success, message = test_notion_connection()
+                success, message = test_notion_connection(refresh=tested)
                 if success:
                     st.success("接続テスト結果:")
                     st.text(message)
@@ -928,9 +816,45 @@ def main():
             st.success("✅ マスタ連携モードが利用可能です")
         else:
             st.info("ℹ️ マスタ連携には2つのDBが必要です")
+        
+        # Notion APIのレート制限・再試行状況（プロセス内の全セッション合計）
+        if st.secrets.get("NOTION_API_KEY"):
+            st.subheader("🚦 Notion API 利用状況")
+            client = get_notion_client()
+            limiter_stats = client.limiter.stats()
+            st.text(f"レート上限: {limiter_stats['rate']}リクエスト/秒")
+            st.text(f"待機中のリクエスト: {limiter_stats['waiting']}件")
+            st.text(f"待機したリクエスト: {limiter_stats['waited']} / {limiter_stats['acquired']}件")
+            st.text(f"平均待機: {limiter_stats['average_wait']:.2f}秒 / 最大待機: {limiter_stats['max_wait']:.2f}秒")
+            retries = ", ".join(f"{status}: {count}回" for status, count in sorted(client.retry_counts.items()))
+            st.text(f"再試行: {retries or 'なし'}")
+            resolver = get_entity_resolver()
+            lookups = resolver.hits + resolver.misses
+            hit_rate = f"{resolver.hits / lookups:.0%}" if lookups else "-"
+            st.text(f"名前解決キャッシュ: {len(resolver)}件（ヒット率 {hit_rate}）")
+        
+        # 依頼文キャッシュ（プロセス内の全セッション合計）
+        render_stats = RENDER_CACHE.stats()
+        st.text(f"依頼文キャッシュ: {render_stats['size']}件（ヒット {render_stats['hits']} / ミス {render_stats['misses']}）")
+        
+        show_metrics()
+        
+        # このセッションの次の再実行をプロファイル（他のセッションには影響しない）
+        st.subheader("🔬 プロファイル")
+        profile_runs = st.number_input("計測する再実行の回数", min_value=1, max_value=20, value=3)
+        profile = st.session_state.profile_session
+        if profile and profile.active:
+            st.caption(f"計測中: {profile.completed} / {profile.runs}回（フォームを操作すると計測されます）")
+            if st.button("⏹️ 計測を停止"):
+                profile.remaining = 0
+        elif st.button("▶️ 次の再実行を計測"):
+            from profiling import ProfileSession
+            st.session_state.profile_session = ProfileSession(int(profile_runs))
+        if profile and profile.error:
+            st.error(f"プロファイラを開始できません: {profile.error}")
     
     # タブ設定
-    tab1, tab2, tab3 = st.tabs(["📝 入力フォーム", "💰 見積依頼文", "📐 図面依頼文"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📝 入力フォーム", "💰 見積依頼文", "📐 図面依頼文", "📥 一括取込"])
     
     with tab1:
         # 操作進行中の場合は警告表示
@@ -951,8 +875,22 @@ def main():
             if not customers:
                 st.warning("顧客企業マスタからデータを取得できません。接続設定を確認してください。")
                 return
+            show_loading_progress(master_sync_job("customers"), "顧客企業マスタ")
+            prefetch_projects()
+            
+            # 顧客検索（全角・半角、カナ、法人格の表記ゆれを吸収）
+            customer_query = st.text_input(
+                "顧客検索",
+                placeholder="会社名の一部を入力",
+                disabled=st.session_state.operation_in_progress
+            )
+            matched_customers = search_customers(customer_query)
+            if customer_query and not matched_customers:
+                st.caption("該当する顧客が見つかりません")
+            elif len(matched_customers) >= CUSTOMER_SEARCH_LIMIT:
+                st.caption(f"上位{CUSTOMER_SEARCH_LIMIT}件を表示しています（全{len(customers)}件）。検索語で絞り込んでください。")
                 
-            customer_options = ["--- 新規顧客 ---"] + [f"{c['name']}" for c in customers]
+            customer_options = ["--- 新規顧客 ---"] + [f"{c['name']}" for c in matched_customers]
             
             selected_customer_index = st.selectbox(
                 "顧客選択（会社名）",
@@ -976,7 +914,6 @@ def main():
                             if customer_id:
                                 st.success(f"✅ 顧客「{new_company_name}」を作成しました")
                                 st.session_state.last_operation = f"customer_created_{customer_id}"
-                                clear_cache()
                                 # 作成した顧客を選択状態にする
                                 selected_customer_id = customer_id
                                 selected_customer = {"id": customer_id, "name": new_company_name}
@@ -984,7 +921,7 @@ def main():
                                 st.error(f"❌ 顧客作成に失敗: {error}")
                         st.session_state.operation_in_progress = False
             else:
-                selected_customer = customers[selected_customer_index - 1]
+                selected_customer = matched_customers[selected_customer_index - 1]
                 selected_customer_id = selected_customer['id']
                 st.info(f"選択された顧客: {selected_customer['name']}")
             
@@ -994,6 +931,7 @@ def main():
             
             if selected_customer_id:
                 projects = fetch_projects(selected_customer_id)
+                show_loading_progress(master_sync_job("projects"), "案件管理DB")
                 project_options = ["--- 新規案件 ---"] + [f"{p['name']}" for p in projects]
                 
                 selected_project_index = st.selectbox(
@@ -1015,7 +953,6 @@ def main():
                                 if project_id:
                                     st.success(f"✅ 案件「{new_project_name}」を作成しました")
                                     st.session_state.last_operation = f"project_created_{project_id}"
-                                    clear_cache()
                                     # 作成した案件を選択状態にする
                                     selected_project_id = project_id
                                     selected_project = {"id": project_id, "name": new_project_name}
@@ -1029,7 +966,7 @@ def main():
                         st.info(f"選択された案件: {selected_project['name']}")
             
             # 依頼種別と備考
-            request_type = st.selectbox("依頼種別", ["見積/図面", "見積のみ", "図面のみ"],
+            request_type = st.selectbox("依頼種別", REQUEST_TYPES,
                                       disabled=st.session_state.operation_in_progress)
             notes = st.text_area("備考", placeholder="特記事項があれば記入してください",
                                disabled=st.session_state.operation_in_progress)
@@ -1046,7 +983,7 @@ def main():
                 project_name = st.text_input("案件名 *", disabled=st.session_state.operation_in_progress)
             
             with col3:
-                request_type = st.selectbox("依頼種別", ["見積/図面", "見積のみ", "図面のみ"],
+                request_type = st.selectbox("依頼種別", REQUEST_TYPES,
                                           disabled=st.session_state.operation_in_progress)
             
             notes = st.text_area("備考", placeholder="特記事項があれば記入してください",
@@ -1055,25 +992,9 @@ def main():
         # 仕様入力
         st.markdown('<div class="section-header"><h3>⚙️ 仕様入力</h3></div>', unsafe_allow_html=True)
         
-        # カテゴリごとに表示（1列表示、枠囲み）
-        categories = {}
-        for item in FORM_ITEMS:
-            if item["大項目"] not in categories:
-                categories[item["大項目"]] = []
-            categories[item["大項目"]].append(item)
-        
-        # 各カテゴリをシンプルに表示
-        for category, items in categories.items():
-            # セクション見出しのアイコン
-            icons = {
-                "OS機種": "🤖",
-                "本体構成": "🏗️", 
-                "設置容器": "📦",
-                "仕分け商品": "📋",
-                "オプション": "⚙️"
-            }
-            
-            icon = icons.get(category, "📌")
+        # 各カテゴリをシンプルに表示（項目はインポート時にコンパイル済み）
+        for category, fields in FIELDS_BY_CATEGORY.items():
+            icon = CATEGORY_ICONS.get(category, "📌")
             
             # シンプルなセクション表示
             st.subheader(f"{icon} {category}")
@@ -1082,20 +1003,17 @@ def main():
             item_cols = st.columns(2)
             item_index = 0
             
-            for item in items:
-                if not should_show_field(item, st.session_state.form_data):
+            for field in fields:
+                if not should_show_field(field, st.session_state.form_data):
                     continue
                 
                 with item_cols[item_index % 2]:
-                    key = f"{item['大項目']}-{item['小項目']}"
-                    label = item["大項目"] if item["小項目"] == "-" else item["小項目"]
-                    
-                    if item["備考"]:
-                        label += f" ({item['備考']})"
+                    key = field.key
+                    label = field.label
                     
-                    if item["取り得る値"] and item["取り得る値"] not in ["(任意)", "", "(選択)"]:
+                    if field.options:
                         # 通常の選択肢
-                        options = [""] + item["取り得る値"].split(",")
+                        options = [""] + list(field.options)
                         current_value = st.session_state.form_data.get(key, "")
                         selected = st.selectbox(label, options, 
                                               index=options.index(current_value) if current_value in options else 0,
@@ -1105,7 +1023,7 @@ def main():
                         elif key in st.session_state.form_data:
                             del st.session_state.form_data[key]
                     
-                    elif item["小項目"] == "追加カート":
+                    elif field.name == "追加カート":
                         # 追加カート特別処理
                         surface_count = calculate_surface_count(st.session_state.form_data.get("本体構成-ブロック"))
                         options = get_cart_options(surface_count)
@@ -1125,7 +1043,7 @@ def main():
                         elif key in st.session_state.form_data:
                             del st.session_state.form_data[key]
                     
-                    elif item["小項目"] == "追加トート":
+                    elif field.name == "追加トート":
                         # 追加トート特別処理
                         grid_count = calculate_grid_count(
                             st.session_state.form_data.get("本体構成-段"),
@@ -1151,10 +1069,9 @@ def main():
                     
                     else:
                         # 自由入力の場合
-                        input_type = "number" if any(unit in item["備考"] for unit in ["mm単位", "台単位", "個単位"]) else "text"
                         current_value = st.session_state.form_data.get(key, "")
                         
-                        if input_type == "number":
+                        if field.numeric:
                             # 空欄を許可する数値入力
                             value = st.text_input(label, value=current_value, key=key, 
                                                 placeholder="数値を入力（空欄可）",
@@ -1216,28 +1133,30 @@ def main():
                     if not can_save:
                         st.error("案件を選択してください。")
                     else:
-                        st.session_state.operation_in_progress = True
-                        with st.spinner("保存中..."):
-                            # 依頼文生成
-                            quotation_text = generate_quotation_text(st.session_state.form_data)
-                            drawing_text = generate_drawing_text(st.session_state.form_data)
-                            
-                            # 保存用データ
-                            save_data = {
-                                "依頼種別": request_type,
-                                "OS機種": st.session_state.form_data.get("OS機種-", "未選択"),
-                                "見積依頼文": quotation_text,
-                                "図面依頼文": drawing_text,
-                                "仕様詳細": st.session_state.form_data,
-                                "備考": notes
-                            }
-                            
-                            if save_omnisorter_request(selected_project_id, save_data):
-                                st.success("✅ マスタ連携でOmniSorter依頼が正常に保存されました！")
-                                st.session_state.last_operation = "request_saved"
-                            else:
-                                st.error("❌ 保存に失敗しました。")
-                        st.session_state.operation_in_progress = False
+                        # 依頼文生成（表示タブと同じキャッシュを使用）
+                        quotation_text, drawing_text, _ = render_texts(st.session_state.form_data)
+                        
+                        # 保存用データ
+                        save_data = {
+                            "依頼日": datetime.now().strftime("%Y-%m-%d"),
+                            "依頼種別": request_type,
+                            "OS機種": st.session_state.form_data.get("OS機種-", "未選択"),
+                            "見積依頼文": quotation_text,
+                            "図面依頼文": drawing_text,
+                            "仕様詳細": st.session_state.form_data,
+                            "備考": notes
+                        }
+                        
+                        label = f"{selected_customer['name']} / {selected_project['name']}" if selected_project else None
+                        queued, notice = save_omnisorter_request(selected_project_id, save_data, label)
+                        if notice:
+                            st.info(notice)
+                        elif queued:
+                            st.success("✅ OmniSorter依頼を送信キューに登録しました。送信状況で保存結果を確認できます。")
+                        else:
+                            st.error("❌ 保存に失敗しました。")
+                        if queued:
+                            st.session_state.last_operation = "request_queued"
             else:
                 # 簡易版の保存
                 can_save = ('customer_name' in locals() and 'project_name' in locals() and 
@@ -1248,41 +1167,43 @@ def main():
                     if not can_save:
                         st.error("顧客名と案件名は必須です。")
                     else:
-                        st.session_state.operation_in_progress = True
-                        with st.spinner("保存中..."):
-                            # 依頼文生成
-                            quotation_text = generate_quotation_text(st.session_state.form_data)
-                            drawing_text = generate_drawing_text(st.session_state.form_data)
-                            
-                            # Notion保存用データ
-                            notion_data = {
-                                "顧客名": customer_name,
-                                "案件名": project_name,
-                                "依頼日": datetime.now().strftime("%Y-%m-%d"),
-                                "依頼種別": request_type,
-                                "OS機種": st.session_state.form_data.get("OS機種-", "未選択"),
-                                "見積依頼文": quotation_text,
-                                "図面依頼文": drawing_text,
-                                "仕様詳細": st.session_state.form_data,
-                                "備考": notes
-                            }
-                            
-                            if save_to_notion(notion_data):
-                                st.markdown('<div class="success-message">✅ Notionに正常に保存されました！</div>', unsafe_allow_html=True)
-                                st.session_state.last_operation = "request_saved"
-                            else:
-                                st.markdown('<div class="error-message">❌ 保存に失敗しました。設定を確認してください。</div>', unsafe_allow_html=True)
-                        st.session_state.operation_in_progress = False
+                        # 依頼文生成（表示タブと同じキャッシュを使用）
+                        quotation_text, drawing_text, _ = render_texts(st.session_state.form_data)
+                        
+                        # Notion保存用データ
+                        notion_data = {
+                            "顧客名": customer_name,
+                            "案件名": project_name,
+                            "依頼日": datetime.now().strftime("%Y-%m-%d"),
+                            "依頼種別": request_type,
+                            "OS機種": st.session_state.form_data.get("OS機種-", "未選択"),
+                            "見積依頼文": quotation_text,
+                            "図面依頼文": drawing_text,
+                            "仕様詳細": st.session_state.form_data,
+                            "備考": notes
+                        }
+                        
+                        queued, notice = save_to_notion(notion_data)
+                        if notice:
+                            st.info(notice)
+                        elif queued:
+                            st.markdown('<div class="success-message">✅ 送信キューに登録しました。送信状況で保存結果を確認できます。</div>', unsafe_allow_html=True)
+                        else:
+                            st.markdown('<div class="error-message">❌ 保存に失敗しました。設定を確認してください。</div>', unsafe_allow_html=True)
+                        if queued:
+                            st.session_state.last_operation = "request_queued"
         
         with reset_col:
             if st.button("🔄 フォームリセット", disabled=st.session_state.operation_in_progress):
                 reset_form()
                 st.success("フォームをリセットしました")
                 st.rerun()
+        
+        show_outbox_status()
     
     with tab2:
         st.subheader("見積依頼文")
-        quotation_text = generate_quotation_text(st.session_state.form_data)
+        quotation_text, _, _ = render_texts(st.session_state.form_data)
         st.text_area("", value=quotation_text, height=400, key="quotation_display")
         
         if st.button("📋 クリップボードにコピー", key="copy_quotation"):
@@ -1291,18 +1212,95 @@ def main():
     
     with tab3:
         st.subheader("図面依頼文（英語）")
-        drawing_text = generate_drawing_text(st.session_state.form_data)
+        _, drawing_text, _ = render_texts(st.session_state.form_data)
         st.text_area("", value=drawing_text, height=400, key="drawing_display")
         
         if st.button("📋 クリップボードにコピー", key="copy_drawing"):
             st.code(drawing_text)
             st.success("上記テキストをコピーしてご利用ください。")
 
+    with tab4:
+        st.subheader("一括取込（CSV / JSONL）")
+        st.caption("列名は入力フォームの項目キー（例: 本体構成-段、オプション-DAS）と、顧客名・案件名・依頼種別・備考です。")
+        uploaded_file = st.file_uploader("依頼ファイル", type=["csv", "jsonl"], key="bulk_upload",
+                                         disabled=st.session_state.operation_in_progress)
+        
+        if uploaded_file:
+            try:
+                prepared_rows = prepare_rows(read_rows(uploaded_file.getvalue(), uploaded_file.name))
+            except (ValueError, UnicodeDecodeError) as e:
+                st.error(f"ファイルの読み込みに失敗: {str(e)}")
+                prepared_rows = []
+            
+            if prepared_rows:
+                invalid_rows = [row for row in prepared_rows if row["errors"]]
+                st.info(f"{len(prepared_rows)}件を読み込みました（検証エラー {len(invalid_rows)}件）")
+                if invalid_rows:
+                    st.dataframe(
+                        [{"行": row["行"], "顧客名": row["顧客名"], "エラー": " / ".join(row["errors"])} for row in invalid_rows],
+                        use_container_width=True
+                    )
+                
+                database_id = st.secrets.get("NOTION_DATABASE_ID")
+                if not database_id:
+                    st.warning("一括保存にはNOTION_DATABASE_IDの設定が必要です。")
+                
+                if st.button("💾 一括保存", type="primary",
+                           disabled=st.session_state.operation_in_progress or not database_id):
+                    st.session_state.operation_in_progress = True
+                    progress = st.progress(0.0)
+                    
+                    def on_result(result, done, total):
+                        progress.progress(done / total, text=f"{done}/{total}件 処理済み")
+                    
+                    try:
+                        save = notion_saver(get_notion_client(), database_id)
+                        st.session_state.bulk_import_result = import_rows(prepared_rows, save, on_result=on_result)
+                    finally:
+                        # 例外や st.rerun() での中断でも他の操作をロックしたままにしない
+                        st.session_state.operation_in_progress = False
+        
+        if st.session_state.bulk_import_result:
+            results, summary = st.session_state.bulk_import_result
+            if summary["invalid"] or summary["failed"] or summary["partial"]:
+                st.warning(format_summary(summary))
+            else:
+                st.success(format_summary(summary))
+            st.dataframe(results, use_container_width=True)
+            st.download_button("📄 結果レポートをダウンロード", report_csv(results),
+                               file_name="bulk_import_report.csv", mime="text/csv")
+
     # デバッグ情報（開発用）
-    with st.expander("🔍 デバッグ情報（開発用）", expanded=False):
+    profile = st.session_state.profile_session
+    with st.expander("🔍 デバッグ情報（開発用）", expanded=bool(profile and profile.stats)):
         st.write("フォームデータ:", st.session_state.form_data)
         st.write("操作進行中:", st.session_state.operation_in_progress)
         st.write("最後の操作:", st.session_state.last_operation)
+        
+        if profile and profile.stats:
+            st.markdown(f"**プロファイル結果（{profile.completed}回分、累積時間順）**")
+            st.code(profile.hotspots(), language=None)
+            st.download_button("📥 プロファイルをダウンロード（pstats形式）", profile.dump(),
+                               file_name="omnisorter.prof", mime="application/octet-stream")
+
+def run_main():
+    """main() を実行（プロファイル計測中のセッションだけプロファイラを通す）"""
+    profile = st.session_state.get("profile_session")
+    if profile is None or not profile.active:
+        main()
+        return
+    profile.run(main)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    first_run = "form_data" not in st.session_state
+    # main() が st.rerun() や st.stop() で中断されても必ず開始されるよう先に呼ぶ
+    warm_up()
+    try:
+        # 再実行ごとの所要時間を記録（st.rerun() による中断も含む）
+        with Timer(RERUN_DURATION):
+            run_main()
+    finally:
+        if first_run:
+            elapsed = time.perf_counter() - SCRIPT_STARTED_AT
+            FIRST_RENDER_DURATION.observe(elapsed)
+            record_startup("first_render", elapsed)
\ No newline at end of file
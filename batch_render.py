@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from bulk_import import iter_rows, split_row
+from omnisorter_core import apply_calculated_values, render_texts, validate_form_data
+
+# 1タスクあたりの件数（プロセス間通信の回数を減らす）
+DEFAULT_CHUNK_SIZE = 64
+
+# ワーカー1つあたりの先行投入タスク数（メモリ使用量を一定に保つ上限）
+MAX_PENDING_PER_WORKER = 2
+
+# 進捗表示の間隔（秒）
+PROGRESS_INTERVAL = 1.0
+
+
+def render_row(line_no, raw):
+    """1行分の仕様を検証して見積・図面依頼文を生成"""
+    values, form_data = split_row(raw)
+    errors = validate_form_data(form_data)
+    form_data = apply_calculated_values(form_data)
+    quotation_text, drawing_text, _ = render_texts(form_data)
+    return {
+        "行": line_no,
+        "顧客名": values.get("顧客名", ""),
+        "案件名": values.get("案件名", ""),
+        "errors": errors,
+        "間口数": form_data.get("間口数", 0),
+        "面数": form_data.get("面数", 0),
+        "見積依頼文": quotation_text,
+        "図面依頼文": drawing_text
+    }
+
+
+def render_chunk(chunk):
+    """ワーカープロセスで1チャンク分を生成"""
+    return [render_row(line_no, raw) for line_no, raw in chunk]
+
+
+def chunked(rows, size):
+    """イテラブルをsize件ずつのリストに分割"""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_stream(rows, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """行を入力順のままプロセスプールで生成し、結果を1件ずつyield
+
+    投入済みで未回収のチャンクは workers × MAX_PENDING_PER_WORKER 個までに
+    抑えるので、入力がどれだけ大きくてもメモリ使用量は一定。
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for line_no, raw in rows:
+            yield render_row(line_no, raw)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunked(rows, chunk_size):
+            pending.append(executor.submit(render_chunk, chunk))
+            if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="仕様ファイル（CSV/JSONL）から見積・図面依頼文をまとめて生成（Notionには保存しない）")
+    parser.add_argument("file", help="入力ファイル（.csv または .jsonl）")
+    parser.add_argument("-o", "--output", help="出力先JSONL（省略時は標準出力）")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカープロセス数（既定はCPU数、1なら単一プロセス）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="1タスクあたりの件数")
+    args = parser.parse_args(argv)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started_at = time.perf_counter()
+    reported_at = started_at
+    done = 0
+    invalid = 0
+    try:
+        with open(args.file, encoding="utf-8-sig", newline="") as f:
+            for result in render_stream(iter_rows(f, args.file), args.workers, args.chunk_size):
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                done += 1
+                if result["errors"]:
+                    invalid += 1
+                now = time.perf_counter()
+                if now - reported_at >= PROGRESS_INTERVAL:
+                    reported_at = now
+                    print(f"{done}件 生成済み（{done / (now - started_at):.0f}件/秒）", file=sys.stderr)
+    except ValueError as e:
+        print(f"入力エラー: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started_at
+    throughput = done / elapsed if elapsed > 0 else 0.0
+    print(f"全{done}件（検証エラー {invalid}件）: {elapsed:.1f}秒, {throughput:.0f}件/秒", file=sys.stderr)
+    return 0 if invalid == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""依頼文生成のベンチマーク
+
+render_all 導入前の3つの個別関数（見積依頼文・図面依頼文・仕様詳細を
+それぞれ走査して生成する。benchmarks/legacy_render.py）と1パスの render_all を比較する。
+
+    python benchmarks/bench_render.py -n 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import legacy_render
+from omnisorter_core import apply_calculated_values, render_all
+
+# 標準的な構成（全項目入力）
+SAMPLE_FORM_DATA = apply_calculated_values({
+    "OS機種--": "M",
+    "本体構成-段": "4",
+    "本体構成-列": "5",
+    "本体構成-ブロック": "3",
+    "本体構成-間口タイプ": "スロープ式",
+    "本体構成-短スロープ長さ": "300",
+    "本体構成-スロープ長さ": "600",
+    "本体構成-引き出し有無": "有",
+    "設置容器-標準/個別": "標準トート",
+    "設置容器-奥行": "400",
+    "設置容器-幅": "300",
+    "設置容器-高さ": "250",
+    "仕分け商品-最大奥行": "350",
+    "仕分け商品-最大幅": "250",
+    "仕分け商品-最大高さ": "200",
+    "オプション-DAS": "有",
+    "オプション-満杯センサー": "有",
+    "オプション-追加トート": "120個 (1倍)",
+    "オプション-滑り止めベルト": "無",
+    "オプション-薄物対応": "有"
+})
+
+
+def separate(form_data):
+    """render_all 導入前の3つの関数で生成（benchmarks/legacy_render.py）"""
+    return (
+        legacy_render.generate_quotation_text(form_data),
+        legacy_render.generate_drawing_text(form_data),
+        legacy_render.format_specifications_for_notion(form_data)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="依頼文生成のベンチマーク")
+    parser.add_argument("-n", "--number", type=int, default=20000, help="1計測あたりの実行回数")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="計測回数（最小値を採用）")
+    args = parser.parse_args(argv)
+
+    if render_all(SAMPLE_FORM_DATA) != separate(SAMPLE_FORM_DATA):
+        print("出力が一致しません", file=sys.stderr)
+        return 1
+
+    results = {}
+    for name, func in [("個別関数×3", separate), ("render_all", render_all)]:
+        best = min(timeit.repeat(lambda: func(SAMPLE_FORM_DATA), number=args.number, repeat=args.repeat))
+        results[name] = best / args.number * 1e6
+        print(f"{name:12s} {results[name]:8.2f} µs/回")
+    print(f"高速化: {results['個別関数×3'] / results['render_all']:.2f}倍")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
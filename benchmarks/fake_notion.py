@@ -0,0 +1,451 @@
+"""ベンチマーク・負荷試験用のNotion API互換サーバー（メモリ上、標準ライブラリ＋requests）
+
+対応エンドポイント:
+    GET  /v1/databases/{id}         スキーマ取得
+    POST /v1/databases/{id}/query   クエリ（filter、page_size / start_cursor によるページング）
+    POST /v1/pages                  ページ作成
+    GET  /v1/pages/{id}             ページ取得
+    PATCH /v1/blocks/{id}/children  本文ブロックの追記
+
+遅延・5xx・429の注入と、実際のNotionの応答の記録（--record）・再生（--replay）ができる。
+
+    python benchmarks/fake_notion.py --port 8800 --latency 0.15 --jitter 0.05 --rate-limit 3
+    python benchmarks/fake_notion.py --record cassette.jsonl --upstream https://api.notion.com/v1
+    python benchmarks/fake_notion.py --replay cassette.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# 既定のデータベーススキーマ（プロパティ名 → 型）
+DEFAULT_SCHEMAS = {
+    "requests": {
+        "顧客名": "title", "案件名": "rich_text", "依頼日": "date", "依頼種別": "select",
+        "依頼機種": "select", "ステータス": "select", "見積依頼文": "rich_text",
+        "図面依頼文": "rich_text", "仕様詳細": "rich_text", "備考": "rich_text", "送信キー": "rich_text"
+    },
+    "customers": {"会社名": "title"},
+    "projects": {"案件名": "title", "会社名_拠点名": "relation"}
+}
+
+# 注入する5xxのステータス
+INJECTED_ERROR_STATUSES = (500, 502, 503)
+
+# リクエストボディの上限（バイト、Notionと同じ）
+MAX_BODY_BYTES = 500 * 1024
+
+# 記録時に上流へ転送するヘッダー
+FORWARDED_HEADERS = ("Authorization", "Notion-Version", "Content-Type")
+
+
+def title(text):
+    """titleプロパティの値"""
+    return {"type": "title", "title": [{"text": {"content": text}, "plain_text": text}]}
+
+
+def text(value):
+    """rich_textプロパティの値"""
+    return {"type": "rich_text", "rich_text": [{"text": {"content": value}, "plain_text": value}]}
+
+
+def relation(*page_ids):
+    """relationプロパティの値"""
+    return {"type": "relation", "relation": [{"id": page_id} for page_id in page_ids]}
+
+
+def plain_text(prop):
+    """title / rich_text プロパティの文字列"""
+    # 作成リクエストのまま保存したプロパティには type がない
+    kind = prop.get("type") or ("title" if "title" in prop else "rich_text")
+    return "".join(part.get("text", {}).get("content", "") for part in prop.get(kind, []) or [])
+
+
+def matches(page, condition):
+    """Notionのクエリfilter（よく使う条件のみ）にページが一致するか"""
+    if "and" in condition:
+        return all(matches(page, sub) for sub in condition["and"])
+    if "or" in condition:
+        return any(matches(page, sub) for sub in condition["or"])
+
+    if "timestamp" in condition:
+        value = page.get(condition["timestamp"], "")
+        operator, operand = next(iter(condition[condition["timestamp"]].items()))
+        return {
+            "equals": value == operand,
+            "before": value < operand,
+            "after": value > operand,
+            "on_or_before": value <= operand,
+            "on_or_after": value >= operand
+        }.get(operator, True)
+
+    prop = page["properties"].get(condition.get("property"), {})
+    for kind in ("title", "rich_text", "relation", "select"):
+        if kind not in condition:
+            continue
+        operator, operand = next(iter(condition[kind].items()))
+        if kind == "relation":
+            related = [item["id"] for item in prop.get("relation", [])]
+            return {"contains": operand in related, "is_empty": not related,
+                    "is_not_empty": bool(related)}.get(operator, True)
+        if kind == "select":
+            value = (prop.get("select") or {}).get("name")
+        else:
+            value = plain_text(prop)
+        return {"equals": value == operand, "contains": operand in (value or ""),
+                "is_empty": not value, "is_not_empty": bool(value)}.get(operator, True)
+    return True
+
+
+def cassette_key(method, path, body):
+    """記録・再生で応答を引くキー"""
+    return f"{method} {path.split('?', 1)[0]} {json.dumps(body, ensure_ascii=False, sort_keys=True)}"
+
+
+def text_limit_error(value, path="body"):
+    """Notionの上限（テキスト2000文字、配列100要素）を超えていればメッセージを返す"""
+    if isinstance(value, dict):
+        content = value.get("content")
+        if isinstance(content, str) and len(content.encode("utf-16-le")) // 2 > 2000:
+            return f"{path}.content.length should be ≤ `2000`"
+        for key, child in value.items():
+            error = text_limit_error(child, f"{path}.{key}")
+            if error:
+                return error
+    elif isinstance(value, list):
+        if len(value) > 100:
+            return f"{path}.length should be ≤ `100`"
+        for i, child in enumerate(value):
+            error = text_limit_error(child, f"{path}[{i}]")
+            if error:
+                return error
+    return None
+
+
+class FakeNotion:
+    """データベースとページをメモリ上に保持するNotion API互換サーバー
+
+    latency/jitter 秒の遅延、error_rate の確率での5xx、throttle_rate の確率での429、
+    rate_limit（リクエスト/秒、Notionと同じく平均で判定）超過時の429を注入できる。
+    """
+
+    def __init__(self, schemas=None, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 rate_limit=None, retry_after=1, upstream=None, record_path=None, replay_path=None, seed=None):
+        self.schemas = dict(schemas or DEFAULT_SCHEMAS)
+        self.pages = {}
+        # ページID → 本文ブロックのリスト
+        self.blocks = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.record_path = record_path
+        self.request_count = 0
+        self.injected = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = rate_limit or 0
+        self._updated_at = time.monotonic()
+        # メソッド → [[ステータス, 残り回数, 先に成功させる回数]]（fail_next で指定した障害）
+        self._planned_failures = {}
+        self._replay = {}
+        self._server = None
+        if replay_path:
+            self.load_cassette(replay_path)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self, host="127.0.0.1", port=0):
+        """別スレッドで待ち受けを開始し、APIのベースURLを返す"""
+        fake = self
+
+        class Handler(FakeNotionHandler):
+            notion = fake
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        """待ち受けを停止"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    # データ
+    def add_page(self, database_id, properties):
+        """ページを直接追加してIDを返す"""
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:00.000Z")
+        page = {
+            "object": "page",
+            "id": str(uuid.uuid4()),
+            "parent": {"type": "database_id", "database_id": database_id},
+            "created_time": now,
+            "last_edited_time": now,
+            "archived": False,
+            "properties": properties
+        }
+        with self._lock:
+            self.pages[page["id"]] = page
+        return page["id"]
+
+    def seed_masters(self, customers, projects_per_customer=1):
+        """顧客・案件マスタを作成し、[(顧客ID, [案件ID...])] を返す"""
+        seeded = []
+        for i in range(customers):
+            customer_id = self.add_page("customers", {"会社名": title(f"株式会社テスト{i:04d}")})
+            project_ids = [
+                self.add_page("projects", {
+                    "案件名": title(f"テスト倉庫{i:04d}-{j}"),
+                    "会社名_拠点名": relation(customer_id)
+                })
+                for j in range(projects_per_customer)
+            ]
+            seeded.append((customer_id, project_ids))
+        return seeded
+
+    def query(self, database_id, payload):
+        with self._lock:
+            rows = [page for page in self.pages.values() if page["parent"]["database_id"] == database_id]
+        if payload.get("filter"):
+            rows = [page for page in rows if matches(page, payload["filter"])]
+        start = int(payload.get("start_cursor") or 0)
+        size = min(int(payload.get("page_size") or 100), 100)
+        end = start + size
+        return {
+            "object": "list",
+            "results": rows[start:end],
+            "has_more": end < len(rows),
+            "next_cursor": str(end) if end < len(rows) else None
+        }
+
+    # 障害注入
+    def fail_next(self, method, status, count=1, after=0):
+        """method のリクエストを after 回成功させた後、count 回 status を返す（テストで特定の呼び出しを失敗させる）"""
+        with self._lock:
+            self._planned_failures.setdefault(method, []).append([status, count, after])
+
+    def inject(self, method=None):
+        """遅延を入れ、注入する障害があれば (ステータス, ヘッダー) を返す"""
+        delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        with self._lock:
+            self.request_count += 1
+            status = None
+            planned = self._planned_failures.get(method)
+            if planned and planned[0][2]:
+                planned[0][2] -= 1
+            elif planned:
+                status = planned[0][0]
+                planned[0][1] -= 1
+                if not planned[0][1]:
+                    planned.pop(0)
+            if status is None and self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens + (now - self._updated_at) * self.rate_limit)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                else:
+                    status = 429
+            if status is None and self._random.random() < self.throttle_rate:
+                status = 429
+            if status is None and self._random.random() < self.error_rate:
+                status = self._random.choice(INJECTED_ERROR_STATUSES)
+            if status:
+                self.injected[status] = self.injected.get(status, 0) + 1
+        if status == 429:
+            return status, {"Retry-After": str(self.retry_after)}
+        return status, {}
+
+    # 記録・再生
+    def load_cassette(self, path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._replay.setdefault(entry["key"], []).append((entry["status"], entry["body"]))
+
+    def replay(self, key):
+        """記録済みの応答（同じキーが複数あれば順に、最後のものは繰り返し）"""
+        with self._lock:
+            responses = self._replay.get(key)
+            if not responses:
+                return None
+            return responses.pop(0) if len(responses) > 1 else responses[0]
+
+    def forward(self, method, path, headers, body, key):
+        """上流（実際のNotion）に転送し、応答を記録して返す"""
+        response = requests.request(
+            method, f"{self.upstream}/{path.split('/v1/', 1)[-1]}",
+            headers={name: headers[name] for name in FORWARDED_HEADERS if headers.get(name)},
+            json=body if method in ("POST", "PATCH") else None, timeout=(5, 30)
+        )
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {"object": "error", "status": response.status_code, "message": response.text}
+        if self.record_path:
+            with self._lock, open(self.record_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "status": response.status_code, "body": payload},
+                                   ensure_ascii=False) + "\n")
+        return response.status_code, payload
+
+
+class FakeNotionHandler(BaseHTTPRequestHandler):
+    notion = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, code, message, headers=None):
+        self._send(status, {"object": "error", "status": status, "code": code, "message": message}, headers)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def _handle(self, method):
+        notion = self.notion
+        body = None
+        if method in ("POST", "PATCH"):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length)
+            if length > MAX_BODY_BYTES:
+                return self._error(413, "validation_error", f"Request body too large: {length} bytes")
+            body = json.loads(raw or b"{}")
+
+        status, headers = notion.inject(method)
+        if status == 429:
+            return self._error(429, "rate_limited", "Rate limited", headers)
+        if status:
+            return self._error(status, "internal_server_error", "Injected error")
+
+        key = cassette_key(method, self.path, body)
+        recorded = notion.replay(key)
+        if recorded:
+            return self._send(*recorded)
+        if notion.upstream:
+            return self._send(*notion.forward(method, self.path, self.headers, body, key))
+
+        parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if method == "GET":
+            self._simulate_get(parts)
+        elif method == "PATCH":
+            self._simulate_patch(parts, body)
+        else:
+            self._simulate_post(parts, body)
+
+    def _simulate_get(self, parts):
+        notion = self.notion
+        if len(parts) == 3 and parts[1] == "databases" and parts[2] in notion.schemas:
+            properties = {name: {"type": kind} for name, kind in notion.schemas[parts[2]].items()}
+            self._send(200, {"object": "database", "id": parts[2], "properties": properties})
+        elif len(parts) == 3 and parts[1] == "pages" and parts[2] in notion.pages:
+            self._send(200, notion.pages[parts[2]])
+        else:
+            self._error(404, "object_not_found", "/".join(parts))
+
+    def _simulate_post(self, parts, body):
+        notion = self.notion
+        if len(parts) == 4 and parts[1] == "databases" and parts[3] == "query" and parts[2] in notion.schemas:
+            return self._send(200, notion.query(parts[2], body))
+        if parts[1:] == ["pages"]:
+            database_id = body.get("parent", {}).get("database_id")
+            schema = notion.schemas.get(database_id)
+            if schema is None:
+                return self._error(404, "object_not_found", f"database {database_id}")
+            unknown = [name for name in body.get("properties", {}) if name not in schema]
+            if unknown:
+                return self._error(400, "validation_error", f"{unknown[0]} is not a property that exists.")
+            invalid = text_limit_error(body)
+            if invalid:
+                return self._error(400, "validation_error", invalid)
+            page_id = notion.add_page(database_id, body.get("properties", {}))
+            with notion._lock:
+                notion.blocks[page_id] = list(body.get("children", []))
+            return self._send(200, notion.pages[page_id])
+        self._error(404, "object_not_found", "/".join(parts))
+
+    def _simulate_patch(self, parts, body):
+        notion = self.notion
+        if len(parts) == 4 and parts[1] == "blocks" and parts[3] == "children" and parts[2] in notion.pages:
+            invalid = text_limit_error(body)
+            if invalid:
+                return self._error(400, "validation_error", invalid)
+            with notion._lock:
+                notion.blocks.setdefault(parts[2], []).extend(body.get("children", []))
+            return self._send(200, {"object": "list", "results": body.get("children", [])})
+        self._error(404, "object_not_found", "/".join(parts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Notion API互換のローカルサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答ごとの遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="遅延のばらつき（±秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="5xxを返す確率")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="ランダムに429を返す確率")
+    parser.add_argument("--rate-limit", type=float, default=None, help="超えたら429を返すリクエスト数/秒")
+    parser.add_argument("--customers", type=int, default=100, help="作成する顧客マスタ数")
+    parser.add_argument("--projects-per-customer", type=int, default=2, help="顧客ごとの案件数")
+    parser.add_argument("--upstream", help="記録時の転送先（例: https://api.notion.com/v1）")
+    parser.add_argument("--record", help="上流の応答を記録するJSONLファイル")
+    parser.add_argument("--replay", help="記録済みの応答を再生するJSONLファイル（未記録のものは模擬応答）")
+    parser.add_argument("--seed", type=int, default=None, help="障害注入の乱数シード")
+    args = parser.parse_args(argv)
+    if args.record and not args.upstream:
+        parser.error("--record には --upstream が必要です")
+
+    notion = FakeNotion(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        rate_limit=args.rate_limit, upstream=args.upstream, record_path=args.record, replay_path=args.replay,
+        seed=args.seed
+    )
+    if not args.upstream:
+        notion.seed_masters(args.customers, args.projects_per_customer)
+    base_url = notion.start(args.host, args.port)
+    print(f"{base_url} で待ち受けています（データベースID: {', '.join(notion.schemas)}）", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        notion.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
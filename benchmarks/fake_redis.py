@@ -0,0 +1,140 @@
+"""Redis互換（RESP）のローカルサーバー
+
+共有キャッシュ（shared_cache.RedisCache）が使う GET / SET [PX|EX] / DEL / INCR /
+AUTH / SELECT / PING だけをメモリ上で実装する。複数のStreamlitプロセスの
+キャッシュ共有をRedisなしで確認するためのもの。
+
+    python benchmarks/fake_redis.py --port 6380
+    MASTER_CACHE_URL=redis://127.0.0.1:6380/0 streamlit run app.py --server.port 8501
+    MASTER_CACHE_URL=redis://127.0.0.1:6380/0 streamlit run app.py --server.port 8502
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    """キーと値をメモリに保持するRedis互換サーバー（DB番号ごとに分ける）"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0), password=None):
+        super().__init__(address, FakeRedisHandler)
+        self.password = password
+        self.databases = {}
+        self.command_count = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """別スレッドで待ち受けを開始して redis:// URL を返す"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.db = 0
+        self.authenticated = not self.server.password
+        while True:
+            try:
+                args = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            self.wfile.write(self._execute(args))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # インラインコマンド（redis-cli や telnet から）
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _execute(self, args):
+        server = self.server
+        command = args[0].upper()
+        with server.lock:
+            server.command_count += 1
+            if command == b"AUTH":
+                if args[-1].decode() != server.password:
+                    return b"-WRONGPASS invalid password\r\n"
+                self.authenticated = True
+                return b"+OK\r\n"
+            if not self.authenticated:
+                return b"-NOAUTH Authentication required.\r\n"
+            if command == b"PING":
+                return b"+PONG\r\n"
+            if command == b"SELECT":
+                self.db = int(args[1])
+                return b"+OK\r\n"
+
+            values = server.databases.setdefault(self.db, {})
+            if command == b"GET":
+                value = self._get(values, args[1])
+                return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+            if command == b"SET":
+                expires_at = None
+                options = [arg.upper() for arg in args[3:]]
+                if b"PX" in options:
+                    expires_at = time.time() + int(args[3 + options.index(b"PX") + 1]) / 1000
+                elif b"EX" in options:
+                    expires_at = time.time() + int(args[3 + options.index(b"EX") + 1])
+                values[args[1]] = (args[2], expires_at)
+                return b"+OK\r\n"
+            if command == b"DEL":
+                deleted = sum(1 for key in args[1:] if values.pop(key, None) is not None)
+                return b":%d\r\n" % deleted
+            if command == b"INCR":
+                try:
+                    value = int(self._get(values, args[1]) or 0) + 1
+                except ValueError:
+                    return b"-ERR value is not an integer or out of range\r\n"
+                values[args[1]] = (str(value).encode(), None)
+                return b":%d\r\n" % value
+        return b"-ERR unknown command '%s'\r\n" % args[0]
+
+    @staticmethod
+    def _get(values, key):
+        entry = values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del values[key]
+            return None
+        return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Redis互換のローカルサーバー（共有キャッシュの確認用）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    parser.add_argument("--password", help="設定時は AUTH が必要")
+    args = parser.parse_args(argv)
+
+    server = FakeRedis((args.host, args.port), password=args.password)
+    print(f"Redis互換サーバー: redis://{args.host}:{args.port}/0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""render_all 導入前の依頼文生成（基準の実装）
+
+元の app.py の FORM_ITEMS・翻訳辞書と、見積依頼文・図面依頼文・仕様詳細を
+それぞれ辞書を走査して生成する3つの関数をそのまま写したもの。
+omnisorter_core の項目定義とは独立させてあり、render_all の出力が
+変わっていないことの確認（tests/test_render.py）と比較計測
+（bench_render.py）に使う。項目を追加・変更するときもここは変えない。
+"""
+
+FORM_ITEMS = [
+    {"大項目": "OS機種", "小項目": "-", "必要種別": "見積,図面", "取り得る値": "S,M,L,mini", "備考": ""},
+    {"大項目": "本体構成", "小項目": "段", "必要種別": "見積,図面", "取り得る値": "2,3,4,5", "備考": ""},
+    {"大項目": "本体構成", "小項目": "列", "必要種別": "見積,図面", "取り得る値": "3,4,5", "備考": ""},
+    {"大項目": "本体構成", "小項目": "ブロック", "必要種別": "見積,図面", "取り得る値": "(任意)", "備考": "最大10"},
+    {"大項目": "本体構成", "小項目": "間口タイプ", "必要種別": "見積,図面", "取り得る値": "カート式,固定（棚）式,スロープ式", "備考": ""},
+    {"大項目": "本体構成", "小項目": "短スロープ長さ", "必要種別": "見積,図面", "取り得る値": "", "備考": "mm単位"},
+    {"大項目": "本体構成", "小項目": "スロープ長さ", "必要種別": "見積,図面", "取り得る値": "", "備考": "mm単位　※スロープタイプの場合のみ"},
+    {"大項目": "本体構成", "小項目": "引き出し有無", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": "※スロープタイプの場合のみ"},
+    {"大項目": "設置容器", "小項目": "標準/個別", "必要種別": "見積,図面", "取り得る値": "標準トート,個別容器,無し", "備考": ""},
+    {"大項目": "設置容器", "小項目": "奥行", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "設置容器", "小項目": "幅", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "設置容器", "小項目": "高さ", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "仕分け商品", "小項目": "最大奥行", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "仕分け商品", "小項目": "最大幅", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "仕分け商品", "小項目": "最大高さ", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "オプション", "小項目": "DAS", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": ""},
+    {"大項目": "オプション", "小項目": "満杯センサー", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": ""},
+    {"大項目": "オプション", "小項目": "追加カート", "必要種別": "見積", "取り得る値": "(選択)", "備考": "※カート式の場合のみ"},
+    {"大項目": "オプション", "小項目": "追加トート", "必要種別": "見積", "取り得る値": "(選択)", "備考": "※標準トートの場合のみ"},
+    {"大項目": "オプション", "小項目": "滑り止めベルト", "必要種別": "見積", "取り得る値": "有,無", "備考": ""},
+    {"大項目": "オプション", "小項目": "薄物対応", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": ""}
+]
+
+# 翻訳辞書
+TRANSLATE_CATEGORY = {
+    'OS機種': 'Model',
+    '本体構成': 'Main Configuration',
+    '設置容器': 'Container',
+    '仕分け商品': 'Sorting Product',
+    'オプション': 'Options'
+}
+
+TRANSLATE_ITEM = {
+    '段': 'Rows', '列': 'Columns', 'ブロック': 'Cells', '間口タイプ': 'Grid Type',
+    '短スロープ長さ': 'Short Slope Length', 'スロープ長さ': 'Slope Length',
+    '引き出し有無': 'Drawer Availability', '標準/個別': 'Container Type',
+    '奥行': 'Depth', '幅': 'Width', '高さ': 'Height',
+    '最大奥行': 'Max Depth', '最大幅': 'Max Width', '最大高さ': 'Max Height',
+    'DAS': 'DAS', '満杯センサー': 'Full Sensor',
+    '追加カート': 'Additional Cart', '追加トート': 'Additional Tote',
+    '滑り止めベルト': 'Anti-slip Belt', '薄物対応': 'Thin Item Support',
+    '間口数': 'Grid Count', '面数': 'Surface Count'
+}
+
+TRANSLATE_VALUE = {
+    'S': 'S', 'M': 'M', 'L': 'L', 'mini': 'mini',
+    'カート式': 'Cart Type', '固定（棚）式': 'Fixed (Shelf) Type', 'スロープ式': 'Slope Type',
+    '標準トート': 'Standard Tote', '個別容器': 'Individual Container', '無し': 'None',
+    '有': 'Yes', '無': 'No'
+}
+
+
+def format_specifications_for_notion(specs_dict):
+    """仕様詳細をNotion用に見やすく整形"""
+    if not specs_dict:
+        return "仕様情報なし"
+    
+    formatted_text = "【仕様詳細】\n\n"
+    
+    # カテゴリごとに整理
+    categories = {
+        "OS機種": [],
+        "本体構成": [],
+        "設置容器": [],
+        "仕分け商品": [],
+        "オプション": [],
+        "自動計算値": []
+    }
+    
+    for key, value in specs_dict.items():
+        if "-" in key:
+            category, item = key.split("-", 1)
+            if category in categories:
+                categories[category].append(f"  • {item}: {value}")
+        elif key in ["間口数", "面数"]:
+            categories["自動計算値"].append(f"  • {key}: {value}")
+    
+    # カテゴリごとに出力
+    for category, items in categories.items():
+        if items:
+            formatted_text += f"{category}:\n"
+            formatted_text += "\n".join(items)
+            formatted_text += "\n\n"
+    
+    return formatted_text
+
+
+def generate_quotation_text(form_data):
+    """見積依頼文生成"""
+    quotation_items = [item for item in FORM_ITEMS if "見積" in item["必要種別"]]
+    
+    content = "OmniSorter見積依頼\n\n【基本仕様】\n"
+    
+    # 自動計算値を追加
+    grid_count = form_data.get("間口数")
+    
+    # カテゴリごとにグループ化
+    groups = {}
+    for item in quotation_items:
+        key = f"{item['大項目']}-{item['小項目']}"
+        if key in form_data and form_data[key]:
+            category = item["大項目"]
+            if category not in groups:
+                groups[category] = []
+            
+            label = "" if item["小項目"] == "-" else item["小項目"]
+            value = form_data[key]
+            if "mm単位" in item["備考"]:
+                value = f"{value}[mm]"
+            
+            groups[category].append({"label": label, "value": value})
+    
+    # 自動計算値を本体構成に追加
+    if grid_count:
+        if "本体構成" not in groups:
+            groups["本体構成"] = []
+        groups["本体構成"].append({"label": "間口数", "value": f"{grid_count}口"})
+    
+    for category, items in groups.items():
+        content += f"{category}:\n"
+        for item in items:
+            if item["label"]:
+                content += f"  {item['label']}: {item['value']}\n"
+            else:
+                content += f"  {item['value']}\n"
+        content += "\n"
+    
+    content += "上記仕様にて見積をお願いいたします。\nよろしくお願いいたします。"
+    return content
+
+
+def generate_drawing_text(form_data):
+    """図面依頼文生成（英語）"""
+    drawing_items = [item for item in FORM_ITEMS if "図面" in item["必要種別"]]
+    
+    content = "OmniSorter Drawing Request\n\n【Specifications】\n"
+    
+    # 自動計算値を追加
+    grid_count = form_data.get("間口数")
+    
+    # カテゴリごとにグループ化（英語）
+    groups = {}
+    for item in drawing_items:
+        key = f"{item['大項目']}-{item['小項目']}"
+        if key in form_data and form_data[key]:
+            category = TRANSLATE_CATEGORY.get(item["大項目"], item["大項目"])
+            if category not in groups:
+                groups[category] = []
+            
+            label = "" if item["小項目"] == "-" else TRANSLATE_ITEM.get(item["小項目"], item["小項目"])
+            value = TRANSLATE_VALUE.get(form_data[key], form_data[key])
+            if "mm単位" in item["備考"]:
+                value = f"{value}[mm]"
+            
+            groups[category].append({"label": label, "value": value})
+    
+    # 自動計算値を追加
+    if grid_count:
+        if "Main Configuration" not in groups:
+            groups["Main Configuration"] = []
+        groups["Main Configuration"].append({"label": "Grid Count", "value": f"{grid_count} grids"})
+    
+    for category, items in groups.items():
+        content += f"{category}:\n"
+        for item in items:
+            if item["label"]:
+                content += f"  {item['label']}: {item['value']}\n"
+            else:
+                content += f"  {item['value']}\n"
+        content += "\n"
+    
+    content += "Please provide technical drawings based on the above specifications.\n"
+    content += "Thank you for your cooperation.\n\nBest regards,"
+    return content
@@ -0,0 +1,165 @@
+"""同時保存の負荷試験
+
+N人の営業担当が同時に保存する状況を、スレッドごとのセッションで再現する。
+全セッションでNotionClient（レート制限・接続プール）と名前解決キャッシュを共有し、
+Streamlitアプリの1プロセスと同じ構成で保存処理（save_request / save_master_request）を実行する。
+
+    python benchmarks/load_test.py --sessions 50 --saves 4 --flow mixed --latency 0.15 --rate-limit 3
+    python benchmarks/load_test.py --server http://127.0.0.1:8800/v1 --sessions 20
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_render import SAMPLE_FORM_DATA
+from benchmarks.fake_notion import FakeNotion
+from master_store import EntityResolver
+from notion_api import DEFAULT_RATE, NotionClient, RateLimiter
+from omnisorter_core import CUSTOMER_RELATION_PROPERTY, render_texts, save_master_request, save_request
+
+FLOWS = ("simple", "master", "mixed")
+
+
+def percentile(values, p):
+    """最近傍順位法のパーセンタイル"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def request_data(customer_name, project_name):
+    quotation_text, drawing_text, _ = render_texts(SAMPLE_FORM_DATA)
+    return {
+        "顧客名": customer_name, "案件名": project_name, "依頼日": datetime.now().strftime("%Y-%m-%d"),
+        "依頼種別": "見積/図面", "OS機種": "M", "見積依頼文": quotation_text, "図面依頼文": drawing_text,
+        "仕様詳細": SAMPLE_FORM_DATA, "備考": ""
+    }
+
+
+def fetch_projects(client):
+    """案件マスタから (案件ID, 顧客ID) のリストを取得"""
+    projects = []
+    for page in client.database("PROJECT_DB_ID").iter_query():
+        related = page["properties"].get(CUSTOMER_RELATION_PROPERTY, {}).get("relation", [])
+        projects.append((page["id"], related[0]["id"] if related else None))
+    return projects
+
+
+def run_session(session_no, client, resolver, projects, args, record):
+    """1セッション分の保存を実行"""
+    rng = random.Random(session_no)
+    # セッション開始をばらけさせる
+    time.sleep(rng.uniform(0, args.ramp_up))
+    for _ in range(args.saves):
+        flow = args.flow if args.flow != "mixed" else rng.choice(("simple", "master"))
+        started_at = time.perf_counter()
+        try:
+            if flow == "simple":
+                _, error = save_request(
+                    client, client.database_ids["NOTION_DATABASE_ID"],
+                    request_data(f"負荷試験{session_no}", "負荷試験案件")
+                )
+            else:
+                project_id, _ = rng.choice(projects)
+                _, error = save_master_request(client, project_id, request_data("", ""), resolver)
+        except Exception as e:
+            error = str(e)
+        record(flow, time.perf_counter() - started_at, error)
+        if args.think:
+            time.sleep(rng.uniform(0, 2 * args.think))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="N人同時保存の負荷試験")
+    parser.add_argument("--sessions", type=int, default=50, help="同時セッション数")
+    parser.add_argument("--saves", type=int, default=4, help="セッションあたりの保存回数")
+    parser.add_argument("--flow", choices=FLOWS, default="mixed", help="保存フロー（簡易版・マスタ連携・混在）")
+    parser.add_argument("--think", type=float, default=0.0, help="保存間の平均待ち時間（秒）")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="全セッションが開始するまでの秒数")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="クライアント側のレート制限（リクエスト/秒）")
+    parser.add_argument("--cold-resolver", action="store_true", help="名前解決キャッシュを使わない（毎回ページ取得）")
+    parser.add_argument("--server", help="既存のNotion互換サーバーのURL（省略時は内蔵のフェイクサーバーを起動）")
+    parser.add_argument("--latency", type=float, default=0.15, help="内蔵サーバー: 応答遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.05, help="内蔵サーバー: 遅延のばらつき（±秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="内蔵サーバー: 5xxの確率")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="内蔵サーバー: ランダム429の確率")
+    parser.add_argument("--rate-limit", type=float, default=3, help="内蔵サーバー: 429を返すリクエスト数/秒（0で無制限）")
+    args = parser.parse_args(argv)
+
+    fake = None
+    base_url = args.server
+    if not base_url:
+        fake = FakeNotion(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          throttle_rate=args.throttle_rate, rate_limit=args.rate_limit or None, seed=0)
+        fake.seed_masters(20, 2)
+        base_url = fake.start()
+
+    client = NotionClient(
+        "load-test", base_url=base_url, pool_size=max(10, args.sessions), limiter=RateLimiter(args.rate),
+        database_ids={"NOTION_DATABASE_ID": "requests", "CUSTOMER_DB_ID": "customers", "PROJECT_DB_ID": "projects"}
+    )
+    projects = fetch_projects(client)
+    resolver = None
+    if not args.cold_resolver:
+        # アプリでは顧客検索・案件一覧の表示時に登録される
+        resolver = EntityResolver()
+        for page in client.database("CUSTOMER_DB_ID").iter_query():
+            resolver.put(page["id"], page["properties"]["会社名"]["title"][0]["text"]["content"])
+        for project_id, customer_id in projects:
+            resolver.put(project_id, "負荷試験案件", [customer_id] if customer_id else [])
+
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+
+    def record(flow, elapsed, error):
+        with lock:
+            latencies.setdefault(flow, []).append(elapsed)
+            if error:
+                errors[flow] = errors.get(flow, 0) + 1
+
+    print(f"{args.sessions}セッション × {args.saves}回（{args.flow}）を開始します", file=sys.stderr)
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        futures = [
+            executor.submit(run_session, session_no, client, resolver, projects, args, record)
+            for session_no in range(args.sessions)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started_at
+
+    print(f"\n{'フロー':8s} {'件数':>6s} {'失敗':>5s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'最大':>8s}")
+    all_latencies = []
+    for flow, values in sorted(latencies.items()):
+        all_latencies += values
+        print(f"{flow:8s} {len(values):6d} {errors.get(flow, 0):5d} {percentile(values, 50):7.2f}s "
+              f"{percentile(values, 95):7.2f}s {percentile(values, 99):7.2f}s {max(values):7.2f}s")
+    print(f"{'全体':8s} {len(all_latencies):6d} {sum(errors.values()):5d} {percentile(all_latencies, 50):7.2f}s "
+          f"{percentile(all_latencies, 95):7.2f}s {percentile(all_latencies, 99):7.2f}s {max(all_latencies):7.2f}s")
+
+    limiter_stats = client.limiter.stats()
+    retries = ", ".join(f"{status}: {count}回" for status, count in sorted(client.retry_counts.items()))
+    print(f"\n所要時間 {elapsed:.1f}秒 / 保存 {len(all_latencies) / elapsed:.2f}件/秒")
+    print(f"レート制限の待機: {limiter_stats['waited']} / {limiter_stats['acquired']}件"
+          f"（平均 {limiter_stats['average_wait']:.2f}秒, 最大 {limiter_stats['max_wait']:.2f}秒）")
+    print(f"再試行: {retries or 'なし'}")
+    if fake:
+        injected = ", ".join(f"{status}: {count}回" for status, count in sorted(fake.injected.items()))
+        print(f"サーバー側: {fake.request_count}リクエスト, 注入した障害: {injected or 'なし'}")
+        fake.stop()
+    client.close()
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""アプリの主要処理と保存パイプラインのベンチマーク
+
+    python benchmarks/run_benchmarks.py -o results.json             # 計測して保存
+    python benchmarks/run_benchmarks.py --baseline baseline.json    # 基準と比較（劣化があれば終了コード1）
+
+計測対象:
+    core  依頼文生成・表示判定・自動計算（omnisorter_core）
+    app   Streamlitテストハーネスでの main() 再実行 1回
+    save  ローカルのフェイクNotionサーバーへの保存（簡易版・マスタ連携・送信キュー経由）
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_render import SAMPLE_FORM_DATA, separate
+from benchmarks.fake_notion import FakeNotion, relation, title
+from master_store import EntityResolver
+from notion_api import NotionClient, RateLimiter
+from omnisorter_core import (
+    CUSTOMER_RELATION_PROPERTY, FORM_FIELDS, calculate_grid_count, get_cart_options, get_tote_options, render_all,
+    render_texts, save_master_request, save_request, should_show_field
+)
+from outbox import STATUS_FAILED, STATUS_SENT, Outbox, OutboxWorker
+
+# 劣化とみなす中央値の増加率
+DEFAULT_THRESHOLD = 0.2
+
+# フェイクサーバーへの保存はNotionのレート制限をかけずに処理自体の時間を測る
+UNLIMITED_RATE = 1e6
+
+
+def measure(func, number, repeat, warmup):
+    """func を number 回実行する計測を repeat 回行い、1回あたりの秒数の統計を返す"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started_at) / number)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0
+    }
+
+
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.2f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds:9.2f} s "
+
+
+def core_cases(scale):
+    """(名前, 関数, 1計測あたりの実行回数) のリスト"""
+    n = max(1, int(2000 * scale))
+    return [
+        ("core.render_separate[legacy]", lambda: separate(SAMPLE_FORM_DATA), n),
+        ("core.render_all", lambda: render_all(SAMPLE_FORM_DATA), n),
+        ("core.render_texts[cached]", lambda: render_texts(SAMPLE_FORM_DATA), n),
+        ("core.should_show_field[all]",
+         lambda: [should_show_field(field, SAMPLE_FORM_DATA) for field in FORM_FIELDS], n),
+        ("core.calculate_grid_count", lambda: calculate_grid_count("4", "5", "3"), n * 10),
+        ("core.get_cart_options", lambda: get_cart_options(6), n * 10),
+        ("core.get_tote_options", lambda: get_tote_options(120), n * 10)
+    ]
+
+
+class SaveFixture:
+    """フェイクNotionサーバーとクライアント・マスタデータ"""
+
+    def __init__(self):
+        self.fake = FakeNotion()
+        self.base_url = self.fake.start()
+        customer_id = self.fake.add_page("customers", {"会社名": title("株式会社ベンチ")})
+        self.project_id = self.fake.add_page("projects", {
+            "案件名": title("ベンチ倉庫"), CUSTOMER_RELATION_PROPERTY: relation(customer_id)
+        })
+        self.client = NotionClient(
+            "benchmark", database_ids={"NOTION_DATABASE_ID": "requests"}, base_url=self.base_url,
+            limiter=RateLimiter(UNLIMITED_RATE, UNLIMITED_RATE)
+        )
+        self.resolver = EntityResolver()
+        self.resolver.put(customer_id, "株式会社ベンチ")
+        self.resolver.put(self.project_id, "ベンチ倉庫", [customer_id])
+        quotation_text, drawing_text, _ = render_all(SAMPLE_FORM_DATA)
+        self.data = {
+            "顧客名": "株式会社ベンチ", "案件名": "ベンチ倉庫", "依頼日": datetime.now().strftime("%Y-%m-%d"),
+            "依頼種別": "見積/図面", "OS機種": "M", "見積依頼文": quotation_text, "図面依頼文": drawing_text,
+            "仕様詳細": SAMPLE_FORM_DATA, "備考": ""
+        }
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.outbox = Outbox(os.path.join(self.tempdir.name, "outbox.sqlite3"))
+        self.worker = OutboxWorker(self.outbox, {
+            "simple": lambda payload, delivery: save_request(self.client, "requests", payload["data"], delivery)
+        }).start()
+        self._sequence = 0
+
+    def save_simple(self):
+        _, error = save_request(self.client, "requests", self.data)
+        assert error is None, error
+
+    def save_master(self, resolver):
+        _, error = save_master_request(self.client, self.project_id, self.data, resolver)
+        assert error is None, error
+
+    def save_via_outbox(self):
+        """送信キューに登録してから送信完了までの時間"""
+        self._sequence += 1
+        outbox_id, _ = self.outbox.enqueue("simple", {"data": self.data, "sequence": self._sequence}, "benchmark")
+        self.worker.notify()
+        while True:
+            status = self.outbox.entries("benchmark", 1)[0]
+            if status["id"] == outbox_id and status["status"] in (STATUS_SENT, STATUS_FAILED):
+                assert status["status"] == STATUS_SENT, status["detail"]
+                return
+            time.sleep(0.001)
+
+    def close(self):
+        self.client.close()
+        self.fake.stop()
+        self.tempdir.cleanup()
+
+
+def save_cases(fixture, scale):
+    n = max(1, int(50 * scale))
+    return [
+        ("save.save_request", fixture.save_simple, n),
+        ("save.save_master_request[resolver]", lambda: fixture.save_master(fixture.resolver), n),
+        ("save.save_master_request[page GET]", lambda: fixture.save_master(None), n),
+        ("save.outbox_roundtrip", fixture.save_via_outbox, max(1, n // 5))
+    ]
+
+
+def app_rerun_case(fixture, scale):
+    """Streamlitテストハーネスで main() を再実行（簡易モード、保存先はフェイクサーバー）"""
+    from streamlit.testing.v1 import AppTest
+
+    app_test = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    secrets = {
+        "NOTION_API_KEY": "benchmark",
+        "NOTION_DATABASE_ID": "requests",
+        "NOTION_API_BASE": fixture.base_url,
+        "MASTER_CACHE_PATH": os.path.join(fixture.tempdir.name, "master.sqlite3"),
+        "OUTBOX_PATH": os.path.join(fixture.tempdir.name, "app_outbox.sqlite3")
+    }
+    for key, value in secrets.items():
+        app_test.secrets[key] = value
+
+    def rerun():
+        app_test.run()
+        if app_test.exception:
+            raise RuntimeError(app_test.exception[0].value)
+
+    return [("app.main_rerun", rerun, 1)]
+
+
+def compare(results, baseline, threshold):
+    """基準と中央値を比較して劣化した項目名のリストを返す"""
+    regressions = []
+    print(f"\n基準との比較（劣化の閾値 +{threshold:.0%}）")
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"  {name:42s} 基準なし")
+            continue
+        ratio = result["median"] / base["median"] if base["median"] else float("inf")
+        mark = "劣化" if ratio > 1 + threshold else ("改善" if ratio < 1 - threshold else "")
+        print(f"  {name:42s} {format_seconds(base['median'])} → {format_seconds(result['median'])} ({ratio:5.2f}倍) {mark}")
+        if mark == "劣化":
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OmniSorter依頼アプリのベンチマーク")
+    parser.add_argument("groups", nargs="*", default=["core", "app", "save"], help="計測するグループ（core, app, save）")
+    parser.add_argument("-o", "--output", help="結果JSONの出力先（--baseline に渡せる形式）")
+    parser.add_argument("--baseline", help="比較する基準の結果JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="劣化とみなす中央値の増加率")
+    parser.add_argument("--repeat", type=int, default=7, help="計測回数")
+    parser.add_argument("--warmup", type=int, default=2, help="計測前の空実行回数")
+    parser.add_argument("--scale", type=float, default=1.0, help="実行回数の倍率（0.1で短時間の確認）")
+    args = parser.parse_args(argv)
+
+    fixture = SaveFixture() if {"app", "save"} & set(args.groups) else None
+    cases = []
+    try:
+        if "core" in args.groups:
+            cases += core_cases(args.scale)
+        if "save" in args.groups:
+            cases += save_cases(fixture, args.scale)
+        if "app" in args.groups:
+            cases += app_rerun_case(fixture, args.scale)
+
+        results = {}
+        for name, func, number in cases:
+            results[name] = measure(func, number, args.repeat, args.warmup)
+            result = results[name]
+            print(f"{name:42s} 中央値 {format_seconds(result['median'])}  最小 {format_seconds(result['min'])}"
+                  f"  ±{format_seconds(result['stdev'])}")
+    finally:
+        if fixture:
+            fixture.close()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "scale": args.scale
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)}件の劣化: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from notion_api import DEFAULT_RATE, NotionClient, RateLimiter
+from omnisorter_core import (
+    REQUEST_TYPES, apply_calculated_values, render_texts, save_request,
+    validate_form_data
+)
+
+# 仕様以外の依頼情報の列
+META_COLUMNS = ["顧客名", "案件名", "依頼種別", "備考"]
+
+# 同時書き込み数
+DEFAULT_CONCURRENCY = 3
+
+# 行ごとの結果
+RESULT_SUCCEEDED = "成功"
+RESULT_INVALID = "検証エラー"
+RESULT_VALIDATED = "検証OK"
+RESULT_FAILED = "保存失敗"
+# ページは作成されたが長文の本文の追記に失敗した（ページIDを残す）
+RESULT_PARTIAL = "本文追記失敗"
+
+# 結果レポートの列
+REPORT_COLUMNS = ["行", "顧客名", "案件名", "結果", "詳細", "ページID"]
+
+
+def iter_rows(lines, filename):
+    """CSV（ヘッダー行付き）またはJSONLの行を1行ずつ (行番号, 行dict) でyield
+
+    lines はテキストモードのファイルなど行のイテラブル。
+    """
+    if filename.lower().endswith((".jsonl", ".ndjson")):
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{line_no}行目: JSONとして読み込めません - {str(e)}")
+            if not isinstance(row, dict):
+                raise ValueError(f"{line_no}行目: オブジェクトではありません")
+            yield line_no, row
+        return
+
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_rows(content, filename):
+    """CSV（ヘッダー行付き）またはJSONLを読み込み、(行番号, 行dict) のリストを返す"""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+    return list(iter_rows(io.StringIO(content), filename))
+
+
+def split_row(raw):
+    """1行分を (空欄を除いた全列, 仕様データ) に分ける"""
+    values = {
+        str(key).strip(): str(value).strip()
+        for key, value in raw.items()
+        if key is not None and value is not None and str(value).strip()
+    }
+    form_data = {key: value for key, value in values.items() if key not in META_COLUMNS}
+    return values, form_data
+
+
+def prepare_row(line_no, raw):
+    """1行分を検証し、保存用の依頼データを組み立てる"""
+    values, form_data = split_row(raw)
+
+    errors = []
+    if not values.get("顧客名"):
+        errors.append("顧客名は必須です")
+    if not values.get("案件名"):
+        errors.append("案件名は必須です")
+    request_type = values.get("依頼種別", REQUEST_TYPES[0])
+    if request_type not in REQUEST_TYPES:
+        errors.append(f"依頼種別: 「{request_type}」は選択肢にありません（{','.join(REQUEST_TYPES)}）")
+    errors.extend(validate_form_data(form_data))
+
+    prepared = {
+        "行": line_no,
+        "顧客名": values.get("顧客名", ""),
+        "案件名": values.get("案件名", ""),
+        "errors": errors,
+        "data": None
+    }
+    if errors:
+        return prepared
+
+    form_data = apply_calculated_values(form_data)
+    quotation_text, drawing_text, _ = render_texts(form_data)
+    prepared["data"] = {
+        "顧客名": values["顧客名"],
+        "案件名": values["案件名"],
+        "依頼日": datetime.now().strftime("%Y-%m-%d"),
+        "依頼種別": request_type,
+        "OS機種": form_data.get("OS機種--", "未選択"),
+        "見積依頼文": quotation_text,
+        "図面依頼文": drawing_text,
+        "仕様詳細": form_data,
+        "備考": values.get("備考", "")
+    }
+    return prepared
+
+
+def prepare_rows(rows):
+    """read_rows() の結果を全行検証"""
+    return [prepare_row(line_no, raw) for line_no, raw in rows]
+
+
+def notion_saver(client, database_id):
+    """依頼データをOmniSorter依頼DBに保存する関数を返す（戻り値は (ページID, エラー)）
+
+    レート制限と429時の再試行はクライアント側で行う。ページ作成後に本文の追記だけが
+    失敗した場合はページIDとエラーの両方が返る。
+    """
+    return lambda data: save_request(client, database_id, data)
+
+
+def import_rows(prepared_rows, save, concurrency=DEFAULT_CONCURRENCY, on_result=None):
+    """検証済みの行を並列に保存し、(行ごとの結果, 集計) を返す
+
+    on_result(result, done, total) は呼び出し元のスレッドで1行ごとに呼ばれる。
+    save=None の場合は検証のみ行う。
+    """
+    started_at = time.perf_counter()
+    total = len(prepared_rows)
+    results = []
+
+    def record(prepared, status, detail="", page_id=""):
+        result = {
+            "行": prepared["行"],
+            "顧客名": prepared["顧客名"],
+            "案件名": prepared["案件名"],
+            "結果": status,
+            "詳細": detail,
+            "ページID": page_id or ""
+        }
+        results.append(result)
+        if on_result:
+            on_result(result, len(results), total)
+
+    valid_rows = []
+    for prepared in prepared_rows:
+        if prepared["errors"]:
+            record(prepared, RESULT_INVALID, " / ".join(prepared["errors"]))
+        elif save is None:
+            record(prepared, RESULT_VALIDATED)
+        else:
+            valid_rows.append(prepared)
+
+    if valid_rows:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(save, prepared["data"]): prepared for prepared in valid_rows}
+            for future in as_completed(futures):
+                prepared = futures[future]
+                try:
+                    page_id, error = future.result()
+                except Exception as e:
+                    page_id, error = None, f"保存エラー: {str(e)}"
+                if page_id and error:
+                    record(prepared, RESULT_PARTIAL, error, page_id)
+                elif page_id:
+                    record(prepared, RESULT_SUCCEEDED, page_id=page_id)
+                else:
+                    record(prepared, RESULT_FAILED, error)
+
+    results.sort(key=lambda result: result["行"])
+    elapsed = time.perf_counter() - started_at
+    succeeded = sum(1 for result in results if result["結果"] == RESULT_SUCCEEDED)
+    summary = {
+        "total": total,
+        "succeeded": succeeded,
+        "invalid": sum(1 for result in results if result["結果"] == RESULT_INVALID),
+        "failed": sum(1 for result in results if result["結果"] == RESULT_FAILED),
+        "partial": sum(1 for result in results if result["結果"] == RESULT_PARTIAL),
+        "elapsed": elapsed,
+        "throughput": succeeded / elapsed if elapsed > 0 else 0.0
+    }
+    return results, summary
+
+
+def format_summary(summary):
+    """集計を1行の文字列に整形"""
+    return (
+        f"全{summary['total']}件: 成功 {summary['succeeded']}件 / 検証エラー {summary['invalid']}件 / "
+        f"保存失敗 {summary['failed']}件 / 本文追記失敗 {summary['partial']}件（{summary['elapsed']:.1f}秒, {summary['throughput']:.2f}件/秒）"
+    )
+
+
+def report_csv(results):
+    """結果レポートをCSV文字列にする"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=REPORT_COLUMNS)
+    writer.writeheader()
+    writer.writerows(results)
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OmniSorter依頼をCSV/JSONLから一括でNotionに登録")
+    parser.add_argument("file", help="入力ファイル（.csv または .jsonl）")
+    parser.add_argument("--dry-run", action="store_true", help="検証のみ行い保存しない")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時書き込み数")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="最大リクエスト数/秒")
+    parser.add_argument("--report", help="結果レポートCSVの出力先")
+    parser.add_argument("--database-id", default=os.environ.get("NOTION_DATABASE_ID"),
+                        help="保存先DB（既定は環境変数 NOTION_DATABASE_ID）")
+    args = parser.parse_args(argv)
+
+    with open(args.file, "rb") as f:
+        prepared_rows = prepare_rows(read_rows(f.read(), args.file))
+
+    save = None
+    if not args.dry_run:
+        api_key = os.environ.get("NOTION_API_KEY")
+        if not api_key or not args.database_id:
+            parser.error("NOTION_API_KEY と NOTION_DATABASE_ID（または --database-id）を設定してください")
+        client = NotionClient(api_key, pool_size=args.concurrency, limiter=RateLimiter(args.rate))
+        save = notion_saver(client, args.database_id)
+
+    def on_result(result, done, total):
+        detail = f" {result['詳細']}" if result["詳細"] else ""
+        print(f"[{done}/{total}] {result['行']}行目 {result['結果']}{detail}", file=sys.stderr)
+
+    results, summary = import_rows(prepared_rows, save, args.concurrency, on_result)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8-sig", newline="") as f:
+            f.write(report_csv(results))
+    print(format_summary(summary))
+    return 0 if summary["invalid"] == 0 and summary["failed"] == 0 and summary["partial"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
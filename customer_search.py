@@ -0,0 +1,108 @@
+import heapq
+import re
+import unicodedata
+
+# 検索時に無視する法人格の表記（NFKC正規化・小文字化後の形）
+CORPORATE_DESIGNATORS = (
+    "株式会社", "有限会社", "合同会社", "合資会社", "合名会社",
+    "(株)", "(有)", "(同)", "(資)", "(名)"
+)
+
+# 空白・記号類（検索上は区切りとして扱わない）
+_IGNORED_CHARS = re.compile(r"[\s・･\-‐－ー—―_.,、。･/\\()（）「」\[\]]")
+
+_KATAKANA_START = ord("ァ")
+_KATAKANA_END = ord("ヶ")
+_KANA_OFFSET = ord("ァ") - ord("ぁ")
+
+
+def fold_kana(text):
+    """カタカナをひらがなに畳み込む"""
+    return "".join(
+        chr(ord(ch) - _KANA_OFFSET) if _KATAKANA_START <= ord(ch) <= _KATAKANA_END else ch
+        for ch in text
+    )
+
+
+def normalize(text):
+    """検索用に正規化（NFKC・小文字化・法人格除去・カナ畳み込み・記号除去）"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    for designator in CORPORATE_DESIGNATORS:
+        text = text.replace(designator, "")
+    text = fold_kana(text)
+    return _IGNORED_CHARS.sub("", text)
+
+
+def ngrams(text):
+    """1-gramと2-gramの集合"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def query_grams(text):
+    """クエリ側のn-gram（2文字以上なら2-gram、1文字ならその文字）"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class SearchIndex:
+    """正規化済みn-gramの転置インデックスによる前方・部分一致検索
+
+    クエリの全n-gramを含む候補を転置リストの積集合で絞り込み、
+    前方一致 → 部分一致 → n-gramの部分一致（表記ゆれ救済）の順に、
+    各段では正規化後の名前が短いもの・元の並び順が先のものを優先する。
+    """
+
+    def __init__(self, items, key=lambda item: item["name"]):
+        self.items = list(items)
+        self._normalized = [normalize(key(item)) for item in self.items]
+        # (正規化後の長さ, 元の並び順) を1つの整数にした並び替えキー
+        count = len(self.items)
+        self._rank = [len(text) * count + position for position, text in enumerate(self._normalized)]
+        self._postings = {}
+        for position, text in enumerate(self._normalized):
+            for gram in ngrams(text):
+                self._postings.setdefault(gram, set()).add(position)
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, query, limit=50):
+        """上位limit件を返す（クエリが空なら先頭limit件）"""
+        needle = normalize(query)
+        if not needle:
+            return self.items[:limit]
+
+        rank = self._rank.__getitem__
+        texts = self._normalized
+        postings = sorted((self._postings.get(gram, set()) for gram in query_grams(needle)), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+
+        prefix = [position for position in candidates if texts[position].startswith(needle)]
+        result = heapq.nsmallest(limit, prefix, key=rank)
+        if len(result) < limit:
+            prefix_set = set(prefix)
+            substring = [
+                position for position in candidates
+                if position not in prefix_set and needle in texts[position]
+            ]
+            result += heapq.nsmallest(limit - len(result), substring, key=rank)
+        if len(result) < limit:
+            result += self._fuzzy(postings, set(result), limit - len(result))
+        return [self.items[position] for position in result]
+
+    def _fuzzy(self, postings, exclude, limit):
+        """一部のn-gramだけが一致する候補を一致数の多い順に返す"""
+        if len(postings) < 2:
+            return []
+        hits = {}
+        for posting in postings:
+            for position in posting:
+                if position not in exclude:
+                    hits[position] = hits.get(position, 0) + 1
+        # 半数以上のn-gramが一致したものだけを候補にする
+        threshold = len(postings) / 2
+        scored = [(-count, self._rank[position], position) for position, count in hits.items() if count >= threshold]
+        return [position for _, _, position in heapq.nsmallest(limit, scored)]
@@ -0,0 +1,275 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 最初のページを待つ最大秒数（超えたら取得済み分だけで描画を続ける）
+FIRST_PAGE_TIMEOUT = 30
+
+# ローカルミラーの既定パス（アプリと同じディレクトリ）
+DEFAULT_MIRROR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".master_cache.sqlite3")
+
+# 削除・アーカイブされた行を掃除するための全件同期の間隔（秒）
+FULL_SYNC_INTERVAL = 24 * 60 * 60
+
+# ID→名前解決キャッシュの最大件数
+ENTITY_CACHE_SIZE = 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    last_edited_time TEXT
+);
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    last_edited_time TEXT
+);
+CREATE TABLE IF NOT EXISTS project_customers (
+    project_id TEXT NOT NULL,
+    customer_id TEXT NOT NULL,
+    PRIMARY KEY (project_id, customer_id)
+);
+CREATE INDEX IF NOT EXISTS idx_project_customers_customer ON project_customers (customer_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    kind TEXT PRIMARY KEY,
+    high_water TEXT,
+    synced_at REAL,
+    full_synced_at REAL
+);
+"""
+
+
+class MasterMirror:
+    """顧客企業マスタ・案件管理DBのローカルSQLiteミラー
+
+    last_edited_time の最大値を高水位として保持し、以降に更新された
+    ページだけを取得して差分反映する。Notionのタイムスタンプは分単位に
+    丸められるため、高水位と同じ分のページは重複して取得されるが、
+    UPSERTなので結果は変わらない。クエリ結果に現れない削除・アーカイブ
+    済みページは FULL_SYNC_INTERVAL ごとの全件同期で取り除く。
+    """
+
+    def __init__(self, path=DEFAULT_MIRROR_PATH):
+        self.path = path
+        self._sync_locks = {"customers": threading.Lock(), "projects": threading.Lock()}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def snapshot(self, kind):
+        """一覧とバージョンを同じトランザクションで読み、{version, items} で返す（案件は customer_ids 付き）"""
+        with self._connect() as conn:
+            count, last_edited = conn.execute(f"SELECT COUNT(*), MAX(last_edited_time) FROM {kind}").fetchone()
+            if kind == "projects":
+                rows = conn.execute(
+                    "SELECT p.id, p.name, GROUP_CONCAT(pc.customer_id) FROM projects p"
+                    " LEFT JOIN project_customers pc ON pc.project_id = p.id"
+                    " GROUP BY p.id ORDER BY p.rowid"
+                ).fetchall()
+                items = [{"id": row[0], "name": row[1], "customer_ids": row[2].split(",") if row[2] else []} for row in rows]
+            else:
+                rows = conn.execute(f"SELECT id, name FROM {kind} ORDER BY rowid").fetchall()
+                items = [{"id": row[0], "name": row[1]} for row in rows]
+        return {"version": f"{count}:{last_edited}", "items": items}
+
+    def count(self, kind):
+        """ミラー内の行数"""
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {kind}").fetchone()[0]
+
+    def sync_state(self, kind):
+        """(高水位, 最終同期時刻, 最終全件同期時刻) を返す"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT high_water, synced_at, full_synced_at FROM sync_state WHERE kind = ?", (kind,)
+            ).fetchone()
+        return row or (None, None, None)
+
+    def sync_customers(self, database, mapper, on_batch=None, wait=False):
+        """顧客企業マスタを差分同期（mapperはページを {id, name} に変換）"""
+        return self._sync("customers", database, mapper, on_batch, wait)
+
+    def sync_projects(self, database, mapper, on_batch=None, wait=False):
+        """案件管理DBを差分同期（mapperはページを {id, name, customer_ids} またはNoneに変換）"""
+        return self._sync("projects", database, mapper, on_batch, wait)
+
+    def _sync(self, kind, database, mapper, on_batch, wait):
+        lock = self._sync_locks[kind]
+        if not lock.acquire(blocking=wait):
+            # 別スレッドで同期中
+            return 0
+        try:
+            high_water, _, full_synced_at = self.sync_state(kind)
+            full = not high_water or not full_synced_at or time.time() - full_synced_at > FULL_SYNC_INTERVAL
+
+            payload = {}
+            if not full:
+                payload = {
+                    "filter": {
+                        "timestamp": "last_edited_time",
+                        "last_edited_time": {"on_or_after": high_water}
+                    }
+                }
+
+            started_at = time.time()
+            seen_ids = set()
+            new_high_water = high_water
+            synced = 0
+            # 画面操作からのリクエストを優先させる
+            for results in database.iter_query_pages(payload, background=True):
+                with self._connect() as conn:
+                    for page in results:
+                        seen_ids.add(page["id"])
+                        edited = page.get("last_edited_time")
+                        if edited and (not new_high_water or edited > new_high_water):
+                            new_high_water = edited
+                        self._upsert(conn, kind, page, mapper(page))
+                synced += len(results)
+                if on_batch:
+                    on_batch(synced)
+
+            with self._connect() as conn:
+                if full:
+                    self._sweep(conn, kind, seen_ids)
+                conn.execute(
+                    "INSERT INTO sync_state (kind, high_water, synced_at, full_synced_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(kind) DO UPDATE SET high_water = excluded.high_water,"
+                    " synced_at = excluded.synced_at,"
+                    " full_synced_at = COALESCE(excluded.full_synced_at, sync_state.full_synced_at)",
+                    (kind, new_high_water, started_at, started_at if full else None)
+                )
+            return synced
+        finally:
+            lock.release()
+
+    def put(self, kind, page, row):
+        """作成したページを同期を待たずにミラーへ反映（高水位は変えず、次の差分同期で上書きされる）"""
+        with self._connect() as conn:
+            self._upsert(conn, kind, page, row)
+
+    def _upsert(self, conn, kind, page, row):
+        if row is None:
+            self._delete(conn, kind, [page["id"]])
+            return
+        conn.execute(
+            f"INSERT INTO {kind} (id, name, last_edited_time) VALUES (?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET name = excluded.name, last_edited_time = excluded.last_edited_time",
+            (row["id"], row["name"], page.get("last_edited_time"))
+        )
+        if kind == "projects":
+            conn.execute("DELETE FROM project_customers WHERE project_id = ?", (row["id"],))
+            conn.executemany(
+                "INSERT OR IGNORE INTO project_customers (project_id, customer_id) VALUES (?, ?)",
+                [(row["id"], customer_id) for customer_id in row.get("customer_ids", [])]
+            )
+
+    def _delete(self, conn, kind, ids):
+        conn.executemany(f"DELETE FROM {kind} WHERE id = ?", [(page_id,) for page_id in ids])
+        if kind == "projects":
+            conn.executemany("DELETE FROM project_customers WHERE project_id = ?", [(page_id,) for page_id in ids])
+
+    def _sweep(self, conn, kind, seen_ids):
+        existing = {row[0] for row in conn.execute(f"SELECT id FROM {kind}")}
+        self._delete(conn, kind, existing - seen_ids)
+
+
+def index_projects(projects):
+    """案件一覧（customer_ids付き）から 顧客ID→[{id, name}] の対応表を作る
+
+    複数の顧客に紐付く案件は各顧客の一覧に入る。各一覧は元の順序を保つ。
+    """
+    index = {}
+    for project in projects:
+        entry = {"id": project["id"], "name": project["name"]}
+        for customer_id in project["customer_ids"]:
+            index.setdefault(customer_id, []).append(entry)
+    return index
+
+
+class BackgroundSync:
+    """同期ジョブをバックグラウンドで実行し、最初のバッチ到着を待てるようにする"""
+
+    def __init__(self, job):
+        self._job = job
+        self._first_batch = threading.Event()
+        self._thread = None
+        self.count = 0
+        self.done = False
+        self.error = None
+
+    def start(self, wait_first=True):
+        """同期を開始（wait_first=Trueなら最初のバッチ反映まで待つ）"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        if wait_first:
+            self._first_batch.wait(FIRST_PAGE_TIMEOUT)
+        return self
+
+    def _on_batch(self, count):
+        self.count = count
+        self._first_batch.set()
+
+    def _run(self):
+        try:
+            self._job(self._on_batch)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._first_batch.set()
+
+    def wait(self, timeout=None):
+        """同期完了まで待つ"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.done
+
+
+class EntityResolver:
+    """ページID→{name, customer_ids} のLRUキャッシュ（スレッドセーフ）
+
+    マスタ一覧の取得やページ作成のたびに登録しておき、保存時の
+    顧客名・案件名の解決でページ取得（GET）を省く。
+    """
+
+    def __init__(self, maxsize=ENTITY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entities = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entities)
+
+    def get(self, page_id):
+        """登録済みなら {name, customer_ids} を返す（なければNone）"""
+        with self._lock:
+            entity = self._entities.get(page_id)
+            if entity is None:
+                self.misses += 1
+                return None
+            self._entities.move_to_end(page_id)
+            self.hits += 1
+            return entity
+
+    def put(self, page_id, name, customer_ids=None):
+        """エンティティを登録（上限を超えたら最も古く使われたものから捨てる）"""
+        with self._lock:
+            self._entities[page_id] = {"name": name, "customer_ids": list(customer_ids or [])}
+            self._entities.move_to_end(page_id)
+            while len(self._entities) > self.maxsize:
+                self._entities.popitem(last=False)
+
+    def put_many(self, items, customer_id=None):
+        """一覧（{id, name} のリスト）をまとめて登録"""
+        for item in items:
+            customer_ids = item.get("customer_ids") or ([customer_id] if customer_id else None)
+            self.put(item["id"], item["name"], customer_ids)
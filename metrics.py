@@ -0,0 +1,279 @@
+import threading
+import time
+
+# レイテンシヒストグラムのバケット上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Prometheusテキスト形式のContent-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """ラベル付きの累積カウンタ"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def values(self):
+        """{ラベル値のタプル: 値}"""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        for label_values, value in sorted(self.values().items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """ラベル付きのヒストグラム（バケットごとの件数・合計・件数）"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    series["buckets"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def series(self):
+        """{ラベル値のタプル: {buckets（累積でない件数）, sum, count}} のコピー"""
+        with self._lock:
+            return {
+                label_values: {"buckets": list(series["buckets"]), "sum": series["sum"], "count": series["count"]}
+                for label_values, series in self._series.items()
+            }
+
+    def quantile(self, q, *label_values):
+        """バケットから分位点を線形補間で推定（観測がなければNone）"""
+        series = self.series().get(label_values)
+        if not series or not series["count"]:
+            return None
+        target = q * series["count"]
+        cumulative = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, series["buckets"]):
+            if count and cumulative + count >= target:
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (target - cumulative) / count
+            cumulative += count
+            lower = upper if upper != float("inf") else lower
+        return lower
+
+    def samples(self):
+        for label_values, series in sorted(self.series().items()):
+            cumulative = 0
+            for upper, count in zip(self.buckets, series["buckets"]):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), label_values + (_format_value(upper),))
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum", labels, series["sum"]
+            yield f"{self.name}_count", labels, series["count"]
+
+
+class CallbackMetric:
+    """出力時に関数を呼んで値を取るメトリクス（関数は {ラベル値のタプル: 値} を返す）
+
+    件数を自前で数えているオブジェクト（依頼文キャッシュ等）をそのまま公開するのに使う。
+    """
+
+    def __init__(self, name, help_text, labels, callback, kind="gauge"):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception:
+            return
+        for label_values, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class MetricsRegistry:
+    """メトリクスの登録先（同じ名前で登録すると既存のものを返す）"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def callback(self, name, help_text, labels, callback, kind="gauge"):
+        """出力時に値を取るメトリクスを登録（同じ名前があれば関数を差し替える）"""
+        with self._lock:
+            self._metrics[name] = CallbackMetric(name, help_text, labels, callback, kind)
+            return self._metrics[name]
+
+    def render(self):
+        """Prometheusテキスト形式で出力"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# プロセス共通のレジストリ
+REGISTRY = MetricsRegistry()
+
+NOTION_REQUESTS = REGISTRY.counter(
+    "notion_requests_total", "Notion APIの呼び出し数（再試行を含む）", ("method", "endpoint", "database", "status")
+)
+NOTION_ERRORS = REGISTRY.counter(
+    "notion_request_errors_total", "エラー（4xx・5xx・通信エラー）になったNotion APIの呼び出し数",
+    ("method", "endpoint", "database")
+)
+NOTION_LATENCY = REGISTRY.histogram(
+    "notion_request_duration_seconds", "Notion APIの応答時間", ("method", "endpoint", "database")
+)
+RERUN_DURATION = REGISTRY.histogram("app_rerun_duration_seconds", "main() の1回の再実行にかかった時間")
+CACHE_LOOKUPS = REGISTRY.counter("app_cache_lookups_total", "キャッシュの参照数", ("cache",))
+CACHE_MISSES = REGISTRY.counter("app_cache_misses_total", "キャッシュミス（再取得・再構築）の数", ("cache",))
+FIRST_RENDER_DURATION = REGISTRY.histogram(
+    "app_session_first_render_duration_seconds", "セッションの初回表示（スクリプト開始から main() 完了まで）の時間"
+)
+
+# プロセス起動後1回だけ計る時間 {段階: 秒}（import: モジュール読み込み, first_render: 最初のセッションの初回表示, warmup: 事前準備）
+STARTUP = {}
+_startup_lock = threading.Lock()
+REGISTRY.callback(
+    "app_startup_duration_seconds", "プロセス起動後の各段階の所要時間", ("phase",),
+    lambda: {(phase,): seconds for phase, seconds in dict(STARTUP).items()}
+)
+
+
+def notion_endpoint(method, path):
+    """APIパスを (エンドポイント名, ページ/DBのID) に正規化（IDでラベルが増えないように）"""
+    parts = path.strip("/").split("/")
+    if parts[0] == "databases" and len(parts) >= 2:
+        return ("databases/query" if parts[-1] == "query" else "databases/retrieve"), parts[1]
+    if parts[0] == "pages":
+        return ("pages/create" if method == "POST" and len(parts) == 1 else "pages/retrieve"), None
+    if parts[0] == "blocks" and parts[-1] == "children":
+        return "blocks/children", None
+    return parts[0], None
+
+
+def observe_notion(method, endpoint, database, status, seconds):
+    """Notion API呼び出し1回分を記録（statusは応答コード、通信エラーは "error"）"""
+    database = database or ""
+    NOTION_REQUESTS.inc(method, endpoint, database, str(status))
+    NOTION_LATENCY.observe(seconds, method, endpoint, database)
+    if status == "error" or int(status) >= 400:
+        NOTION_ERRORS.inc(method, endpoint, database)
+
+
+def record_cache_lookup(cache):
+    """キャッシュ参照1回分を記録"""
+    CACHE_LOOKUPS.inc(cache)
+
+
+def record_cache_miss(cache):
+    """キャッシュミス（再取得・再構築）1回分を記録"""
+    CACHE_MISSES.inc(cache)
+
+
+def record_startup(phase, seconds):
+    """起動時の段階の所要時間を記録（プロセスで最初の1回だけ）"""
+    with _startup_lock:
+        STARTUP.setdefault(phase, seconds)
+
+
+class Timer:
+    """with文の所要時間をヒストグラムに記録"""
+
+    def __init__(self, histogram, *label_values):
+        self.histogram = histogram
+        self.label_values = label_values
+        self.elapsed = None
+
+    def __enter__(self):
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self._started_at
+        self.histogram.observe(self.elapsed, *self.label_values)
+        return False
+
+
+def start_metrics_server(port, host="0.0.0.0", registry=REGISTRY):
+    """別スレッドで GET /metrics を待ち受けるサーバーを開始"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?", 1)[0].rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
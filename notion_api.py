@@ -0,0 +1,459 @@
+import json
+import random
+import threading
+import time
+
+from metrics import notion_endpoint, observe_notion
+
+# Notion API設定
+NOTION_API_BASE = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+# (接続タイムアウト, 読み取りタイムアウト) 秒
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_POOL_SIZE = 10
+
+# databases/{id}/query の1回あたり最大取得件数
+MAX_PAGE_SIZE = 100
+
+# テキスト1要素の最大長（UTF-16単位）、rich_text配列・子ブロック配列の最大要素数
+MAX_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_ITEMS = 100
+MAX_CHILDREN = 100
+
+# 段落ブロック1つに入れる rich_text の要素数（1ブロックの大きさを抑えて追記を分割できるようにする）
+MAX_PARAGRAPH_ITEMS = 10
+
+# 1リクエストのボディの上限（バイト、Notionの上限500KBに余裕を持たせる）
+MAX_PAYLOAD_BYTES = 400 * 1024
+
+# データベーススキーマのキャッシュ期間（秒）
+SCHEMA_TTL = 600
+
+# プロセス全体のリクエストレート（Notionの上限は平均3リクエスト/秒）
+DEFAULT_RATE = 3
+DEFAULT_BURST = 3
+
+# バックグラウンドのリクエスト（マスタ同期・先読み）が残しておくトークン数
+BACKGROUND_RESERVE = 1
+
+# 再試行する応答ステータスと再試行設定
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+
+class NotionAPIError(Exception):
+    """Notion APIがエラーレスポンスを返した"""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+def is_schema_mismatch(response):
+    """ページ作成がスキーマ不一致（存在しない・型違いのプロパティ）で失敗したか"""
+    if response.status_code != 400:
+        return False
+    try:
+        return response.json().get("code") == "validation_error"
+    except ValueError:
+        return False
+
+
+class RateLimiter:
+    """トークンバケット方式のレート制限（スレッドセーフ、待機状況を集計）
+
+    background=True の取得は、画面操作からのリクエストが待っている間は譲り、
+    BACKGROUND_RESERVE 個のトークンを残すので、画面操作を待たせない。
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._foreground_waiting = 0
+        self._acquired = 0
+        self._waited_count = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def acquire(self, background=False):
+        """トークンを1つ取得するまで待ち、待機秒数を返す"""
+        started_at = time.monotonic()
+        queued = False
+        # バックグラウンドはトークンを残して取得する（burstが小さい場合も1つは取れるようにする）
+        needed = 1 + min(BACKGROUND_RESERVE, self.burst - 1) if background else 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                    self._updated_at = now
+                    if self._tokens >= needed and not (background and self._foreground_waiting):
+                        self._tokens -= 1
+                        waited = now - started_at
+                        self._acquired += 1
+                        if queued:
+                            self._waited_count += 1
+                            self._total_wait += waited
+                            self._max_wait = max(self._max_wait, waited)
+                        return waited
+                    if not queued:
+                        queued = True
+                        self._waiting += 1
+                        if not background:
+                            self._foreground_waiting += 1
+                    delay = max(needed - self._tokens, 1) / self.rate if background else (1 - self._tokens) / self.rate
+                time.sleep(delay)
+        finally:
+            if queued:
+                with self._lock:
+                    self._waiting -= 1
+                    if not background:
+                        self._foreground_waiting -= 1
+
+    def stats(self):
+        """待機中の数・累計待機時間などの集計"""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "waiting": self._waiting,
+                "acquired": self._acquired,
+                "waited": self._waited_count,
+                "total_wait": self._total_wait,
+                "max_wait": self._max_wait,
+                "average_wait": self._total_wait / self._waited_count if self._waited_count else 0.0
+            }
+
+
+def retry_delay(response, attempt):
+    """再試行までの待機秒数（Retry-Afterがあれば優先し、なければジッター付き指数バックオフ）"""
+    backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after) + backoff / 2
+        except ValueError:
+            pass
+    return backoff
+
+
+def split_text(text, limit=MAX_TEXT_LENGTH):
+    """テキストをlimit（UTF-16単位）以下の断片に分割（できるだけ改行の直後で切る）"""
+    chunks = []
+    start = 0
+    length = 0
+    last_newline = None
+    for i, char in enumerate(text):
+        size = 2 if ord(char) > 0xFFFF else 1
+        if length + size > limit and last_newline is not None:
+            # 直前の改行で切り、残りは次の断片に持ち越す
+            chunks.append(text[start:last_newline])
+            start = last_newline
+            length = len(text[start:i].encode("utf-16-le")) // 2
+            last_newline = None
+        if length + size > limit:
+            chunks.append(text[start:i])
+            start = i
+            length = 0
+        length += size
+        if char == "\n":
+            last_newline = i + 1
+    if start < len(text) or not chunks:
+        chunks.append(text[start:])
+    return chunks
+
+
+def rich_text(text, max_items=MAX_RICH_TEXT_ITEMS):
+    """テキストを2000文字ずつの rich_text 配列に変換（max_items 要素を超える分は切り捨て）"""
+    return [{"text": {"content": chunk}} for chunk in split_text(str(text))[:max_items]]
+
+
+def text_blocks(heading, text):
+    """見出しと全文の段落ブロック（1段落に rich_text を MAX_PARAGRAPH_ITEMS 要素まで入れる）"""
+    segments = [{"type": "text", "text": {"content": chunk}} for chunk in split_text(str(text))]
+    blocks = [{"object": "block", "type": "heading_3", "heading_3": {"rich_text": [{"type": "text", "text": {"content": heading}}]}}]
+    for i in range(0, len(segments), MAX_PARAGRAPH_ITEMS):
+        blocks.append({"object": "block", "type": "paragraph", "paragraph": {"rich_text": segments[i:i + MAX_PARAGRAPH_ITEMS]}})
+    return blocks
+
+
+def payload_size(payload):
+    """requests が送るJSONボディのバイト数（非ASCII文字は \\uXXXX にエスケープされる）"""
+    return len(json.dumps(payload).encode("utf-8"))
+
+
+def batch_children(children, max_bytes=MAX_PAYLOAD_BYTES):
+    """子ブロックを MAX_CHILDREN 個・max_bytes バイト以下のリクエストに分ける"""
+    batch = []
+    size = 0
+    for block in children:
+        block_size = payload_size(block) + 1
+        if batch and (len(batch) >= MAX_CHILDREN or size + block_size > max_bytes):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(block)
+        size += block_size
+    if batch:
+        yield batch
+
+
+class DatabaseSchema:
+    """データベースのプロパティ構成（タイトルプロパティ名を事前に算出）"""
+
+    def __init__(self, database_id, properties):
+        self.database_id = database_id
+        self.properties = properties
+        self.title_property = next(
+            (name for name, prop in properties.items() if prop.get("type") == "title"), None
+        )
+        self.fetched_at = time.monotonic()
+
+    def has(self, name):
+        """プロパティが存在するか"""
+        return name in self.properties
+
+    def first_available(self, names):
+        """候補のうち最初に存在するプロパティ名（なければNone）"""
+        return next((name for name in names if name in self.properties), None)
+
+    def describe(self):
+        """「プロパティ名 (型)」のリスト"""
+        return [f"{name} ({prop.get('type', 'unknown')})" for name, prop in self.properties.items()]
+
+
+class SchemaRegistry:
+    """データベーススキーマをTTL付きでキャッシュ
+
+    ページ作成がスキーマ不一致で失敗したときだけ invalidate() で
+    取り直すので、通常の作成はスキーマ取得なしの1回のPOSTで済む。
+    """
+
+    def __init__(self, client, ttl=SCHEMA_TTL):
+        self.client = client
+        self.ttl = ttl
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def get(self, database_id, refresh=False, timeout=None):
+        """スキーマを取得（キャッシュ切れ・refresh指定時のみAPIを呼ぶ）"""
+        with self._lock:
+            schema = self._schemas.get(database_id)
+        if schema and not refresh and time.monotonic() - schema.fetched_at < self.ttl:
+            return schema
+
+        response = self.client.database_by_id(database_id).retrieve(timeout)
+        if response.status_code != 200:
+            raise NotionAPIError(response.status_code, response.text)
+        schema = DatabaseSchema(database_id, response.json().get("properties", {}))
+        with self._lock:
+            self._schemas[database_id] = schema
+        return schema
+
+    def invalidate(self, database_id=None):
+        """キャッシュを破棄（database_id省略時は全て）"""
+        with self._lock:
+            if database_id is None:
+                self._schemas.clear()
+            else:
+                self._schemas.pop(database_id, None)
+
+
+class NotionDatabase:
+    """特定データベースに紐付いた操作ヘルパー"""
+
+    def __init__(self, client, database_id):
+        self.client = client
+        self.database_id = database_id
+
+    def retrieve(self, timeout=None):
+        """データベース構造を取得（timeout省略時はクライアントの既定値）"""
+        return self.client.request("GET", f"databases/{self.database_id}", timeout=timeout or self.client.timeout)
+
+    def schema(self, refresh=False):
+        """キャッシュ済みのスキーマを取得"""
+        return self.client.schemas.get(self.database_id, refresh)
+
+    def query(self, payload=None, background=False):
+        """データベースをクエリ"""
+        return self.client.request("POST", f"databases/{self.database_id}/query", json=payload or {},
+                                   background=background)
+
+    def iter_query_pages(self, payload=None, page_size=MAX_PAGE_SIZE, background=False):
+        """next_cursorを辿りながら1レスポンス分ずつ結果リストをyield"""
+        payload = dict(payload or {})
+        payload["page_size"] = page_size
+        while True:
+            response = self.query(payload, background)
+            if response.status_code != 200:
+                raise NotionAPIError(response.status_code, response.text)
+            data = response.json()
+            yield data.get("results", [])
+            if not data.get("has_more") or not data.get("next_cursor"):
+                return
+            payload["start_cursor"] = data["next_cursor"]
+
+    def iter_query(self, payload=None, page_size=MAX_PAGE_SIZE):
+        """全ページの行を到着順にyield"""
+        for results in self.iter_query_pages(payload, page_size):
+            yield from results
+
+    def create_page(self, properties, retry_server_errors=False):
+        """データベースにページを作成（本文ブロックは作成後に append_children で追記する）
+
+        5xxは処理済みかもしれないので既定では再試行しない（429は再試行する）。
+        retry_server_errors=True は冪等キーで作成済みページを探してから書き込む呼び出し元だけが指定する。
+        """
+        payload = {
+            "parent": {"database_id": self.database_id},
+            "properties": properties
+        }
+        return self.client.request("POST", "pages", json=payload, retry_server_errors=retry_server_errors)
+
+    def find_by_text(self, property_name, value):
+        """テキストプロパティが value に一致する最初のページ（なければNone）"""
+        response = self.query({
+            "filter": {"property": property_name, "rich_text": {"equals": value}},
+            "page_size": 1
+        })
+        if response.status_code != 200:
+            raise NotionAPIError(response.status_code, response.text)
+        results = response.json().get("results", [])
+        return results[0] if results else None
+
+    def create_page_from_schema(self, build_properties):
+        """スキーマからプロパティを組み立ててページを作成
+
+        スキーマ不一致で失敗した場合はスキーマを取り直して1回だけ再試行する。
+        (レスポンス, 使用したスキーマ, 送信したプロパティ) を返す。
+        """
+        schema = self.schema()
+        properties = build_properties(schema)
+        response = self.create_page(properties)
+        if is_schema_mismatch(response):
+            schema = self.schema(refresh=True)
+            properties = build_properties(schema)
+            response = self.create_page(properties)
+        return response, schema, properties
+
+
+class NotionClient:
+    """Notion APIクライアント（接続プール付きセッションをプロセス内で共有）"""
+
+    def __init__(self, api_key, database_ids=None, timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE,
+                 limiter=None, max_retries=MAX_RETRIES, base_url=None):
+        # 省略時は NOTION_API_BASE（テスト用サーバーやプロキシを使う場合に指定）
+        self.base_url = (base_url or NOTION_API_BASE).rstrip("/")
+        self.timeout = timeout
+        self.database_ids = {name: db_id for name, db_id in (database_ids or {}).items() if db_id}
+        self.schemas = SchemaRegistry(self)
+        # 同じクライアントを使う全スレッド・全セッションで共有するレート制限
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.retry_counts = {}
+        self._retry_lock = threading.Lock()
+
+        # requests は読み込みに時間がかかるので、クライアントを作るときに初めて読み込む
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._request_errors = requests.exceptions.RequestException
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Notion-Version": NOTION_VERSION
+        })
+        # keep-aliveで再利用するコネクションプール
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, path, **kwargs):
+        """APIリクエストを送信してレスポンスを返す
+
+        レート制限のトークンを取得してから送信し、429・5xxの場合は
+        Retry-Afterを尊重して max_retries 回まで再試行する。
+        background=True はマスタ同期など画面操作を待たせてはいけないリクエスト。
+        retry_server_errors=False なら5xxは再試行しない（処理済みかもしれないページ作成を
+        重複させないため。429は処理されていないので再試行する）。
+        """
+        background = kwargs.pop("background", False)
+        retry_statuses = RETRY_STATUSES if kwargs.pop("retry_server_errors", True) else (429,)
+        kwargs.setdefault("timeout", self.timeout)
+        endpoint, database = self._metric_labels(method, path, kwargs.get("json"))
+        attempt = 0
+        while True:
+            self.limiter.acquire(background)
+            started_at = time.perf_counter()
+            try:
+                response = self.session.request(method, f"{self.base_url}/{path}", **kwargs)
+            except self._request_errors:
+                observe_notion(method, endpoint, database, "error", time.perf_counter() - started_at)
+                raise
+            observe_notion(method, endpoint, database, response.status_code, time.perf_counter() - started_at)
+            if response.status_code not in retry_statuses or attempt >= self.max_retries:
+                return response
+            with self._retry_lock:
+                self.retry_counts[response.status_code] = self.retry_counts.get(response.status_code, 0) + 1
+            time.sleep(retry_delay(response, attempt))
+            attempt += 1
+
+    def _metric_labels(self, method, path, payload):
+        """メトリクス用の (エンドポイント, データベース) ラベル（設定名がわかるDBは設定名で表す）"""
+        endpoint, database_id = notion_endpoint(method, path)
+        if database_id is None and isinstance(payload, dict):
+            database_id = payload.get("parent", {}).get("database_id")
+        if not database_id:
+            return endpoint, ""
+        for name, configured_id in self.database_ids.items():
+            if configured_id.replace("-", "") == database_id.replace("-", ""):
+                return endpoint, name
+        return endpoint, database_id
+
+    def database(self, name):
+        """設定名（CUSTOMER_DB_ID等）からデータベースヘルパーを取得（未設定ならNone）"""
+        database_id = self.database_ids.get(name)
+        if not database_id:
+            return None
+        return NotionDatabase(self, database_id)
+
+    def database_by_id(self, database_id):
+        """データベースIDから直接ヘルパーを取得"""
+        return NotionDatabase(self, database_id)
+
+    def get_page(self, page_id):
+        """ページを取得"""
+        return self.request("GET", f"pages/{page_id}")
+
+    def create_page(self, payload):
+        """ページを作成（5xxは処理済みかもしれないので再試行しない）"""
+        return self.request("POST", "pages", json=payload, retry_server_errors=False)
+
+    def append_children(self, block_id, children, on_progress=None):
+        """ページ・ブロックの末尾に子ブロックを追記し、最後のレスポンス（失敗したらその時点のもの）を返す
+
+        1リクエストは MAX_CHILDREN 個・MAX_PAYLOAD_BYTES バイト以下に分け、
+        on_progress(追記済みの個数) をリクエストが成功するたびに呼ぶ。
+        """
+        response = None
+        appended = 0
+        for batch in batch_children(children):
+            response = self.request("PATCH", f"blocks/{block_id}/children", json={"children": batch})
+            if response.status_code != 200:
+                return response
+            appended += len(batch)
+            if on_progress:
+                on_progress(appended)
+        return response
+
+    def close(self):
+        """セッションを閉じる"""
+        self.session.close()
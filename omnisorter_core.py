@@ -0,0 +1,655 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from notion_api import MAX_TEXT_LENGTH, rich_text, text_blocks
+
+# フォーム項目データ
+FORM_ITEMS = [
+    {"大項目": "OS機種", "小項目": "-", "必要種別": "見積,図面", "取り得る値": "S,M,L,mini", "備考": ""},
+    {"大項目": "本体構成", "小項目": "段", "必要種別": "見積,図面", "取り得る値": "2,3,4,5", "備考": ""},
+    {"大項目": "本体構成", "小項目": "列", "必要種別": "見積,図面", "取り得る値": "3,4,5", "備考": ""},
+    {"大項目": "本体構成", "小項目": "ブロック", "必要種別": "見積,図面", "取り得る値": "(任意)", "備考": "最大10"},
+    {"大項目": "本体構成", "小項目": "間口タイプ", "必要種別": "見積,図面", "取り得る値": "カート式,固定（棚）式,スロープ式", "備考": ""},
+    {"大項目": "本体構成", "小項目": "短スロープ長さ", "必要種別": "見積,図面", "取り得る値": "", "備考": "mm単位"},
+    {"大項目": "本体構成", "小項目": "スロープ長さ", "必要種別": "見積,図面", "取り得る値": "", "備考": "mm単位　※スロープタイプの場合のみ"},
+    {"大項目": "本体構成", "小項目": "引き出し有無", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": "※スロープタイプの場合のみ"},
+    {"大項目": "設置容器", "小項目": "標準/個別", "必要種別": "見積,図面", "取り得る値": "標準トート,個別容器,無し", "備考": ""},
+    {"大項目": "設置容器", "小項目": "奥行", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "設置容器", "小項目": "幅", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "設置容器", "小項目": "高さ", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "仕分け商品", "小項目": "最大奥行", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "仕分け商品", "小項目": "最大幅", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "仕分け商品", "小項目": "最大高さ", "必要種別": "図面", "取り得る値": "(任意)", "備考": "mm単位"},
+    {"大項目": "オプション", "小項目": "DAS", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": ""},
+    {"大項目": "オプション", "小項目": "満杯センサー", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": ""},
+    {"大項目": "オプション", "小項目": "追加カート", "必要種別": "見積", "取り得る値": "(選択)", "備考": "※カート式の場合のみ"},
+    {"大項目": "オプション", "小項目": "追加トート", "必要種別": "見積", "取り得る値": "(選択)", "備考": "※標準トートの場合のみ"},
+    {"大項目": "オプション", "小項目": "滑り止めベルト", "必要種別": "見積", "取り得る値": "有,無", "備考": ""},
+    {"大項目": "オプション", "小項目": "薄物対応", "必要種別": "見積,図面", "取り得る値": "有,無", "備考": ""}
+]
+
+# 翻訳辞書
+TRANSLATE_CATEGORY = {
+    'OS機種': 'Model',
+    '本体構成': 'Main Configuration',
+    '設置容器': 'Container',
+    '仕分け商品': 'Sorting Product',
+    'オプション': 'Options'
+}
+
+TRANSLATE_ITEM = {
+    '段': 'Rows', '列': 'Columns', 'ブロック': 'Cells', '間口タイプ': 'Grid Type',
+    '短スロープ長さ': 'Short Slope Length', 'スロープ長さ': 'Slope Length',
+    '引き出し有無': 'Drawer Availability', '標準/個別': 'Container Type',
+    '奥行': 'Depth', '幅': 'Width', '高さ': 'Height',
+    '最大奥行': 'Max Depth', '最大幅': 'Max Width', '最大高さ': 'Max Height',
+    'DAS': 'DAS', '満杯センサー': 'Full Sensor',
+    '追加カート': 'Additional Cart', '追加トート': 'Additional Tote',
+    '滑り止めベルト': 'Anti-slip Belt', '薄物対応': 'Thin Item Support',
+    '間口数': 'Grid Count', '面数': 'Surface Count'
+}
+
+TRANSLATE_VALUE = {
+    'S': 'S', 'M': 'M', 'L': 'L', 'mini': 'mini',
+    'カート式': 'Cart Type', '固定（棚）式': 'Fixed (Shelf) Type', 'スロープ式': 'Slope Type',
+    '標準トート': 'Standard Tote', '個別容器': 'Individual Container', '無し': 'None',
+    '有': 'Yes', '無': 'No'
+}
+
+# 依頼種別の選択肢
+REQUEST_TYPES = ["見積/図面", "見積のみ", "図面のみ"]
+
+# 自動計算される項目（入力項目ではない）
+CALCULATED_KEYS = ["間口数", "面数"]
+
+# 数値入力として扱う単位
+NUMERIC_UNITS = ["mm単位", "台単位", "個単位"]
+
+# 選択肢を持たない「取り得る値」
+FREE_VALUES = ["(任意)", "", "(選択)"]
+
+# 条件付き表示の規則（備考の文言, 判定する項目キー, 表示する値）
+VISIBILITY_RULES = [
+    ("スロープタイプの場合のみ", "本体構成-間口タイプ", "スロープ式"),
+    ("カート式の場合のみ", "本体構成-間口タイプ", "カート式"),
+    ("標準トートの場合のみ", "設置容器-標準/個別", "標準トート")
+]
+
+class FormField:
+    """FORM_ITEMSの1項目を事前計算したもの（インポート時に1回だけ作成）"""
+    
+    __slots__ = (
+        "key", "category", "name", "note", "kinds", "options", "numeric", "mm",
+        "max_value", "condition", "label", "text_label", "drawing_category", "drawing_label"
+    )
+    
+    def __init__(self, item):
+        self.key = f"{item['大項目']}-{item['小項目']}"
+        self.category = item["大項目"]
+        self.name = item["小項目"]
+        self.note = item["備考"]
+        self.kinds = frozenset(item["必要種別"].split(","))
+        # 選択肢（自由入力・特別処理の項目は空）
+        self.options = () if item["取り得る値"] in FREE_VALUES else tuple(item["取り得る値"].split(","))
+        self.numeric = any(unit in self.note for unit in NUMERIC_UNITS)
+        self.mm = "mm単位" in self.note
+        # 「最大N」の上限
+        limit = re.match(r"最大(\d+)", self.note)
+        self.max_value = int(limit.group(1)) if limit else None
+        # 表示条件 (項目キー, 値)
+        self.condition = next(
+            ((key, value) for phrase, key, value in VISIBILITY_RULES if phrase in self.note), None
+        )
+        # 入力フォームのラベル
+        self.label = self.category if self.name == "-" else self.name
+        if self.note:
+            self.label += f" ({self.note})"
+        # 依頼文のラベル（日本語・英語）
+        self.text_label = "" if self.name == "-" else self.name
+        self.drawing_category = TRANSLATE_CATEGORY.get(self.category, self.category)
+        self.drawing_label = "" if self.name == "-" else TRANSLATE_ITEM.get(self.name, self.name)
+    
+    def is_visible(self, form_data):
+        """条件付きフィールドの表示判定"""
+        return self.condition is None or form_data.get(self.condition[0]) == self.condition[1]
+
+def compile_form_items(items):
+    """FORM_ITEMSをFormFieldのタプルに変換"""
+    return tuple(FormField(item) for item in items)
+
+# コンパイル済みフォーム項目
+FORM_FIELDS = compile_form_items(FORM_ITEMS)
+FIELDS_BY_KEY = {field.key: field for field in FORM_FIELDS}
+
+# 大項目ごとの項目（FORM_ITEMSの並び順）
+FIELDS_BY_CATEGORY = {
+    category: tuple(field for field in FORM_FIELDS if field.category == category)
+    for category in dict.fromkeys(field.category for field in FORM_FIELDS)
+}
+
+# 依頼文の種類ごとの対象項目（FORM_ITEMSの並び順、TextTemplate が使う）
+FIELDS_BY_KIND = {
+    kind: tuple(field for field in FORM_FIELDS if kind in field.kinds)
+    for kind in ("見積", "図面")
+}
+
+# 仕様詳細（Notion用）の大項目の並び
+SPEC_CATEGORIES = (*FIELDS_BY_CATEGORY, "自動計算値")
+
+class TextTemplate:
+    """依頼文1種類（1言語）分の文面定義"""
+    
+    __slots__ = ("fields", "header", "footer", "translate", "grid_category", "grid_label", "grid_value")
+    
+    def __init__(self, kind, header, footer, category_of, label_of, translate, grid_category, grid_label, grid_value):
+        # (項目, 見出し, ラベル) を依頼文に載せる順に並べたもの
+        self.fields = tuple((field, category_of(field), label_of(field)) for field in FIELDS_BY_KIND[kind])
+        self.header = header
+        self.footer = footer
+        self.translate = translate
+        self.grid_category = grid_category
+        self.grid_label = grid_label
+        self.grid_value = grid_value
+
+QUOTATION_TEMPLATE = TextTemplate(
+    "見積",
+    "OmniSorter見積依頼\n\n【基本仕様】\n",
+    "上記仕様にて見積をお願いいたします。\nよろしくお願いいたします。",
+    lambda field: field.category, lambda field: field.text_label, False,
+    "本体構成", "間口数", "{}口"
+)
+
+DRAWING_TEMPLATE = TextTemplate(
+    "図面",
+    "OmniSorter Drawing Request\n\n【Specifications】\n",
+    "Please provide technical drawings based on the above specifications.\n"
+    "Thank you for your cooperation.\n\nBest regards,",
+    lambda field: field.drawing_category, lambda field: field.drawing_label, True,
+    "Main Configuration", "Grid Count", "{} grids"
+)
+
+# render_all が生成する依頼文（言語を増やす場合はここに追加）
+TEXT_TEMPLATES = (QUOTATION_TEMPLATE, DRAWING_TEMPLATE)
+
+# 依頼文キャッシュの最大件数
+RENDER_CACHE_SIZE = 256
+
+# 長文のプロパティ（MAX_TEXT_LENGTH を超える場合はページ本文にも全文を残す）
+LONG_TEXT_PROPERTIES = ["見積依頼文", "図面依頼文", "仕様詳細", "備考"]
+
+# 案件管理DBの顧客企業リレーション（案件の読み書き・一覧の絞り込みはすべてこのプロパティ）
+CUSTOMER_RELATION_PROPERTY = "会社名_拠点名"
+
+# 送信キューの冪等キーを書き込むテキストプロパティ（依頼DBにあれば、再送時にこれで作成済みページを探す）
+IDEMPOTENCY_PROPERTY = "送信キー"
+
+# rich_textプロパティ1つに入れる最大要素数（ページ作成リクエストの大きさを抑える。
+# MAX_TEXT_LENGTH を超える長文は全文をページ本文にも残すので、超えた分は失われない）
+PROPERTY_TEXT_ITEMS = 5
+
+# 計算関数
+def calculate_grid_count(rows, cols, blocks):
+    """間口数を計算（段×列×2×ブロック数）"""
+    if rows and cols and blocks:
+        try:
+            return int(rows) * int(cols) * 2 * int(blocks)
+        except (ValueError, TypeError):
+            return 0
+    return 0
+
+def calculate_surface_count(blocks):
+    """面数を計算（ブロック数×2）"""
+    if blocks:
+        try:
+            return int(blocks) * 2
+        except (ValueError, TypeError):
+            return 0
+    return 0
+
+def get_cart_options(surface_count):
+    """追加カート選択肢を生成"""
+    if surface_count <= 0:
+        return [""]
+    
+    options = [""]
+    for multiplier in [0.5, 1, 1.5, 2]:
+        value = int(surface_count * multiplier)
+        options.append(f"{value}台 ({multiplier}倍)")
+    options.append("自由入力")
+    return options
+
+def get_tote_options(grid_count):
+    """追加トート選択肢を生成"""
+    if grid_count <= 0:
+        return [""]
+    
+    options = [""]
+    for multiplier in [0.5, 1, 1.5, 2]:
+        value = int(grid_count * multiplier)
+        options.append(f"{value}個 ({multiplier}倍)")
+    options.append("自由入力")
+    return options
+
+def render_all(form_data, templates=TEXT_TEMPLATES):
+    """仕様データを1回だけ走査して、依頼文（templatesの順）と仕様詳細（Notion用）をまとめて生成"""
+    # 1回の走査で項目ごとの値と仕様詳細の行を集める
+    values = {}
+    spec_groups = {category: [] for category in SPEC_CATEGORIES}
+    for key, value in form_data.items():
+        field = FIELDS_BY_KEY.get(key)
+        if field:
+            values[field] = value
+            spec_groups[field.category].append(f"  • {field.name}: {value}")
+        elif key in CALCULATED_KEYS:
+            spec_groups["自動計算値"].append(f"  • {key}: {value}")
+        elif "-" in key:
+            category, item = key.split("-", 1)
+            if category in spec_groups:
+                spec_groups[category].append(f"  • {item}: {value}")
+    
+    grid_count = form_data.get("間口数")
+    outputs = []
+    for template in templates:
+        groups = {}
+        for field, category, label in template.fields:
+            value = values.get(field)
+            if not value:
+                continue
+            if template.translate:
+                value = TRANSLATE_VALUE.get(value, value)
+            if field.mm:
+                value = f"{value}[mm]"
+            groups.setdefault(category, []).append(f"  {label}: {value}\n" if label else f"  {value}\n")
+        
+        # 自動計算値を追加
+        if grid_count:
+            groups.setdefault(template.grid_category, []).append(
+                f"  {template.grid_label}: {template.grid_value.format(grid_count)}\n"
+            )
+        
+        parts = [template.header]
+        for category, lines in groups.items():
+            parts.append(f"{category}:\n")
+            parts.extend(lines)
+            parts.append("\n")
+        parts.append(template.footer)
+        outputs.append("".join(parts))
+    
+    if not form_data:
+        outputs.append("仕様情報なし")
+    else:
+        parts = ["【仕様詳細】\n\n"]
+        for category, lines in spec_groups.items():
+            if lines:
+                parts.append(f"{category}:\n")
+                parts.append("\n".join(lines))
+                parts.append("\n\n")
+        outputs.append("".join(parts))
+    
+    return tuple(outputs)
+
+def render_key(form_data):
+    """依頼文キャッシュのキー（(キー, 値) のタプル、値がハッシュできなければNone）
+
+    仕様詳細は同じ大項目内で入力順に並ぶため、キーも入力順を保つ（並べ替えない）。
+    シリアライズ・ハッシュ計算をしないので、ヒット時は生成より十分に安い。
+    """
+    key = tuple(form_data.items())
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class RenderCache:
+    """仕様データ→(見積依頼文, 図面依頼文, 仕様詳細) のLRUキャッシュ（スレッドセーフ、全セッション共有）"""
+    
+    def __init__(self, maxsize=RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._renders = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self._renders)
+    
+    def render(self, form_data):
+        """依頼文を返す（同じ仕様なら生成済みのものを再利用）"""
+        key = render_key(form_data)
+        if key is None:
+            with self._lock:
+                self.misses += 1
+            return render_all(form_data)
+        with self._lock:
+            texts = self._renders.get(key)
+            if texts is not None:
+                self._renders.move_to_end(key)
+                self.hits += 1
+                return texts
+            self.misses += 1
+        
+        texts = render_all(form_data)
+        with self._lock:
+            self._renders[key] = texts
+            self._renders.move_to_end(key)
+            while len(self._renders) > self.maxsize:
+                self._renders.popitem(last=False)
+        return texts
+    
+    def stats(self):
+        """件数・ヒット数・ミス数"""
+        with self._lock:
+            return {"size": len(self._renders), "hits": self.hits, "misses": self.misses}
+
+# プロセス共通の依頼文キャッシュ
+RENDER_CACHE = RenderCache()
+
+def render_texts(form_data):
+    """(見積依頼文, 図面依頼文, 仕様詳細) をキャッシュ経由で取得"""
+    return RENDER_CACHE.render(form_data)
+
+def generate_quotation_text(form_data):
+    """見積依頼文生成（render_texts の見積依頼文）"""
+    return render_texts(form_data)[0]
+
+def generate_drawing_text(form_data):
+    """図面依頼文生成（英語、render_texts の図面依頼文）"""
+    return render_texts(form_data)[1]
+
+def should_show_field(field, form_data):
+    """条件付きフィールドの表示判定（fieldはFormField）"""
+    return field.is_visible(form_data)
+
+def apply_calculated_values(form_data):
+    """間口数・面数を計算して追加した仕様データを返す（入力フォームと同じ規則）"""
+    result = dict(form_data)
+    grid_count = calculate_grid_count(
+        form_data.get("本体構成-段"), form_data.get("本体構成-列"), form_data.get("本体構成-ブロック")
+    )
+    surface_count = calculate_surface_count(form_data.get("本体構成-ブロック"))
+    if grid_count > 0:
+        result["間口数"] = grid_count
+    if surface_count > 0:
+        result["面数"] = surface_count
+    return result
+
+def validate_form_data(form_data):
+    """仕様データをFORM_ITEMSに照らして検証し、エラーメッセージのリストを返す"""
+    errors = []
+    
+    for key, value in form_data.items():
+        if key in CALCULATED_KEYS:
+            continue
+        
+        field = FIELDS_BY_KEY.get(key)
+        if field is None:
+            errors.append(f"{key}: 未知の項目です")
+            continue
+        
+        value = str(value)
+        if field.options:
+            if value not in field.options:
+                errors.append(f"{key}: 「{value}」は選択肢にありません（{','.join(field.options)}）")
+        elif field.numeric:
+            if not value.isdigit():
+                errors.append(f"{key}: 数値を入力してください（{value}）")
+        
+        # 「最大N」の上限チェック
+        if field.max_value and (not value.isdigit() or not 1 <= int(value) <= field.max_value):
+            errors.append(f"{key}: 1〜{field.max_value}の整数を入力してください（{value}）")
+        
+        if not field.is_visible(form_data):
+            errors.append(f"{key}: 条件を満たさない項目です（{field.note}）")
+    
+    return errors
+
+def format_specifications_for_notion(specs_dict):
+    """仕様詳細をNotion用に見やすく整形（render_texts の仕様詳細）"""
+    return render_texts(specs_dict)[2]
+
+def request_long_texts(data):
+    """依頼データの長文プロパティ {プロパティ名: テキスト}（仕様詳細は見やすい形式に整形）"""
+    texts = {}
+    for name in LONG_TEXT_PROPERTIES:
+        if name == "仕様詳細":
+            texts[name] = render_texts(data["仕様詳細"])[2] if "仕様詳細" in data else ""
+        else:
+            texts[name] = str(data.get(name) or "")
+    return texts
+
+def build_long_text_blocks(data):
+    """プロパティの1要素に収まらない長文を、見出し付きのページ本文ブロックにする"""
+    blocks = []
+    for name, text in request_long_texts(data).items():
+        if len(text.encode("utf-16-le")) // 2 > MAX_TEXT_LENGTH:
+            blocks += text_blocks(name, text)
+    return blocks
+
+def build_request_properties(data):
+    """依頼データからOmniSorter依頼DB（簡易版）のページプロパティを組み立て"""
+    properties = {}
+    
+    # 必須フィールド - 顧客名をタイトルに設定
+    if data.get("顧客名"):
+        properties["顧客名"] = {
+            "title": [{"text": {"content": str(data["顧客名"])[:100]}}]
+        }
+    
+    # その他のフィールド
+    if data.get("案件名"):
+        properties["案件名"] = {
+            "rich_text": rich_text(data["案件名"], PROPERTY_TEXT_ITEMS)
+        }
+    
+    if data.get("依頼日"):
+        properties["依頼日"] = {
+            "date": {"start": str(data["依頼日"])}
+        }
+    
+    if data.get("依頼種別"):
+        properties["依頼種別"] = {
+            "select": {"name": str(data["依頼種別"])}
+        }
+    
+    if data.get("OS機種"):
+        properties["依頼機種"] = {
+            "select": {"name": str(data["OS機種"])}
+        }
+    
+    properties["ステータス"] = {
+        "select": {"name": "依頼中"}
+    }
+    
+    # 長いテキストフィールドは2000文字ずつに分割して保存
+    for name, text in request_long_texts(data).items():
+        if data.get(name):
+            properties[name] = {"rich_text": rich_text(text, PROPERTY_TEXT_ITEMS)}
+    
+    return properties
+
+def build_master_request_properties(data, project_id, use_relation, project_info=None):
+    """マスタ連携の依頼データからページプロパティを組み立て
+
+    use_relation=True（リレーション対応DB）なら案件をリレーションで、
+    それ以外（簡易版DB）は project_info の案件名・顧客名を直接保存する。
+    """
+    # 簡易版DBの場合は案件名も保存
+    properties = {}
+    
+    # 案件プロパティ（リレーション対応DBの場合）
+    if use_relation:
+        properties["案件"] = {
+            "relation": [{"id": project_id}]
+        }
+    elif project_info:
+        properties["案件名"] = {
+            "rich_text": rich_text(project_info["name"], PROPERTY_TEXT_ITEMS)
+        }
+        properties["顧客名"] = {
+            "title": [{"text": {"content": project_info["customer_name"]}}]
+        }
+    
+    # 共通プロパティ（依頼日は送信キューに登録した日。日付のない古いエントリは送信した日）
+    properties.update({
+        "依頼日": {
+            "date": {"start": str(data.get("依頼日") or datetime.now().strftime("%Y-%m-%d"))}
+        },
+        "依頼種別": {
+            "select": {"name": data["依頼種別"]}
+        },
+        "依頼機種": {
+            "select": {"name": data.get("OS機種", "未選択")}
+        },
+        "ステータス": {
+            "select": {"name": "依頼中"}
+        }
+    })
+    
+    # 長いテキストフィールドは2000文字ずつに分割して保存
+    for name, text in request_long_texts(data).items():
+        properties[name] = {"rich_text": rich_text(text, PROPERTY_TEXT_ITEMS)}
+    
+    return properties
+
+# Notion保存（clientは notion_api.NotionClient、resolverは master_store.EntityResolver。
+# EntityResolver は空だと偽になるので None と比較する）
+def get_customer_info(client, customer_id, resolver=None):
+    """顧客IDから顧客情報を取得（resolverに登録済みならGETしない）"""
+    cached = resolver.get(customer_id) if resolver is not None else None
+    if cached:
+        return {"name": cached["name"]}
+    
+    response = client.get_page(customer_id)
+    if response.status_code == 200:
+        data = response.json()
+        
+        company_name = ""
+        if data["properties"].get("会社名", {}).get("title"):
+            company_name = data["properties"]["会社名"]["title"][0]["text"]["content"]
+        
+        if resolver is not None:
+            resolver.put(customer_id, company_name)
+        return {"name": company_name}
+    
+    return None
+
+def get_project_info(client, project_id, resolver=None):
+    """プロジェクトIDから案件情報を取得（resolverに登録済みならGETしない）"""
+    project = resolver.get(project_id) if resolver is not None else None
+    if project is None:
+        response = client.get_page(project_id)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        
+        # 案件名を取得
+        project_name = ""
+        for prop_name, prop_data in data["properties"].items():
+            if prop_data.get("type") == "title":
+                if prop_data.get("title") and len(prop_data["title"]) > 0:
+                    project_name = prop_data["title"][0]["text"]["content"]
+                    break
+        
+        customer_relation = data["properties"].get(CUSTOMER_RELATION_PROPERTY, {}).get("relation", [])
+        project = {"name": project_name, "customer_ids": [related["id"] for related in customer_relation]}
+        if resolver is not None:
+            resolver.put(project_id, project["name"], project["customer_ids"])
+    
+    # 顧客名を取得（リレーションから）
+    customer_name = ""
+    if project["customer_ids"]:
+        customer_info = get_customer_info(client, project["customer_ids"][0], resolver)
+        if customer_info:
+            customer_name = customer_info["name"]
+    
+    return {
+        "name": project["name"],
+        "customer_name": customer_name
+    }
+
+def append_long_texts(client, page_id, data, delivery=None):
+    """長文の本文ブロックをページに追記し、エラー（なければNone）を返す
+
+    delivery（outbox.Delivery）があれば追記済みのブロックを飛ばして再開し、
+    リクエストが成功するたびに進み具合を記録する。
+    """
+    start = delivery.appended if delivery else 0
+    blocks = build_long_text_blocks(data)[start:]
+    if not blocks:
+        return None
+    on_progress = (lambda appended: delivery.progress(page_id, start + appended)) if delivery else None
+    response = client.append_children(page_id, blocks, on_progress)
+    if response.status_code != 200:
+        return f"本文の追記に失敗: {response.status_code}\nレスポンス: {response.text}"
+    return None
+
+def create_request_page(client, database_id, properties, delivery=None):
+    """ページを作成して (ページID, レスポンス) を返す（失敗時のページIDはNone）
+
+    delivery（outbox.Delivery）に作成済みのページIDがあれば作成を再実行せず
+    (そのページID, None) を返し、作成したら進み具合に記録する。
+    依頼DBに IDEMPOTENCY_PROPERTY があれば冪等キーを書き込み、以前に送信を
+    始めていたエントリはまずそのキーのページを探す（前回の作成が応答前に
+    タイムアウトしていてもページを重複させない）。
+    """
+    if delivery and delivery.page_id:
+        return delivery.page_id, None
+    database = client.database_by_id(database_id)
+    keyed = bool(delivery) and database.schema().has(IDEMPOTENCY_PROPERTY)
+    if keyed:
+        existing = database.find_by_text(IDEMPOTENCY_PROPERTY, delivery.key) if delivery.resumed else None
+        if existing:
+            delivery.progress(existing["id"], 0)
+            return existing["id"], None
+        properties = dict(properties, **{IDEMPOTENCY_PROPERTY: {"rich_text": rich_text(delivery.key)}})
+    # 5xxはその場で再試行しない（キーを書き込んだ作成は、送信キューが作成済みページを探してから再送する）
+    response = database.create_page(properties)
+    if response.status_code != 200:
+        return None, response
+    page_id = response.json()["id"]
+    if delivery:
+        delivery.progress(page_id, 0)
+    return page_id, response
+
+def save_request(client, database_id, data, delivery=None):
+    """依頼をOmniSorter依頼DB（簡易版）に保存し、(ページID, エラー) を返す（本文の追記だけ失敗したら両方）"""
+    page_id, response = create_request_page(client, database_id, build_request_properties(data), delivery)
+    if page_id is None:
+        return None, f"Notion API エラー: {response.status_code}\nレスポンス: {response.text}"
+    return page_id, append_long_texts(client, page_id, data, delivery)
+
+def save_master_request(client, project_id, data, resolver=None, delivery=None):
+    """マスタ連携の依頼を保存し、(ページID, エラー) を返す（本文の追記だけ失敗したら両方）
+
+    OMNISORTER_REQUEST_DB_ID が設定されていれば案件リレーション付きで、
+    未設定なら簡易版DB（NOTION_DATABASE_ID）に案件名・顧客名を直接保存する。
+    案件・顧客がresolverに登録済みなら保存はPOST 1回で済む（長文の本文があれば追記が続く）。
+    """
+    # まずマスタ連携用のDBを試す
+    request_db_id = client.database_ids.get("OMNISORTER_REQUEST_DB_ID")
+    use_relation = bool(request_db_id)
+    
+    # マスタ連携用が未設定の場合は簡易版DBを使用
+    if not request_db_id:
+        request_db_id = client.database_ids.get("NOTION_DATABASE_ID")
+    
+    if not request_db_id:
+        return None, "保存先データベースIDが設定されていません。"
+    
+    project_info = None
+    if not use_relation and not (delivery and delivery.page_id):
+        # プロジェクトIDから案件名を取得
+        try:
+            project_info = get_project_info(client, project_id, resolver)
+        except Exception:
+            project_info = {"name": "マスタ連携案件", "customer_name": "マスタ連携顧客"}
+    
+    properties = build_master_request_properties(data, project_id, use_relation, project_info)
+    page_id, response = create_request_page(client, request_db_id, properties, delivery)
+    if page_id is None:
+        return None, f"OmniSorter依頼保存に失敗: {response.status_code}\nレスポンス: {response.text}"
+    return page_id, append_long_texts(client, page_id, data, delivery)
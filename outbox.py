@@ -0,0 +1,367 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+# 送信キューの既定パス（アプリと同じディレクトリ）
+DEFAULT_OUTBOX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".outbox.sqlite3")
+
+# 送信の再試行設定
+MAX_ATTEMPTS = 5
+RETRY_BASE = 2
+RETRY_MAX = 300
+
+# 送信中のまま止まったエントリを再送対象に戻すまでの秒数（ワーカー停止対策）
+# Notionへの1リクエストは再試行込みで最大5分ほどかかるので、それより長くし、
+# リクエストが成功するたびに延長する
+SEND_LEASE = 600
+
+# リース延長のイベントに付ける詳細（送信回数には数えない）
+LEASE_RENEWED = "lease renewed"
+
+# キューが空のときの確認間隔（秒）
+POLL_INTERVAL = 5
+
+# イベントの状態
+STATUS_QUEUED = "queued"
+STATUS_SENDING = "sending"
+STATUS_RETRY = "retry"
+# ページは作成済みで、本文の追記を再試行待ち（再送では作成を飛ばして追記だけ行う）
+STATUS_PARTIAL = "partial"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    session_id TEXT,
+    kind TEXT NOT NULL,
+    label TEXT,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    outbox_id INTEGER NOT NULL REFERENCES outbox (id),
+    status TEXT NOT NULL,
+    detail TEXT,
+    retry_at REAL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox_progress (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    outbox_id INTEGER NOT NULL REFERENCES outbox (id),
+    page_id TEXT NOT NULL,
+    appended INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_session ON outbox (session_id);
+CREATE INDEX IF NOT EXISTS idx_outbox_progress_outbox ON outbox_progress (outbox_id, id);
+CREATE INDEX IF NOT EXISTS idx_outbox_events_outbox ON outbox_events (outbox_id, id);
+"""
+
+# 各エントリの最新イベント
+LATEST_EVENTS = """
+SELECT e.* FROM outbox_events e
+JOIN (SELECT outbox_id, MAX(id) AS id FROM outbox_events GROUP BY outbox_id) latest ON latest.id = e.id
+"""
+
+# 各エントリの最新の進み具合（作成済みのページIDと本文の追記済みブロック数）
+LATEST_PROGRESS = """
+SELECT p.* FROM outbox_progress p
+JOIN (SELECT outbox_id, MAX(id) AS id FROM outbox_progress GROUP BY outbox_id) latest ON latest.id = p.id
+"""
+
+
+class LeaseLost(Exception):
+    """リースが切れて別のワーカーがエントリを送信している"""
+
+
+def idempotency_key(session_id, kind, payload):
+    """同じセッションからの同じ内容の保存を1件にまとめるためのキー"""
+    canonical = json.dumps([session_id, kind, payload], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Outbox:
+    """Notionへの保存を永続化する追記専用の送信キュー（SQLite）
+
+    outbox にはエントリを、outbox_events には状態遷移を、outbox_progress には
+    作成済みのページと本文の追記の進み具合を追記するだけで、既存行の更新・削除は
+    行わない。エントリの現在の状態は最新のイベントで決まる。
+    送信は少なくとも1回（at-least-once）で、送信直後にプロセスが落ちた場合は
+    リース切れ後に再送される。再送時は冪等キーでNotion上の作成済みページを探して
+    重複作成を避ける（omnisorter_core.create_request_page）。
+    """
+
+    def __init__(self, path=DEFAULT_OUTBOX_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def enqueue(self, kind, payload, session_id=None, label=None, key=None):
+        """エントリを追加して (ID, 既存エントリの状態) を返す
+
+        同じ冪等キーのエントリがあれば追加せず、そのIDと登録前の状態を返す
+        （新しく追加したときの状態はNone）。既存エントリが失敗していれば送信待ちに戻す。
+        """
+        key = key or idempotency_key(session_id, kind, payload)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = conn.execute(
+                    "SELECT o.id, e.status FROM outbox o JOIN (" + LATEST_EVENTS + ") e ON e.outbox_id = o.id"
+                    " WHERE o.idempotency_key = ?",
+                    (key,)
+                ).fetchone()
+                if existing:
+                    if existing[1] == STATUS_FAILED:
+                        self._append(conn, existing[0], STATUS_QUEUED, retry_at=now)
+                    conn.execute("COMMIT")
+                    return existing[0], existing[1]
+                cursor = conn.execute(
+                    "INSERT INTO outbox (idempotency_key, session_id, kind, label, payload, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, session_id, kind, label, json.dumps(payload, ensure_ascii=False), now)
+                )
+                outbox_id = cursor.lastrowid
+                self._append(conn, outbox_id, STATUS_QUEUED, retry_at=now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return outbox_id, None
+
+    def _append(self, conn, outbox_id, status, detail=None, retry_at=None):
+        cursor = conn.execute(
+            "INSERT INTO outbox_events (outbox_id, status, detail, retry_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (outbox_id, status, detail, retry_at, time.time())
+        )
+        return cursor.lastrowid
+
+    def record(self, outbox_id, status, detail=None, retry_at=None):
+        """状態遷移を追記"""
+        with self._connect() as conn:
+            self._append(conn, outbox_id, status, detail, retry_at)
+
+    def record_progress(self, outbox_id, page_id, appended):
+        """作成済みのページIDと本文の追記済みブロック数を追記"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO outbox_progress (outbox_id, page_id, appended, created_at) VALUES (?, ?, ?, ?)",
+                (outbox_id, page_id, appended, time.time())
+            )
+
+    def requeue(self, outbox_id):
+        """失敗したエントリを送信待ちに戻す（再試行回数もリセット）"""
+        self.record(outbox_id, STATUS_QUEUED, retry_at=time.time())
+
+    def renew(self, outbox_id, lease_id):
+        """リースを延長して新しいリースIDを返す（他のワーカーに取られていたらNone）
+
+        最新のイベントが自分のリース（lease_id）のままのときだけ延長する。
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                latest = conn.execute(
+                    "SELECT MAX(id) FROM outbox_events WHERE outbox_id = ?", (outbox_id,)
+                ).fetchone()[0]
+                lease_id = None if latest != lease_id else self._append(
+                    conn, outbox_id, STATUS_SENDING, LEASE_RENEWED, retry_at=now + SEND_LEASE
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return lease_id
+
+    def claim(self, limit=1):
+        """送信可能なエントリを取得し、送信中として記録して返す
+
+        複数プロセスが同じファイルを使っても同じエントリを同時に送らないよう、
+        取得と「送信中」の記録は1つのトランザクションで行う。リースは
+        取得した時点から SEND_LEASE 秒なので、1件ずつ取得して送信する。
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 送信回数（最後の送信待ち以降）と、これまでに送信を始めたことがあるか
+                rows = conn.execute(
+                    "SELECT o.id, o.kind, o.payload, o.idempotency_key,"
+                    " (SELECT COUNT(*) FROM outbox_events s WHERE s.outbox_id = o.id AND s.status = ?"
+                    "  AND s.detail IS NULL"
+                    "  AND s.id > (SELECT MAX(q.id) FROM outbox_events q WHERE q.outbox_id = o.id AND q.status = ?)),"
+                    " EXISTS (SELECT 1 FROM outbox_events s WHERE s.outbox_id = o.id AND s.status = ?),"
+                    " p.page_id, p.appended"
+                    " FROM outbox o JOIN (" + LATEST_EVENTS + ") e ON e.outbox_id = o.id"
+                    " LEFT JOIN (" + LATEST_PROGRESS + ") p ON p.outbox_id = o.id"
+                    " WHERE e.status IN (?, ?, ?, ?) AND e.retry_at <= ?"
+                    " ORDER BY o.id LIMIT ?",
+                    (STATUS_SENDING, STATUS_QUEUED, STATUS_SENDING,
+                     STATUS_QUEUED, STATUS_RETRY, STATUS_PARTIAL, STATUS_SENDING, now, limit)
+                ).fetchall()
+                leases = [self._append(conn, row[0], STATUS_SENDING, retry_at=now + SEND_LEASE) for row in rows]
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return [
+            {
+                "id": row[0], "kind": row[1], "payload": json.loads(row[2]), "key": row[3],
+                "attempt": row[4] + 1, "resumed": bool(row[5]), "page_id": row[6], "appended": row[7] or 0,
+                "lease_id": lease_id
+            }
+            for row, lease_id in zip(rows, leases)
+        ]
+
+    def next_retry_at(self):
+        """次に送信可能になる時刻（送信待ちがなければNone）"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MIN(retry_at) FROM (" + LATEST_EVENTS + ") WHERE status IN (?, ?, ?, ?)",
+                (STATUS_QUEUED, STATUS_RETRY, STATUS_PARTIAL, STATUS_SENDING)
+            ).fetchone()
+        return row[0]
+
+    def entries(self, session_id=None, limit=10):
+        """エントリと最新状態を新しい順に返す（session_id指定時はそのセッションのみ）"""
+        query = (
+            "SELECT o.id, o.kind, o.label, o.created_at, e.status, e.detail, e.created_at, p.page_id"
+            " FROM outbox o JOIN (" + LATEST_EVENTS + ") e ON e.outbox_id = o.id"
+            " LEFT JOIN (" + LATEST_PROGRESS + ") p ON p.outbox_id = o.id"
+        )
+        params = []
+        if session_id is not None:
+            query += " WHERE o.session_id = ?"
+            params.append(session_id)
+        query += " ORDER BY o.id DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            {
+                "id": row[0], "kind": row[1], "label": row[2], "created_at": row[3],
+                "status": row[4], "detail": row[5], "updated_at": row[6], "page_id": row[7]
+            }
+            for row in rows
+        ]
+
+    def payload(self, outbox_id):
+        """エントリの保存内容"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM outbox WHERE id = ?", (outbox_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def counts(self):
+        """状態ごとのエントリ数"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM (" + LATEST_EVENTS + ") GROUP BY status").fetchall()
+        return dict(rows)
+
+
+class Delivery:
+    """エントリ1件の送信（送信関数に渡し、ページ作成・本文の追記の進み具合を記録させる）"""
+
+    def __init__(self, outbox, entry):
+        self.outbox = outbox
+        self.outbox_id = entry["id"]
+        self.key = entry["key"]
+        self.attempt = entry["attempt"]
+        # 以前に送信を始めたことがある（前回の作成リクエストがNotionに届いていたかもしれない）
+        self.resumed = entry["resumed"]
+        # 前回までに作成したページ（あれば作成を飛ばす）と追記済みのブロック数
+        self.page_id = entry["page_id"]
+        self.appended = entry["appended"]
+        self._lease_id = entry["lease_id"]
+
+    def progress(self, page_id, appended):
+        """ページを作成した・本文を追記したことを記録し、リースを延長する（再送時はここから再開する）
+
+        リースが切れて別のワーカーに取られていたら LeaseLost を送出して送信をやめる。
+        """
+        self.outbox.record_progress(self.outbox_id, page_id, appended)
+        self.page_id = page_id
+        self.appended = appended
+        self._lease_id = self.outbox.renew(self.outbox_id, self._lease_id)
+        if self._lease_id is None:
+            raise LeaseLost(f"エントリ {self.outbox_id} のリースが切れました")
+
+
+class OutboxWorker:
+    """送信キューをバックグラウンドで送信するワーカー
+
+    senders は種別ごとの送信関数 {kind: send(payload, delivery) -> (ページID, エラー)}。
+    ページの作成後に本文の追記だけが失敗した場合はページIDとエラーの両方を返し、
+    エントリは STATUS_PARTIAL になって、再送では追記だけをやり直す。
+    失敗時は指数バックオフで MAX_ATTEMPTS 回まで再試行する。
+    """
+
+    def __init__(self, outbox, senders, max_attempts=MAX_ATTEMPTS):
+        self.outbox = outbox
+        self.senders = senders
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """ワーカースレッドを開始"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def notify(self):
+        """新しいエントリが追加されたことを通知（すぐに送信を試みる）"""
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                claimed = self.outbox.claim()
+                for entry in claimed:
+                    self._send(entry)
+                if claimed:
+                    continue
+                next_at = self.outbox.next_retry_at()
+                timeout = POLL_INTERVAL if next_at is None else min(POLL_INTERVAL, max(0, next_at - time.time()))
+            except Exception:
+                timeout = POLL_INTERVAL
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def _send(self, entry):
+        sender = self.senders.get(entry["kind"])
+        if sender is None:
+            self.outbox.record(entry["id"], STATUS_FAILED, f"未知の種別: {entry['kind']}")
+            return
+
+        delivery = Delivery(self.outbox, entry)
+        try:
+            page_id, error = sender(entry["payload"], delivery)
+        except LeaseLost:
+            # 別のワーカーが送信を引き継いでいる
+            return
+        except Exception as e:
+            # 作成済みのページがあれば記録されている
+            page_id, error = delivery.page_id, f"保存エラー: {str(e)}"
+
+        if page_id and not error:
+            self.outbox.record(entry["id"], STATUS_SENT, page_id)
+        elif entry["attempt"] >= self.max_attempts:
+            self.outbox.record(entry["id"], STATUS_FAILED, error)
+        else:
+            delay = min(RETRY_MAX, RETRY_BASE * 2 ** (entry["attempt"] - 1)) * random.uniform(0.5, 1.0)
+            status = STATUS_PARTIAL if page_id else STATUS_RETRY
+            self.outbox.record(entry["id"], status, error, retry_at=time.time() + delay)
@@ -0,0 +1,62 @@
+import cProfile
+import io
+import marshal
+import pstats
+
+# ホットスポットの表示件数
+DEFAULT_TOP = 30
+
+
+class ProfileSession:
+    """複数回の実行をまとめて計測した結果（再実行ごとに add で追加）"""
+
+    def __init__(self, runs):
+        self.runs = runs
+        self.remaining = runs
+        # 実際に計測した回数（停止ボタンで途中で終えた場合は runs より少ない）
+        self.completed = 0
+        self.stats = None
+        self.error = None
+
+    @property
+    def active(self):
+        return self.remaining > 0
+
+    def run(self, func):
+        """func をプロファイラ付きで1回実行（例外はそのまま送出し、途中までの結果も残す）"""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # 他のプロファイラが動いている（Python 3.12以降は同時に1つまで）
+            self.error = str(e)
+            self.remaining = 0
+            return func()
+        try:
+            return func()
+        finally:
+            profiler.disable()
+            # 実行中に停止ボタンで0にされていたら負にしない
+            self.remaining = max(0, self.remaining - 1)
+            self.completed += 1
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+
+    def hotspots(self, limit=DEFAULT_TOP, sort="cumulative"):
+        """累積時間の上位limit件をテキストで返す"""
+        if self.stats is None:
+            return ""
+        output = io.StringIO()
+        # 表示用にはパスを省略したコピーを使う（dump の内容は変えない）
+        stats = pstats.Stats(stream=output)
+        stats.add(self.stats)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def dump(self):
+        """pstats形式のバイト列（python -m pstats や snakeviz で開ける）"""
+        if self.stats is None:
+            return b""
+        return marshal.dumps(self.stats.stats)
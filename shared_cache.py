@@ -0,0 +1,353 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import unquote, urlparse
+
+# 既定の共有キャッシュ（プロセス内のメモリ）
+DEFAULT_CACHE_URL = "memory://"
+
+# 保存する値の形式のバージョン（形式を変えたら上げて古い値を読まないようにする）
+CACHE_FORMAT_VERSION = 1
+
+# Redisへの接続・応答のタイムアウト（秒）
+REDIS_TIMEOUT = 2
+
+# バックエンドのエラー後、接続を試さずにキャッシュミス扱いにする秒数
+BACKEND_RETRY_INTERVAL = 10
+
+# 世代番号・刻印を確認してからバックエンドに問い合わせずに済ませる秒数
+# （1回の再実行で何度読んでも問い合わせは1回にする。他のプロセスの無効化はこの秒数だけ遅れて反映される）
+LOCAL_CHECK_INTERVAL = 1
+
+
+class MemoryCache:
+    """プロセス内のメモリに保持するバックエンド（複数プロセスでは共有されない）"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._values.get(key, (b"0", None))[0]) + 1
+            self._values[key] = (str(value).encode(), None)
+            return value
+
+
+class SQLiteCache:
+    """SQLiteファイルに保持するバックエンド（同じホストの複数プロセスで共有）"""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return bytes(row[0])
+
+    def set(self, key, value, ttl=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, value, time.time() + ttl if ttl else None)
+            )
+            # 期限切れの行を掃除
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def incr(self, key):
+        conn = self._connect()
+        try:
+            # 読み取りと更新の間に他のプロセスが割り込まないよう書き込みロックを先に取る
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            value = int(row[0]) + 1 if row else 1
+            conn.execute(
+                "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, NULL)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = NULL",
+                (key, str(value).encode())
+            )
+            conn.commit()
+            return value
+        finally:
+            conn.close()
+
+
+class RedisCache:
+    """Redisプロトコル（RESP）で接続するバックエンド（複数ホストのレプリカで共有）
+
+    使うコマンドは GET / SET PX / DEL / INCR（と AUTH / SELECT）だけなので、
+    Redis互換のサーバーであれば何でもよい。
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, timeout=REDIS_TIMEOUT):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    def _call(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redisとの接続が切れました")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RuntimeError(f"Redisエラー: {body.decode()}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"不正な応答: {line!r}")
+
+    def command(self, *args):
+        """コマンドを送信して応答を返す（接続が切れていたら1回だけ再接続）"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(*args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.command("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            self.command("SET", key, value)
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+    def incr(self, key):
+        return self.command("INCR", key)
+
+
+def open_cache(url=None):
+    """URLからバックエンドを作成
+
+    memory://                      プロセス内のメモリ（既定）
+    sqlite:///path/to/cache.sqlite3 同じホストのプロセスで共有
+    redis://[:password@]host:port/db 複数ホストで共有
+    """
+    parsed = urlparse(url or DEFAULT_CACHE_URL)
+    if parsed.scheme == "memory":
+        return MemoryCache()
+    if parsed.scheme == "sqlite":
+        path = unquote(parsed.path)
+        if parsed.netloc:
+            path = os.path.join(parsed.netloc, path.lstrip("/"))
+        return SQLiteCache(path)
+    if parsed.scheme == "redis":
+        db = parsed.path.lstrip("/")
+        return RedisCache(
+            parsed.hostname or "127.0.0.1", parsed.port or 6379, int(db) if db else 0,
+            unquote(parsed.password) if parsed.password else None
+        )
+    raise ValueError(f"未対応のキャッシュURLです: {url}")
+
+
+class SharedCache:
+    """世代番号付きキーでJSONを保存する共有キャッシュ
+
+    invalidate(name) で世代番号を上げると、同じバックエンドを使う全プロセスで
+    古い値が読まれなくなる。値と一緒に保存ごとに変わる刻印を書き込み、
+    世代番号と刻印が変わっていなければ前回復元した値をプロセス内で使い回す
+    （値の取得とJSONの復元は保存された値ごとに1回だけ）。
+    バックエンドに接続できないときは取得をキャッシュミス、保存を何もしない扱いにして
+    呼び出し側の処理を止めない（エラー後 BACKEND_RETRY_INTERVAL 秒は接続も試さない）。
+    """
+
+    def __init__(self, backend, namespace="omnisorter", check_interval=LOCAL_CHECK_INTERVAL):
+        self.backend = backend
+        self.namespace = namespace
+        self.check_interval = check_interval
+        self.errors = 0
+        self._down_until = 0
+        # {name: ((世代番号, 刻印), 確認した時刻)} と {name: ((世代番号, 刻印), 復元した値)}
+        self._checked = {}
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def _call(self, method, *args):
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                raise ConnectionError("共有キャッシュに接続できません")
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+                self._down_until = time.monotonic() + BACKEND_RETRY_INTERVAL
+            raise
+
+    def generation(self, name):
+        """現在の世代番号（接続できなければNone）"""
+        try:
+            value = self._call("get", f"{self.namespace}:{name}:generation")
+        except Exception:
+            return None
+        return int(value) if value else 0
+
+    def _key(self, name, generation):
+        return f"{self.namespace}:v{CACHE_FORMAT_VERSION}:{name}:{generation}"
+
+    def _forget(self, name):
+        with self._lock:
+            self._checked.pop(name, None)
+
+    def _version(self, name):
+        """(世代番号, 刻印) を返す（接続できなければNone、値がなければ刻印はNone）
+
+        check_interval 秒以内に確認していればバックエンドに問い合わせない。
+        """
+        with self._lock:
+            checked = self._checked.get(name)
+        if checked is not None and time.monotonic() - checked[1] < self.check_interval:
+            return checked[0]
+        generation = self.generation(name)
+        if generation is None:
+            return None
+        try:
+            stamp = self._call("get", self._key(name, generation) + ":stamp")
+        except Exception:
+            return None
+        version = (generation, stamp)
+        with self._lock:
+            self._checked[name] = (version, time.monotonic())
+        return version
+
+    def exists(self, name):
+        """値が保存されているか（値の取得・復元はしない）"""
+        version = self._version(name)
+        return version is not None and version[1] is not None
+
+    def get(self, name):
+        """保存済みの値（なければNone）
+
+        同じ保存の値はプロセス内で共有するので、呼び出し側で変更しないこと。
+        """
+        version = self._version(name)
+        if version is None or version[1] is None:
+            return None
+        with self._lock:
+            loaded = self._loaded.get(name)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+        try:
+            data = self._call("get", self._key(name, version[0]))
+        except Exception:
+            return None
+        if data is None:
+            return None
+        value = json.loads(data)
+        with self._lock:
+            self._loaded[name] = (version, value)
+        return value
+
+    def set(self, name, value, ttl=None, generation=None):
+        """値を保存（generation省略時は現在の世代）
+
+        値の元データを読み始める前の世代を渡しておくと、その間に無効化されていた場合は
+        古い世代に保存されるだけで、新しい世代の値を上書きしない。
+        """
+        if generation is None:
+            generation = self.generation(name)
+            if generation is None:
+                return
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        key = self._key(name, generation)
+        try:
+            # 値を書いてから刻印を書く（刻印が変わったのを見たプロセスは新しい値を読む）
+            self._call("set", key, data, ttl)
+            self._call("set", key + ":stamp", uuid.uuid4().hex.encode(), ttl)
+        except Exception:
+            pass
+        self._forget(name)
+
+    def invalidate(self, name):
+        """世代番号を上げて全プロセスの保存済みの値を無効にする"""
+        try:
+            self._call("incr", f"{self.namespace}:{name}:generation")
+        except Exception:
+            pass
+        self._forget(name)
@@ -0,0 +1,40 @@
+"""テスト共通のフィクスチャ（benchmarks/ のNotion・Redis互換サーバーを使う）"""
+import pytest
+
+from benchmarks.fake_notion import FakeNotion
+from benchmarks.fake_redis import FakeRedis
+from notion_api import NotionClient, RateLimiter
+from outbox import Outbox
+
+DATABASE_IDS = {"NOTION_DATABASE_ID": "requests", "CUSTOMER_DB_ID": "customers", "PROJECT_DB_ID": "projects"}
+
+# テストでは待たせない
+UNLIMITED_RATE = 1000
+
+
+@pytest.fixture
+def notion():
+    fake = FakeNotion(seed=0)
+    fake.start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def client(notion):
+    return NotionClient(
+        "test", DATABASE_IDS, base_url=notion.base_url, limiter=RateLimiter(UNLIMITED_RATE, UNLIMITED_RATE)
+    )
+
+
+@pytest.fixture
+def redis():
+    server = FakeRedis()
+    server.url = server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(str(tmp_path / "outbox.sqlite3"))
@@ -0,0 +1,105 @@
+"""ヘッドレスJSON APIのプレビュー・保存・認証"""
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from api_server import MAX_BATCH_SIZE, APIServer
+from bulk_import import notion_saver
+
+SPEC = {"OS機種--": "M", "本体構成-段": "4", "本体構成-列": "5", "本体構成-ブロック": "3"}
+ROW = {"顧客名": "株式会社テスト", "案件名": "倉庫A", "依頼種別": "見積のみ", **SPEC}
+TOKEN = "secret"
+
+
+def start(save=None, token=None):
+    server = APIServer(("127.0.0.1", 0), save, concurrency=1, token=token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def api():
+    servers = []
+
+    def factory(save=None, token=None):
+        server = start(save, token)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield factory
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def call(url, payload=None, token=None):
+    """(ステータス, ボディ) を返す。JSON以外のボディは文字列のまま返す"""
+    data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    request = urllib.request.Request(url, data=data)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            status, content_type, body = response.status, response.headers["Content-Type"], response.read()
+    except urllib.error.HTTPError as e:
+        status, content_type, body = e.code, e.headers["Content-Type"], e.read()
+    text = body.decode("utf-8")
+    return status, json.loads(text) if content_type.startswith("application/json") else text
+
+
+def test_health_and_metrics_need_no_token(api):
+    url = api(token=TOKEN)
+    assert call(url + "/health") == (200, {"status": "ok", "save": False})
+    status, body = call(url + "/metrics")
+    assert status == 200
+    assert isinstance(body, str)
+    assert call(url + "/missing") == (404, {"error": "見つかりません"})
+
+
+def test_preview_requires_the_bearer_token(api):
+    url = api(token=TOKEN)
+    status, body = call(url + "/preview", ROW)
+    assert (status, body["error"]) == (401, "認証に失敗しました")
+
+    status, body = call(url + "/preview", ROW, token=TOKEN)
+    assert status == 200
+    assert body["errors"] == []
+    assert body["間口数"] == 120
+    assert body["見積依頼文"].startswith("OmniSorter見積依頼")
+
+
+def test_preview_batches_and_rejects_bad_bodies(api):
+    url = api()
+    status, body = call(url + "/preview", {"requests": [ROW, {**ROW, "本体構成-段": "x"}]})
+    assert status == 200
+    assert [bool(result["errors"]) for result in body["results"]] == [False, True]
+
+    assert call(url + "/preview", [])[0] == 400
+    assert call(url + "/preview", [1])[0] == 400
+    assert call(url + "/preview", [ROW] * (MAX_BATCH_SIZE + 1))[0] == 413
+
+
+def test_save_without_notion_is_unavailable(api):
+    status, body = call(api() + "/requests", ROW)
+    assert status == 503
+    assert "NOTION_API_KEY" in body["error"]
+
+
+def test_save_maps_each_outcome_to_a_status(api, notion, client):
+    url = api(save=notion_saver(client, "requests"))
+    status, body = call(url + "/requests", ROW)
+    assert status == 201
+    assert body["ページID"] in notion.pages
+
+    status, body = call(url + "/requests", {**ROW, "顧客名": ""})
+    assert (status, body["ページID"]) == (422, "")
+
+    notion.fail_next("POST", 400)
+    assert call(url + "/requests", ROW)[0] == 502
+
+    status, body = call(url + "/requests", [ROW, {**ROW, "顧客名": ""}])
+    assert status == 200
+    assert (body["summary"]["succeeded"], body["summary"]["invalid"]) == (1, 1)
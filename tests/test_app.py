@@ -0,0 +1,48 @@
+"""サイドバーの接続テスト（成功した結果だけを共有する）"""
+import pytest
+
+import app
+
+TARGETS = (("顧客企業マスタ", "customers"), ("案件管理データベース", "projects"))
+
+
+@pytest.fixture
+def probe_client(client, monkeypatch):
+    monkeypatch.setattr(app, "get_notion_client", lambda: client)
+    app.shared_probe_databases.clear()
+    yield client
+    app.shared_probe_databases.clear()
+
+
+def test_probe_reports_each_database(notion, client):
+    ok, missing = app.probe_databases((TARGETS[0], ("不明なDB", "missing")), client)
+    assert ok["message"].startswith("✅ 顧客企業マスタ: 接続成功")
+    assert ok["property_count"] > 0
+    assert missing == {"message": "❌ 不明なDB: データベースが見つかりません", "latency": None, "property_count": None}
+
+
+def test_failed_probes_are_raised_instead_of_cached(notion, probe_client):
+    # 例外はキャッシュされないので、失敗した結果は次の接続テストで取り直される
+    with pytest.raises(app.ProbeFailed) as failed:
+        app.shared_probe_databases((TARGETS[0], ("不明なDB", "missing")))
+    assert [probe["latency"] is None for probe in failed.value.results] == [False, True]
+
+    results, _ = app.shared_probe_databases(TARGETS)
+    assert all(probe["latency"] is not None for probe in results)
+
+
+def test_recheck_clears_the_shared_result(notion, probe_client, monkeypatch):
+    secrets = {"NOTION_API_KEY": "test", "CUSTOMER_DB_ID": "customers", "PROJECT_DB_ID": "missing"}
+    monkeypatch.setattr(app.st, "secrets", secrets)
+    cleared = []
+    monkeypatch.setattr(app.shared_probe_databases, "clear", lambda: cleared.append(True))
+
+    success, message = app.test_notion_connection()
+    assert success
+    assert "✅ 顧客企業マスタ: 接続成功" in message
+    assert "❌ 案件管理データベース: データベースが見つかりません" in message
+    assert "❌ OmniSorter依頼DB: 未設定" in message
+    assert cleared == []
+
+    app.test_notion_connection(refresh=True)
+    assert cleared == [True]
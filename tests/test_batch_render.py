@@ -0,0 +1,45 @@
+"""依頼文の一括生成（入力順の維持・プロセスプール・CLI）"""
+import json
+
+from batch_render import chunked, main, render_row, render_stream
+
+SPEC = {"OS機種--": "M", "本体構成-段": "4", "本体構成-列": "5", "本体構成-ブロック": "3"}
+
+
+def rows(count):
+    return [(line_no, {"顧客名": f"顧客{line_no}", **SPEC}) for line_no in range(1, count + 1)]
+
+
+def test_chunked_splits_without_dropping_the_tail():
+    assert [len(chunk) for chunk in chunked(range(10), 4)] == [4, 4, 2]
+    assert list(chunked([], 4)) == []
+
+
+def test_render_row_reports_errors_and_texts():
+    result = render_row(7, {"顧客名": "A", **SPEC, "本体構成-段": "x"})
+    assert (result["行"], result["顧客名"]) == (7, "A")
+    assert result["errors"]
+    assert render_row(1, rows(1)[0][1])["間口数"] == 120
+
+
+def test_process_pool_keeps_the_input_order():
+    source = rows(50)
+    serial = list(render_stream(iter(source), workers=1))
+    parallel = list(render_stream(iter(source), workers=2, chunk_size=3))
+    assert [result["行"] for result in parallel] == list(range(1, 51))
+    assert parallel == serial
+
+
+def test_main_writes_jsonl_and_fails_on_invalid_rows(tmp_path):
+    source = tmp_path / "specs.jsonl"
+    source.write_text("\n".join(json.dumps(raw, ensure_ascii=False) for _, raw in rows(3)) + "\n", encoding="utf-8")
+    output = tmp_path / "out.jsonl"
+    assert main([str(source), "-o", str(output), "--workers", "1"]) == 0
+    results = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [result["顧客名"] for result in results] == ["顧客1", "顧客2", "顧客3"]
+
+    source.write_text('{"本体構成-段": "x"}\n', encoding="utf-8")
+    assert main([str(source), "-o", str(output), "--workers", "1"]) == 1
+
+    source.write_text("[1]\n", encoding="utf-8")
+    assert main([str(source), "-o", str(output), "--workers", "1"]) == 1
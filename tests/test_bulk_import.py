@@ -0,0 +1,86 @@
+"""一括取込の読み込み・検証・並列保存と結果の集計"""
+import csv
+import io
+
+import pytest
+
+from bulk_import import (
+    RESULT_FAILED, RESULT_INVALID, RESULT_PARTIAL, RESULT_SUCCEEDED, RESULT_VALIDATED, import_rows, main,
+    notion_saver, prepare_rows, read_rows, report_csv
+)
+
+SPEC = {"OS機種--": "M", "本体構成-段": "4", "本体構成-列": "5", "本体構成-ブロック": "3"}
+
+
+def csv_bytes(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["顧客名", "案件名", "依頼種別", "備考", *SPEC])
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+def row(**values):
+    return {"顧客名": "株式会社テスト", "案件名": "倉庫A", "依頼種別": "見積のみ", "備考": "", **SPEC, **values}
+
+
+def test_read_rows_accepts_csv_with_bom_and_jsonl():
+    rows = read_rows(csv_bytes([row(), row(案件名="倉庫B")]), "requests.csv")
+    assert [(line_no, raw["案件名"]) for line_no, raw in rows] == [(2, "倉庫A"), (3, "倉庫B")]
+    assert "顧客名" in rows[0][1]
+
+    rows = read_rows('{"顧客名": "A"}\n\n{"顧客名": "B"}\n', "requests.jsonl")
+    assert [(line_no, raw["顧客名"]) for line_no, raw in rows] == [(1, "A"), (3, "B")]
+    with pytest.raises(ValueError, match="2行目"):
+        read_rows('{"顧客名": "A"}\n[1]\n', "requests.jsonl")
+
+
+def test_prepare_rows_validates_and_renders():
+    valid, missing, invalid = prepare_rows([
+        (2, row()),
+        (3, row(顧客名="", 依頼種別="至急")),
+        (4, row(**{"本体構成-段": "x", "未知-項目": "1"}))
+    ])
+    assert valid["errors"] == []
+    assert valid["data"]["仕様詳細"]["間口数"] == 120
+    assert valid["data"]["見積依頼文"].startswith("OmniSorter見積依頼")
+    assert valid["data"]["依頼種別"] == "見積のみ"
+    assert missing["data"] is None
+    assert missing["errors"][0] == "顧客名は必須です"
+    assert "依頼種別" in missing["errors"][1]
+    assert len(invalid["errors"]) == 2
+
+
+def test_import_rows_reports_each_outcome(notion, client):
+    long_text = "あ" * 3000
+    prepared = prepare_rows([
+        (2, row()),
+        (3, row(顧客名="")),
+        (4, row(案件名="倉庫C", 備考=long_text)),
+        (5, row(案件名="倉庫D"))
+    ])
+    # 1件ずつ保存するので、倉庫Cは本文の追記だけ、倉庫Dはページ作成が失敗する
+    notion.fail_next("PATCH", 400)
+    notion.fail_next("POST", 400, after=2)
+    results, summary = import_rows(prepared, notion_saver(client, "requests"), concurrency=1)
+
+    assert [result["行"] for result in results] == [2, 3, 4, 5]
+    outcomes = {result["行"]: result["結果"] for result in results}
+    assert outcomes[3] == RESULT_INVALID
+    assert outcomes[4] == RESULT_PARTIAL
+    assert (outcomes[2], outcomes[5]) == (RESULT_SUCCEEDED, RESULT_FAILED)
+    assert results[2]["ページID"] in notion.pages
+    assert (summary["total"], summary["succeeded"], summary["invalid"], summary["failed"], summary["partial"]) == (4, 1, 1, 1, 1)
+
+    report = list(csv.DictReader(io.StringIO(report_csv(results))))
+    assert [line["結果"] for line in report] == [result["結果"] for result in results]
+
+
+def test_dry_run_only_validates(tmp_path, capsys):
+    path = tmp_path / "requests.csv"
+    path.write_bytes(csv_bytes([row(), row(案件名="")]))
+    report = tmp_path / "report.csv"
+    assert main([str(path), "--dry-run", "--report", str(report)]) == 1
+    lines = list(csv.DictReader(io.StringIO(report.read_text(encoding="utf-8-sig"))))
+    assert [line["結果"] for line in lines] == [RESULT_VALIDATED, RESULT_INVALID]
+    assert "検証エラー 1件" in capsys.readouterr().out
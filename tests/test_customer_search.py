@@ -0,0 +1,36 @@
+"""顧客名の正規化と SearchIndex の並び順"""
+from customer_search import SearchIndex, normalize
+
+
+def customers(*names):
+    return [{"id": str(i), "name": name} for i, name in enumerate(names)]
+
+
+def names(results):
+    return [item["name"] for item in results]
+
+
+def test_normalize_ignores_width_kana_designators_and_symbols():
+    assert normalize("株式会社ＡＢＣ") == normalize("abc") == "abc"
+    assert normalize("（株）テスト・ロジ") == normalize("てすとろじ")
+    assert normalize("ﾃｽﾄ 物流") == normalize("テスト物流")
+
+
+def test_prefix_matches_come_before_substring_matches_and_shorter_names_first():
+    index = SearchIndex(customers("大阪テスト倉庫", "テスト物流センター", "株式会社テスト", "テスト物流"))
+    assert names(index.search("テスト")) == ["株式会社テスト", "テスト物流", "テスト物流センター", "大阪テスト倉庫"]
+    # 完全に含むものの後に、一部のn-gramだけが一致するものが続く
+    assert names(index.search("ﾃｽﾄ物流")) == ["テスト物流", "テスト物流センター", "株式会社テスト", "大阪テスト倉庫"]
+
+
+def test_empty_query_returns_the_first_items_and_limit_is_respected():
+    index = SearchIndex(customers(*[f"株式会社テスト{i:02d}" for i in range(30)]))
+    assert len(index) == 30
+    assert names(index.search("", limit=3)) == ["株式会社テスト00", "株式会社テスト01", "株式会社テスト02"]
+    assert len(index.search("テスト", limit=5)) == 5
+
+
+def test_near_misses_are_found_when_nothing_matches_exactly():
+    index = SearchIndex(customers("東京物流", "大阪運輸"))
+    assert names(index.search("東京物流所")) == ["東京物流"]
+    assert index.search("名古屋") == []
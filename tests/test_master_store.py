@@ -0,0 +1,138 @@
+"""MasterMirror の差分同期・全件同期と、顧客→案件の対応表"""
+import master_store
+from benchmarks.fake_notion import plain_text, relation, title
+from master_store import EntityResolver, MasterMirror, index_projects
+from omnisorter_core import CUSTOMER_RELATION_PROPERTY
+
+
+class RecordingDatabase:
+    """NotionDatabase に渡したクエリを記録する"""
+
+    def __init__(self, database):
+        self.database = database
+        self.payloads = []
+
+    def iter_query_pages(self, payload=None, background=False):
+        self.payloads.append(payload)
+        return self.database.iter_query_pages(payload, background=background)
+
+
+def customer_row(page):
+    return {"id": page["id"], "name": plain_text(page["properties"]["会社名"])}
+
+
+def project_row(page):
+    relations = page["properties"].get(CUSTOMER_RELATION_PROPERTY, {}).get("relation", [])
+    return {
+        "id": page["id"],
+        "name": plain_text(page["properties"]["案件名"]),
+        "customer_ids": [related["id"] for related in relations]
+    }
+
+
+def make_mirror(tmp_path):
+    return MasterMirror(str(tmp_path / "mirror.sqlite3"))
+
+
+def customer_ids(mirror):
+    return [row["id"] for row in mirror.snapshot("customers")["items"]]
+
+
+def project_ids_of(mirror, customer_id):
+    projects = index_projects(mirror.snapshot("projects")["items"])
+    return [row["id"] for row in projects.get(customer_id, [])]
+
+
+def test_first_sync_is_full_then_only_changed_pages(tmp_path, notion, client):
+    for i in range(3):
+        page_id = notion.add_page("customers", {"会社名": title(f"株式会社{i}")})
+        notion.pages[page_id]["last_edited_time"] = f"2024-01-0{i + 1}T00:00:00.000Z"
+    mirror = make_mirror(tmp_path)
+    database = RecordingDatabase(client.database("CUSTOMER_DB_ID"))
+
+    assert mirror.sync_customers(database, customer_row, wait=True) == 3
+    assert database.payloads[-1] == {}
+    assert mirror.sync_state("customers")[0] == "2024-01-03T00:00:00.000Z"
+
+    notion.add_page("customers", {"会社名": title("株式会社新規")})
+    # 高水位と同じ分のページは重複して取得される
+    assert mirror.sync_customers(database, customer_row, wait=True) == 2
+    assert database.payloads[-1]["filter"]["last_edited_time"] == {"on_or_after": "2024-01-03T00:00:00.000Z"}
+    assert [row["name"] for row in mirror.snapshot("customers")["items"]] == ["株式会社0", "株式会社1", "株式会社2", "株式会社新規"]
+
+
+def test_deleted_pages_are_swept_only_by_full_sync(tmp_path, monkeypatch, notion, client):
+    ids = [notion.add_page("customers", {"会社名": title(f"株式会社{i}")}) for i in range(3)]
+    mirror = make_mirror(tmp_path)
+    database = RecordingDatabase(client.database("CUSTOMER_DB_ID"))
+    mirror.sync_customers(database, customer_row, wait=True)
+
+    del notion.pages[ids[1]]
+    mirror.sync_customers(database, customer_row, wait=True)
+    assert "filter" in database.payloads[-1]
+    assert mirror.count("customers") == 3
+
+    monkeypatch.setattr(master_store, "FULL_SYNC_INTERVAL", -1)
+    mirror.sync_customers(database, customer_row, wait=True)
+    assert database.payloads[-1] == {}
+    assert customer_ids(mirror) == [ids[0], ids[2]]
+
+
+def test_project_relations_follow_edits(tmp_path, notion, client):
+    seeded = notion.seed_masters(2, projects_per_customer=2)
+    (first, first_projects), (second, second_projects) = seeded
+    mirror = make_mirror(tmp_path)
+    mirror.sync_projects(client.database("PROJECT_DB_ID"), project_row, wait=True)
+    assert project_ids_of(mirror, first) == first_projects
+
+    # 案件の付け替えは差分同期で反映される
+    page = notion.pages[first_projects[0]]
+    page["properties"][CUSTOMER_RELATION_PROPERTY] = relation(second)
+    mirror.sync_projects(client.database("PROJECT_DB_ID"), project_row, wait=True)
+    assert project_ids_of(mirror, first) == first_projects[1:]
+    assert project_ids_of(mirror, second) == [first_projects[0], *second_projects]
+
+
+def test_put_adds_a_created_page_before_the_next_sync(tmp_path, notion, client):
+    (customer_id, project_ids), = notion.seed_masters(1)
+    mirror = make_mirror(tmp_path)
+    mirror.sync_projects(client.database("PROJECT_DB_ID"), project_row, wait=True)
+    high_water = mirror.sync_state("projects")[0]
+
+    created = {"id": "created", "last_edited_time": "2024-01-01T00:00:00.000Z"}
+    mirror.put("projects", created, {"id": "created", "name": "新規倉庫", "customer_ids": [customer_id]})
+    assert project_ids_of(mirror, customer_id) == [*project_ids, "created"]
+    # 高水位は変えない（作成したページも次の差分同期で取得し直す）
+    assert mirror.sync_state("projects")[0] == high_water
+
+
+def test_project_index_lists_each_customers_projects_in_order(tmp_path, notion, client):
+    seeded = notion.seed_masters(3, projects_per_customer=2)
+    (first, _), (second, _), (third, _) = seeded
+    shared = notion.add_page("projects", {"案件名": title("共同倉庫"), CUSTOMER_RELATION_PROPERTY: relation(first, third)})
+    notion.add_page("projects", {"案件名": title("未割当倉庫")})
+    mirror = make_mirror(tmp_path)
+    mirror.sync_projects(client.database("PROJECT_DB_ID"), project_row, wait=True)
+
+    index = index_projects(mirror.snapshot("projects")["items"])
+    assert set(index) == {first, second, third}
+    for customer_id, project_ids in seeded:
+        expected = [{"id": page_id, "name": plain_text(notion.pages[page_id]["properties"]["案件名"])} for page_id in project_ids]
+        if customer_id != second:
+            expected.append({"id": shared, "name": "共同倉庫"})
+        assert index[customer_id] == expected
+
+
+def test_entity_resolver_evicts_the_least_recently_used_entry():
+    resolver = EntityResolver(maxsize=2)
+    resolver.put("a", "株式会社A")
+    resolver.put("b", "株式会社B")
+    assert resolver.get("a") == {"name": "株式会社A", "customer_ids": []}
+    resolver.put("c", "株式会社C")
+    assert resolver.get("b") is None
+    assert len(resolver) == 2
+    assert (resolver.hits, resolver.misses) == (1, 1)
+
+    resolver.put_many([{"id": "p1", "name": "倉庫1"}, {"id": "p2", "name": "倉庫2", "customer_ids": ["x"]}], "c")
+    assert resolver.get("p1")["customer_ids"] == ["c"]
+    assert resolver.get("p2")["customer_ids"] == ["x"]
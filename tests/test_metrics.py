@@ -0,0 +1,76 @@
+"""メトリクスの集計とPrometheusテキスト形式の出力"""
+import urllib.request
+
+import pytest
+
+from metrics import MetricsRegistry, Timer, notion_endpoint, start_metrics_server
+
+
+def test_counter_and_histogram_render_in_text_format():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "件数", ("status",))
+    counter.inc("200")
+    counter.inc("200", amount=2)
+    counter.inc('5"00')
+    assert registry.counter("requests_total", "別の説明") is counter
+
+    histogram = registry.histogram("duration_seconds", "時間", buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(3)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{status="200"} 3' in lines
+    assert 'requests_total{status="5\\"00"} 1' in lines
+    # バケットは累積で出力する
+    assert 'duration_seconds_bucket{le="0.1"} 1' in lines
+    assert 'duration_seconds_bucket{le="1"} 2' in lines
+    assert 'duration_seconds_bucket{le="+Inf"} 3' in lines
+    assert "duration_seconds_sum 3.55" in lines
+    assert "duration_seconds_count 3" in lines
+
+
+def test_histogram_quantile_interpolates_within_a_bucket():
+    histogram = MetricsRegistry().histogram("latency", "時間", buckets=(1, 2))
+    assert histogram.quantile(0.5) is None
+    for value in (0.5, 1.5, 1.5, 1.5):
+        histogram.observe(value)
+    assert histogram.quantile(0.25) == pytest.approx(1.0)
+    assert histogram.quantile(1.0) == pytest.approx(2.0)
+
+
+def test_callback_metric_is_read_at_render_time_and_skips_failures():
+    registry = MetricsRegistry()
+    values = {("hit",): 1}
+    registry.callback("cache_entries", "件数", ("result",), lambda: values)
+    values[("hit",)] = 5
+    assert 'cache_entries{result="hit"} 5' in registry.render().splitlines()
+
+    registry.callback("cache_entries", "件数", ("result",), lambda: 1 / 0)
+    assert "cache_entries{" not in registry.render()
+
+
+def test_notion_endpoint_drops_ids_from_labels():
+    assert notion_endpoint("POST", "/databases/abc/query") == ("databases/query", "abc")
+    assert notion_endpoint("GET", "/databases/abc") == ("databases/retrieve", "abc")
+    assert notion_endpoint("POST", "/pages") == ("pages/create", None)
+    assert notion_endpoint("PATCH", "/pages/xyz") == ("pages/retrieve", None)
+    assert notion_endpoint("PATCH", "/blocks/xyz/children") == ("blocks/children", None)
+
+
+def test_timer_and_metrics_server():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("step_seconds", "時間")
+    with Timer(histogram) as timer:
+        pass
+    assert timer.elapsed >= 0
+    assert histogram.series()[()]["count"] == 1
+
+    server = start_metrics_server(0, "127.0.0.1", registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=10) as response:
+            assert "step_seconds_count 1" in response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,108 @@
+"""split_text のUTF-16境界、RateLimiter のトークンバケットと優先度、429・5xxの再試行"""
+import threading
+import time
+
+from notion_api import (
+    MAX_CHILDREN, MAX_PAYLOAD_BYTES, MAX_TEXT_LENGTH, RateLimiter, batch_children, payload_size, split_text,
+    text_blocks
+)
+
+
+def utf16_length(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def test_split_text_counts_surrogate_pairs_as_two_units():
+    text = "😀" * 1500
+    chunks = split_text(text)
+    assert "".join(chunks) == text
+    assert [utf16_length(chunk) for chunk in chunks] == [2000, 1000]
+
+
+def test_split_text_does_not_cut_a_surrogate_pair_at_the_limit():
+    text = "a" + "😀" * 1000
+    chunks = split_text(text)
+    assert "".join(chunks) == text
+    assert utf16_length(chunks[0]) == MAX_TEXT_LENGTH - 1
+    assert chunks[1] == "😀"
+
+
+def test_split_text_prefers_newlines():
+    text = "x" * 1500 + "\n" + "y" * 1000
+    assert split_text(text) == ["x" * 1500 + "\n", "y" * 1000]
+    assert split_text("x" * MAX_TEXT_LENGTH) == ["x" * MAX_TEXT_LENGTH]
+    assert split_text("") == [""]
+
+
+def test_body_blocks_are_batched_under_the_request_limits():
+    blocks = text_blocks("見積依頼文", "あ" * 300000) + text_blocks("備考", "x\n" * 2000) * 30
+    batches = list(batch_children(blocks))
+    assert len(batches) > 1
+    assert [block for batch in batches for block in batch] == blocks
+    for batch in batches:
+        assert len(batch) <= MAX_CHILDREN
+        assert payload_size({"children": batch}) <= MAX_PAYLOAD_BYTES
+
+
+def test_limiter_allows_a_burst_then_paces_requests():
+    limiter = RateLimiter(rate=10, burst=2)
+    assert limiter.acquire() < 0.01 and limiter.acquire() < 0.01
+    waited = limiter.acquire()
+    assert 0.05 < waited < 0.2
+    assert limiter.stats()["waited"] == 1
+
+
+def test_background_keeps_a_token_for_foreground():
+    limiter = RateLimiter(rate=4, burst=2)
+    limiter.acquire(background=True)
+    background = threading.Thread(target=limiter.acquire, kwargs={"background": True})
+    background.start()
+    try:
+        # 残りの1トークンはバックグラウンドには使わせない
+        assert limiter.acquire() < 0.05
+        assert background.is_alive()
+    finally:
+        background.join()
+
+
+def test_background_yields_while_foreground_is_waiting():
+    limiter = RateLimiter(rate=5, burst=1)
+    limiter.acquire()
+    finished = []
+    foreground = threading.Thread(target=lambda: finished.append(("foreground", limiter.acquire())))
+    foreground.start()
+    time.sleep(0.05)
+    limiter.acquire(background=True)
+    finished.append(("background", None))
+    foreground.join()
+    assert [name for name, _ in finished] == ["foreground", "background"]
+    assert finished[0][1] < 1 / limiter.rate + 0.05
+
+
+def test_429_is_retried_after_retry_after(notion, client):
+    notion.retry_after = 0.3
+    notion.fail_next("GET", 429)
+    started_at = time.monotonic()
+    response = client.request("GET", "databases/requests")
+    assert response.status_code == 200
+    assert time.monotonic() - started_at >= 0.3
+    assert client.retry_counts == {429: 1}
+
+
+def test_page_creation_retries_429_but_not_server_errors(notion, client):
+    notion.fail_next("POST", 502)
+    database = client.database("NOTION_DATABASE_ID")
+    properties = {"顧客名": {"title": [{"text": {"content": "株式会社A"}}]}}
+    response = database.create_page(properties)
+    assert response.status_code == 502
+    assert notion.request_count == 1
+    assert notion.pages == {}
+
+    notion.retry_after = 0
+    notion.fail_next("POST", 429)
+    assert database.create_page(properties).status_code == 200
+    assert len(notion.pages) == 1
+
+    notion.fail_next("POST", 502)
+    assert database.create_page(properties, retry_server_errors=True).status_code == 200
+    assert len(notion.pages) == 2
@@ -0,0 +1,48 @@
+"""案件・顧客名の解決と、マスタ連携の保存で送るリクエスト"""
+from master_store import EntityResolver
+from omnisorter_core import build_master_request_properties, get_project_info, save_master_request
+
+REQUEST = {
+    "依頼種別": "見積のみ", "OS機種": "M", "見積依頼文": "見積", "図面依頼文": "図面", "仕様詳細": {}, "備考": ""
+}
+
+
+def test_project_info_is_fetched_once_and_then_resolved_from_the_cache(notion, client):
+    (customer_id, (project_id,)), = notion.seed_masters(1)
+    resolver = EntityResolver()
+
+    assert get_project_info(client, project_id, resolver) == {"name": "テスト倉庫0000-0", "customer_name": "株式会社テスト0000"}
+    # 案件と顧客のページを1回ずつ取得する
+    assert notion.request_count == 2
+    assert resolver.get(project_id)["customer_ids"] == [customer_id]
+
+    assert get_project_info(client, project_id, resolver)["customer_name"] == "株式会社テスト0000"
+    assert notion.request_count == 2
+
+
+def test_project_info_without_a_resolver_or_page(notion, client):
+    (_, (project_id,)), = notion.seed_masters(1)
+    assert get_project_info(client, project_id)["name"] == "テスト倉庫0000-0"
+    assert get_project_info(client, "missing") is None
+
+
+def test_master_save_with_known_names_is_a_single_create(notion, client):
+    (customer_id, (project_id,)), = notion.seed_masters(1)
+    resolver = EntityResolver()
+    resolver.put(customer_id, "株式会社テスト0000")
+    resolver.put(project_id, "テスト倉庫0000-0", [customer_id])
+    client.schemas.get("requests")
+    before = notion.request_count
+
+    page_id, error = save_master_request(client, project_id, REQUEST, resolver)
+    assert error is None
+    assert notion.request_count == before + 1
+    properties = notion.pages[page_id]["properties"]
+    assert properties["顧客名"]["title"][0]["text"]["content"] == "株式会社テスト0000"
+    assert properties["案件名"]["rich_text"][0]["text"]["content"] == "テスト倉庫0000-0"
+
+
+def test_master_request_date_is_the_enqueue_date():
+    properties = build_master_request_properties(dict(REQUEST, 依頼日="2026-01-02"), "project", use_relation=True)
+    assert properties["依頼日"] == {"date": {"start": "2026-01-02"}}
+    assert properties["案件"] == {"relation": [{"id": "project"}]}
@@ -0,0 +1,109 @@
+"""送信キューの重複登録・リース・本文の追記だけの再送・冪等キーによる作成済みページの検出"""
+import pytest
+
+import outbox as outbox_module
+from benchmarks.fake_notion import text
+from omnisorter_core import IDEMPOTENCY_PROPERTY, build_long_text_blocks, save_request
+from outbox import (
+    STATUS_FAILED, STATUS_PARTIAL, STATUS_QUEUED, STATUS_SENT, Delivery, LeaseLost, OutboxWorker
+)
+
+REQUEST = {
+    "顧客名": "株式会社テスト", "案件名": "倉庫A", "依頼種別": "見積のみ", "OS機種": "M",
+    "見積依頼文": "見積", "図面依頼文": "図面", "仕様詳細": {}, "備考": ""
+}
+
+
+@pytest.fixture
+def worker(outbox, client):
+    return OutboxWorker(outbox, {"simple": lambda payload, delivery: save_request(client, "requests", payload["data"], delivery)})
+
+
+def status(outbox):
+    return outbox.entries()[0]["status"]
+
+
+def request_pages(notion):
+    return [page for page in notion.pages.values() if page["parent"]["database_id"] == "requests"]
+
+
+def test_same_request_is_enqueued_once_and_failed_one_is_requeued(outbox):
+    outbox_id, existing = outbox.enqueue("simple", {"data": REQUEST}, "session")
+    assert existing is None
+    assert outbox.enqueue("simple", {"data": REQUEST}, "session") == (outbox_id, STATUS_QUEUED)
+
+    outbox.record(outbox_id, STATUS_FAILED, "エラー")
+    assert outbox.enqueue("simple", {"data": REQUEST}, "session") == (outbox_id, STATUS_FAILED)
+    assert status(outbox) == STATUS_QUEUED
+
+    outbox.record(outbox_id, STATUS_SENT, "page")
+    assert outbox.enqueue("simple", {"data": REQUEST}, "session") == (outbox_id, STATUS_SENT)
+    assert status(outbox) == STATUS_SENT
+    assert outbox.counts() == {STATUS_SENT: 1}
+
+
+def test_claim_takes_one_entry_and_renewals_are_not_attempts(outbox):
+    first, _ = outbox.enqueue("simple", {"data": REQUEST}, "a")
+    outbox.enqueue("simple", {"data": REQUEST}, "b")
+    entries = outbox.claim()
+    assert [entry["id"] for entry in entries] == [first]
+
+    delivery = Delivery(outbox, entries[0])
+    delivery.progress("page", 0)
+    delivery.progress("page", 1)
+    outbox.record(first, STATUS_PARTIAL, "エラー", retry_at=0)
+    resumed = outbox.claim()[0]
+    assert (resumed["id"], resumed["attempt"], resumed["page_id"], resumed["appended"]) == (first, 2, "page", 1)
+
+
+def test_expired_lease_moves_the_entry_to_another_worker(monkeypatch, outbox):
+    monkeypatch.setattr(outbox_module, "SEND_LEASE", -1)
+    outbox_id, _ = outbox.enqueue("simple", {"data": REQUEST}, "session")
+    stalled = outbox.claim()[0]
+    taken_over = outbox.claim()[0]
+    assert taken_over["id"] == outbox_id
+    assert taken_over["resumed"]
+
+    with pytest.raises(LeaseLost):
+        Delivery(outbox, stalled).progress("page", 0)
+    Delivery(outbox, taken_over).progress("page", 0)
+
+
+def test_resumed_entry_finds_the_page_created_by_a_lost_request(notion, outbox, worker):
+    outbox_id, _ = outbox.enqueue("simple", {"data": REQUEST}, "session")
+    entry = outbox.claim()[0]
+    # 作成リクエストはNotionに届いたが、応答を受け取る前に接続が切れた
+    page_id = notion.add_page("requests", {IDEMPOTENCY_PROPERTY: text(entry["key"])})
+    outbox.record(outbox_id, STATUS_QUEUED, retry_at=0)
+
+    worker._send(outbox.claim()[0])
+    assert status(outbox) == STATUS_SENT
+    assert [page["id"] for page in request_pages(notion)] == [page_id]
+
+
+def test_new_page_carries_the_idempotency_key(notion, outbox, worker):
+    outbox.enqueue("simple", {"data": REQUEST}, "session")
+    entry = outbox.claim()[0]
+    worker._send(entry)
+    (page,) = request_pages(notion)
+    assert page["properties"][IDEMPOTENCY_PROPERTY]["rich_text"][0]["text"]["content"] == entry["key"]
+
+
+def test_failed_append_is_resumed_without_recreating_the_page(monkeypatch, notion, outbox, worker):
+    monkeypatch.setattr(outbox_module, "RETRY_BASE", 0)
+    # 本文の追記が2回のリクエストに分かれる長さ
+    data = dict(REQUEST, 見積依頼文="あ" * 300000)
+    blocks = build_long_text_blocks(data)
+    outbox_id, _ = outbox.enqueue("simple", {"data": data}, "session")
+    notion.fail_next("PATCH", 400, after=1)
+
+    worker._send(outbox.claim()[0])
+    assert status(outbox) == STATUS_PARTIAL
+    entry = outbox.claim()[0]
+    assert 0 < entry["appended"] < len(blocks)
+
+    worker._send(entry)
+    assert status(outbox) == STATUS_SENT
+    pages = request_pages(notion)
+    assert [page["id"] for page in pages] == [entry["page_id"]]
+    assert notion.blocks[entry["page_id"]] == blocks
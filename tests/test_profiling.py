@@ -0,0 +1,44 @@
+"""再実行をまたいだプロファイル計測"""
+import marshal
+
+import pytest
+
+from profiling import ProfileSession
+
+
+def slow_step():
+    return sum(range(1000))
+
+
+def test_runs_are_merged_until_the_session_ends():
+    session = ProfileSession(2)
+    assert session.hotspots() == "" and session.dump() == b""
+    assert session.run(slow_step) == 499500
+    assert session.active
+    session.run(slow_step)
+    assert not session.active
+    assert session.completed == 2
+
+    assert "slow_step" in session.hotspots(limit=5)
+    stats = marshal.loads(session.dump())
+    calls = [value[1] for key, value in stats.items() if key[2] == "slow_step"]
+    assert calls == [2]
+
+
+def test_failed_run_still_counts_and_stop_does_not_go_negative():
+    session = ProfileSession(3)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        session.run(fail)
+    assert (session.remaining, session.completed) == (2, 1)
+    assert session.stats is not None
+
+    # 実行中に停止ボタンで0にされた場合
+    def stop():
+        session.remaining = 0
+
+    session.run(stop)
+    assert (session.remaining, session.completed) == (0, 2)
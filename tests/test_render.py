@@ -0,0 +1,37 @@
+"""render_all の出力が、render_all 導入前の実装をそのまま写した benchmarks/legacy_render.py と一致すること"""
+import pytest
+
+from benchmarks.bench_render import SAMPLE_FORM_DATA, separate
+from omnisorter_core import (
+    RenderCache, format_specifications_for_notion, generate_drawing_text, generate_quotation_text, render_all
+)
+
+
+@pytest.mark.parametrize("form_data", [
+    SAMPLE_FORM_DATA,
+    {},
+    {"OS機種--": "M", "本体構成-段": "3"},
+    # 未知の項目は仕様詳細にだけ載る
+    dict(SAMPLE_FORM_DATA, **{"オプション-特注": "有", "その他": "x"}),
+])
+def test_render_all_matches_separate_functions(form_data):
+    assert render_all(form_data) == separate(form_data)
+
+
+def test_wrappers_return_render_all_outputs():
+    quotation, drawing, specifications = render_all(SAMPLE_FORM_DATA)
+    assert generate_quotation_text(SAMPLE_FORM_DATA) == quotation
+    assert generate_drawing_text(SAMPLE_FORM_DATA) == drawing
+    assert format_specifications_for_notion(SAMPLE_FORM_DATA) == specifications
+
+
+def test_render_cache_keys_on_the_items_in_input_order():
+    cache = RenderCache(maxsize=2)
+    first = cache.render(SAMPLE_FORM_DATA)
+    assert cache.render(dict(SAMPLE_FORM_DATA)) is first
+    # 仕様詳細の並びは入力順で変わるので別のキーにする
+    reordered = dict(reversed(list(SAMPLE_FORM_DATA.items())))
+    assert cache.render(reordered) == render_all(reordered)
+    # ハッシュできない値はキャッシュせずに生成する
+    assert cache.render({"その他": ["x"]}) == render_all({"その他": ["x"]})
+    assert cache.stats() == {"size": 2, "hits": 1, "misses": 3}
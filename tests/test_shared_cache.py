@@ -0,0 +1,116 @@
+"""SharedCache の世代番号による無効化と、バックエンド停止時の動作"""
+import pytest
+
+import shared_cache
+from benchmarks.fake_redis import FakeRedis
+from shared_cache import MemoryCache, SharedCache, open_cache
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def cache_url(request, tmp_path):
+    if request.param == "sqlite":
+        return f"sqlite:///{tmp_path / 'cache.sqlite3'}"
+    return request.getfixturevalue("redis").url
+
+
+def test_invalidate_hides_values_from_every_process(cache_url):
+    first = SharedCache(open_cache(cache_url))
+    second = SharedCache(open_cache(cache_url))
+    first.set("customers", {"items": ["株式会社A"]})
+    assert second.get("customers") == {"items": ["株式会社A"]}
+
+    second.invalidate("customers")
+    assert first.get("customers") is None
+    assert first.generation("customers") == 1
+
+
+def test_stale_generation_does_not_overwrite_newer_value(cache_url):
+    first = SharedCache(open_cache(cache_url))
+    second = SharedCache(open_cache(cache_url))
+    generation = first.generation("customers")
+    # first が一覧を読んでいる間に second が顧客を作成した
+    second.invalidate("customers")
+    second.set("customers", {"items": ["新"]})
+    first.set("customers", {"items": ["旧"]}, generation=generation)
+    assert first.get("customers") == {"items": ["新"]}
+
+
+class CountingBackend(MemoryCache):
+    """GETしたキーを記録するバックエンド"""
+
+    def __init__(self):
+        super().__init__()
+        self.gets = []
+
+    def get(self, key):
+        self.gets.append(key)
+        return super().get(key)
+
+
+def test_value_is_fetched_and_decoded_once_per_save():
+    backend = CountingBackend()
+    writer = SharedCache(backend)
+    reader = SharedCache(backend, check_interval=0)
+    writer.set("customers", {"items": ["株式会社A"]})
+
+    first = reader.get("customers")
+    assert reader.exists("customers")
+    assert reader.get("customers") is first
+    value_gets = [key for key in backend.gets if key.endswith(":0")]
+    assert len(value_gets) == 1
+
+    # 同じ世代に保存し直すと刻印が変わるので読み直す
+    writer.set("customers", {"items": ["株式会社B"]})
+    assert reader.get("customers") == {"items": ["株式会社B"]}
+    writer.invalidate("customers")
+    assert not reader.exists("customers")
+    assert reader.get("customers") is None
+
+
+def test_checks_within_the_interval_do_not_reach_the_backend():
+    backend = CountingBackend()
+    cache = SharedCache(backend, check_interval=60)
+    cache.set("customers", {"items": []})
+    backend.gets.clear()
+    for _ in range(6):
+        assert cache.exists("customers")
+        assert cache.get("customers") == {"items": []}
+    # 世代番号・刻印・値を1回ずつ
+    assert len(backend.gets) == 3
+
+    # 自分のプロセスでの無効化はすぐに反映する
+    cache.invalidate("customers")
+    assert not cache.exists("customers")
+
+
+def stopped_server():
+    server = FakeRedis()
+    url = server.start()
+    server.stop()
+    return server, url
+
+
+def test_backend_down_is_a_miss_and_is_not_retried_immediately():
+    _, url = stopped_server()
+    cache = SharedCache(open_cache(url))
+    assert cache.get("customers") is None
+    cache.set("customers", {"items": []})
+    cache.invalidate("customers")
+    assert cache.generation("customers") is None
+    assert cache.errors == 1
+
+
+def test_backend_is_used_again_after_it_comes_back(monkeypatch):
+    monkeypatch.setattr(shared_cache, "BACKEND_RETRY_INTERVAL", 0)
+    server, url = stopped_server()
+    cache = SharedCache(open_cache(url))
+    assert cache.get("customers") is None
+
+    restarted = FakeRedis(server.server_address)
+    restarted.start()
+    try:
+        cache.set("customers", {"items": ["株式会社A"]})
+        assert cache.get("customers") == {"items": ["株式会社A"]}
+    finally:
+        restarted.stop()
+    assert cache.errors == 1